@@ -145,6 +145,8 @@ def main():
         initialize_task(bot, config)
         bot.metrics.capture_stats()
         bot.health_record = BotEvent(config)
+        # BotEvent sends its heartbeat once every heartbeat_wait seconds
+        bot.timers.schedule(60, bot.health_record.heartbeat, name='health_record')
         return bot
 
     def get_commit_hash():
@@ -185,6 +187,8 @@ def main():
         while not finished:
             wait_time = config.reconnecting_timeout * 60
             try:
+                if bot:
+                    bot.stop(timeout=5)
                 bot = initialize(config)
                 bot = start_bot(bot, config)
                 config_changed = check_mod(config_file)
@@ -205,6 +209,7 @@ def main():
                         if config.live_config_update_tasks_only:
                             initialize_task(bot, config)
                         else:
+                            bot.stop(timeout=5)
                             bot = initialize(config)
                             bot = start_bot(bot, config)
 
@@ -302,6 +307,8 @@ def main():
                         data={'path': cached_forts_path}
                         )
 
+            bot.stop(timeout=5)
+
 
 def check_mod(config_file):
     check_mod.mtime = os.path.getmtime(config_file)
@@ -341,6 +348,8 @@ def report_summary(bot):
         logger.info('Highest CP Pokemon: {}'.format(metrics.highest_cp['desc']))
     if metrics.most_perfect is not None:
         logger.info('Most Perfect Pokemon: {}'.format(metrics.most_perfect['desc']))
+    if bot.config.stats:
+        bot.report_timings()
 
 
 def init_config():
@@ -590,6 +599,14 @@ def init_config():
         type=bool,
         default=False
     )
+    add_config(
+        parser,
+        load,
+        long_flag="--stats",
+        help="Log the time spent by each task, RPC and wait every N seconds and when the bot exits, 0 to disable",
+        type=int,
+        default=0
+    )
     add_config(
         parser,
         load,
@@ -725,6 +742,9 @@ def init_config():
     config.live_config_update_enabled = config.live_config_update.get('enabled', False)
     config.live_config_update_tasks_only = config.live_config_update.get('tasks_only', False)
     config.logging = load.get('logging', {})
+    config.rate_limit = load.get('rate_limit', {})
+    config.log_retention = load.get('log_retention', {})
+    config.metrics_exporter = load.get('metrics_exporter', {})
 
     if config.map_object_cache_time < 0.0:
         parser.error("--map_object_cache_time is out of range! (should be >= 0.0)")
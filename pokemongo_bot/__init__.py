@@ -9,26 +9,31 @@ import random
 import re
 import sys
 import time
-import Queue
-import threading
 import shelve
 import uuid
 
 from geopy.geocoders import GoogleV3
 from pgoapi import PGoApi
 from pgoapi.utilities import f2i, get_cell_ids
-from s2sphere import Cell, CellId, LatLng
 
 import cell_workers
 from base_task import BaseTask
 from plugin_loader import PluginLoader
 from api_wrapper import ApiWrapper
-from cell_workers.utils import distance
+from cell_cache import MapCellCache
+from cell_workers.utils import sort_by_distance
+from database_log import DatabaseLog, LogRetention
+from web_file_writer import WebFileWriter
 from event_manager import EventManager
-from human_behaviour import sleep
+from fort_index import FortIndex
+from human_behaviour import action_delay, sleep
 from item_list import Item
 from metrics import Metrics
+from metrics_exporter import MetricsExporter
 from sleep_schedule import SleepSchedule
+from task_scheduler import TaskScheduler, CELL, POSITION
+from timer_service import TimerService
+from timings import shared_timings
 from pokemongo_bot.event_handlers import SocketIoHandler, LoggingHandler, SocialHandler
 from pokemongo_bot.socketio_server.runner import SocketIoRunner
 from pokemongo_bot.websocket_remote_control import WebsocketRemoteControl
@@ -55,6 +60,15 @@ class PokemonGoBot(object):
     def noised_position(self):
         return self.api.noised_lat, self.api.noised_lng, self.api.noised_alt
 
+    @property
+    def fort_index(self):
+        """
+        Returns the spatial index of the forts in the current meta cell.
+        :rtype: pokemongo_bot.fort_index.FortIndex
+        """
+        self._fort_index.update(self.cell["forts"] if self.cell else [])
+        return self._fort_index
+
     #@position.setter # these should be called through api now that gps replication is there...
     #def position(self, position_tuple):
     #    self.api._position_lat, self.api._position_lng, self.api._position_alt = position_tuple
@@ -79,10 +93,21 @@ class PokemonGoBot(object):
     def __init__(self, db, config):
 
         self.database = db
+        self.database_log = DatabaseLog(db)
 
         self.config = config
         super(PokemonGoBot, self).__init__()
 
+        log_retention = getattr(config, 'log_retention', None) or {}
+        self.log_retention = None
+        if log_retention.get('enabled', False):
+            self.log_retention = LogRetention(
+                self.database_log,
+                days=log_retention.get('days', 30),
+                interval=log_retention.get('interval', 24) * 60 * 60,
+                vacuum=log_retention.get('vacuum', True)
+            )
+
         self.fort_timeouts = dict()
         self.pokemon_list = json.load(
             open(os.path.join(_base_dir, 'data', 'pokemon.json'))
@@ -90,6 +115,7 @@ class PokemonGoBot(object):
         self.item_list = json.load(open(os.path.join(_base_dir, 'data', 'items.json')))
         # @var Metrics
         self.metrics = Metrics(self)
+        self.metrics_exporter = None
         self.latest_inventory = None
         self.cell = None
         self.recent_forts = [None] * config.forts_max_circle_size
@@ -99,21 +125,27 @@ class PokemonGoBot(object):
         self.start_position = None
         self.last_map_object = None
         self.last_time_map_object = 0
+        self.map_cell_cache = MapCellCache()
+        self._fort_index = FortIndex()
         self.logger = logging.getLogger(type(self).__name__)
         self.alt = self.config.gps_default_altitude
 
         # Make our own copy of the workers for this instance
         self.workers = []
+        self.scheduler = TaskScheduler()
+        self._last_tick_position = None
 
         # Theading setup for file writing
-        self.web_update_queue = Queue.Queue(maxsize=1)
-        self.web_update_thread = threading.Thread(target=self.update_web_location_worker)
-        self.web_update_thread.start()
+        self.web_writer = WebFileWriter()
+
+        # Periodic background jobs, started once the API is set up
+        self.timers = TimerService()
 
         # Heartbeat limiting
         self.heartbeat_threshold = self.config.heartbeat_threshold
         self.heartbeat_counter = 0
         self.last_heartbeat = time.time()
+        self.last_timings_report = time.time()
         self.hb_locked = False # lock hb on snip
         
         # Inventory refresh limiting
@@ -135,11 +167,20 @@ class PokemonGoBot(object):
 
     def start(self):
         self._setup_event_system()
+
+        metrics_exporter = getattr(self.config, 'metrics_exporter', None) or {}
+        if metrics_exporter.get('enabled', False):
+            self.metrics_exporter = MetricsExporter(
+                self,
+                host=metrics_exporter.get('host', '127.0.0.1'),
+                port=metrics_exporter.get('port', 9400)
+            ).start()
         self.sleep_schedule = SleepSchedule(self, self.config.sleep_schedule) if self.config.sleep_schedule else None
         if self.sleep_schedule:
             self.sleep_schedule.work()
 
         self._setup_api()
+        self._schedule_timers()
         self._load_recent_forts()
         init_inventory(self)
         self.display_player_info()
@@ -149,6 +190,36 @@ class PokemonGoBot(object):
 
         random.seed()
 
+    def _schedule_timers(self):
+        # login() already sent the first heartbeat
+        self.timers.schedule(self.heartbeat_threshold, self.heartbeat, jitter=self.heartbeat_threshold * 0.1)
+        self.timers.schedule(self.heartbeat_threshold, self.update_web_location, delay=0)
+
+    def stop(self, timeout=None):
+        """
+        Stops the threads of the bot, once they wrote or sent what they
+        hold: the timer jobs, the queued requests, the log rows, the web
+        files and the events. Each step waits at most `timeout` seconds.
+        :return: Whether every thread finished before its timeout.
+        """
+        if self.metrics_exporter:
+            self.metrics_exporter.stop()
+
+        stopped = self.timers.stop(timeout)
+
+        if getattr(self, 'api', None):
+            self.api.request_pipeline.stop(timeout)
+
+        self.database_log.flush()
+        stopped = self.web_writer.stop(timeout) and stopped
+
+        if getattr(self, 'event_manager', None):
+            # Let the network handlers send the last events
+            self.event_manager.flush(timeout)
+            self.event_manager.stop(timeout)
+
+        return stopped
+
     def _setup_event_system(self):
         handlers = []
 
@@ -176,6 +247,9 @@ class PokemonGoBot(object):
 
         # @var EventManager
         self.event_manager = EventManager(self.config.walker_limit_output, *handlers)
+        # Bots made by the tests have no database
+        if getattr(self, 'database_log', None):
+            self.database_log.event_manager = self.event_manager
         self._register_events()
         if self.config.show_events:
             self.event_manager.event_report()
@@ -194,6 +268,20 @@ class PokemonGoBot(object):
             parameters=('position', 'location')
         )
         self.event_manager.register_event('api_error')
+        self.event_manager.register_event(
+            'api_backoff',
+            parameters=('error', 'attempt', 'delay')
+        )
+        self.event_manager.register_event(
+            'api_circuit_open',
+            parameters=('error', 'failures', 'cooldown')
+        )
+        self.event_manager.register_event('api_circuit_half_open', parameters=('delay',))
+        self.event_manager.register_event('api_circuit_closed')
+        self.event_manager.register_event(
+            'api_retry_exhausted',
+            parameters=('error', 'attempts')
+        )
         self.event_manager.register_event('config_error')
 
         self.event_manager.register_event('login_started')
@@ -573,6 +661,18 @@ class PokemonGoBot(object):
             'pokemon_release',
             parameters=('pokemon', 'iv', 'cp', 'ivcp', 'candy')
         )
+        self.event_manager.register_event(
+            'pokemon_release_batch',
+            parameters=('count', 'candy', 'pokemons')
+        )
+        self.event_manager.register_event(
+            'log_compacted',
+            parameters=('rows', 'days')
+        )
+        self.event_manager.register_event(
+            'timing_stats',
+            parameters=('report', 'stats')
+        )
         self.event_manager.register_event(
             'pokemon_keep',
             parameters=('pokemon', 'iv', 'cp', 'ivcp')
@@ -688,7 +788,12 @@ class PokemonGoBot(object):
         )
 
     def tick(self):
-        self.health_record.heartbeat()
+        start = time.time()
+        self.database_log.flush_if_due()
+        if self.log_retention:
+            self.log_retention.run_if_due()
+        # Queued first so that it goes out in the same envelope as GET_MAP_OBJECTS
+        inventory_request = self._queue_inventory_refresh()
         self.cell = self.get_meta_cell()
 
         if self.sleep_schedule:
@@ -702,59 +807,46 @@ class PokemonGoBot(object):
             if timeout >= now:
                 self.fort_timeouts[fort["id"]] = timeout
 
-        self._refresh_inventory()
+        self._refresh_inventory(inventory_request)
 
         self.tick_count += 1
 
         # Check if session token has expired
         self.check_session(self.position)
 
-        for worker in self.workers:
-            if worker.work() == WorkerResult.RUNNING:
-                return
+        position = tuple(self.position[0:2])
+        if position != self._last_tick_position:
+            self._last_tick_position = position
+            self.scheduler.trigger(POSITION)
+
+        if self.config.stats and time.time() - self.last_timings_report >= self.config.stats:
+            self.report_timings()
+
+        # Only the tasks that are due run
+        self.scheduler.run(self.workers)
+        self.metrics.tick_done(time.time() - start)
+
+    def report_timings(self):
+        self.last_timings_report = time.time()
+        self.event_manager.emit(
+            'timing_stats',
+            sender=self,
+            level='info',
+            formatted='Time spent by tasks, RPCs and waits:\n{report}',
+            data={'report': shared_timings.report(), 'stats': shared_timings.stats()}
+        )
 
     def get_meta_cell(self):
         location = self.position[0:2]
-        cells = self.find_close_cells(*location)
-
-        # Combine all cells into a single dict of the items we care about.
-        forts = []
-        wild_pokemons = []
-        catchable_pokemons = []
-        nearby_pokemons = []
-        for cell in cells:
-            if "forts" in cell and len(cell["forts"]):
-                forts += cell["forts"]
-            if "wild_pokemons" in cell and len(cell["wild_pokemons"]):
-                wild_pokemons += cell["wild_pokemons"]
-            if "catchable_pokemons" in cell and len(cell["catchable_pokemons"]):
-                catchable_pokemons += cell["catchable_pokemons"]
-            if "nearby_pokemons" in cell and len(cell["nearby_pokemons"]):
-                latlng = LatLng.from_point(Cell(CellId(cell["s2_cell_id"])).get_center())
-
-                for p in cell["nearby_pokemons"]:
-                    p["latitude"] = latlng.lat().degrees
-                    p["longitude"] = latlng.lng().degrees
-                    p["s2_cell_id"] = cell["s2_cell_id"]
-
-                nearby_pokemons += cell["nearby_pokemons"]
+        cell_ids = self.update_map_cells(*location)
+        meta_cell = self.map_cell_cache.meta_cell(cell_ids)
 
         # If there are forts present in the cells sent from the server or we don't yet have any cell data, return all data retrieved
-        if len(forts) > 1 or not self.cell:
-            return {
-                "forts": forts,
-                "wild_pokemons": wild_pokemons,
-                "catchable_pokemons": catchable_pokemons,
-                "nearby_pokemons": nearby_pokemons
-            }
+        if len(meta_cell["forts"]) > 1 or not self.cell:
+            return meta_cell
         # If there are no forts present in the data from the server, keep our existing fort data and only update the pokemon cells.
         else:
-            return {
-                "forts": self.cell["forts"],
-                "wild_pokemons": wild_pokemons,
-                "catchable_pokemons": catchable_pokemons,
-                "nearby_pokemons": nearby_pokemons
-            }
+            return dict(meta_cell, forts=self.cell["forts"])
 
     def update_web_location(self, cells=[], lat=None, lng=None, alt=None):
         # we can call the function with no arguments and still get the position
@@ -774,36 +866,29 @@ class PokemonGoBot(object):
             location = self.position[0:2]
             cells = self.find_close_cells(*location)
 
+        # Unchanged files are not written again
         user_data_cells = os.path.join(_base_dir, 'data', 'cells-%s.json' % self.config.username)
-        try:
-            with open(user_data_cells, 'w') as outfile:
-                json.dump(cells, outfile)
-        except IOError as e:
-            self.logger.info('[x] Error while opening location file: %s' % e)
+        self.web_writer.write(user_data_cells, cells)
 
         user_web_location = os.path.join(
             _base_dir, 'web', 'location-%s.json' % self.config.username
         )
         # alt is unused atm but makes using *location easier
-        try:
-            with open(user_web_location, 'w') as outfile:
-                json.dump({
-                    'lat': lat,
-                    'lng': lng,
-                    'alt': alt,
-                    'cells': cells
-                }, outfile)
-        except IOError as e:
-            self.logger.info('[x] Error while opening location file: %s' % e)
+        self.web_writer.write(user_web_location, {
+            'lat': lat,
+            'lng': lng,
+            'alt': alt,
+            'cells': cells
+        })
 
         user_data_lastlocation = os.path.join(
             _base_dir, 'data', 'last-location-%s.json' % self.config.username
         )
-        try:
-            with open(user_data_lastlocation, 'w') as outfile:
-                json.dump({'lat': lat, 'lng': lng, 'alt': alt, 'start_position': self.start_position}, outfile)
-        except IOError as e:
-            self.logger.info('[x] Error while opening location file: %s' % e)
+        self.web_writer.write(
+            user_data_lastlocation,
+            {'lat': lat, 'lng': lng, 'alt': alt, 'start_position': self.start_position}
+        )
+
     def emit_forts_event(self,response_dict):
         map_objects = response_dict.get(
             'responses', {}
@@ -825,27 +910,33 @@ class PokemonGoBot(object):
                             data={'json': json.dumps(cell["forts"])}
                         )
 
-    def find_close_cells(self, lat, lng):
+    def update_map_cells(self, lat, lng):
+        """
+        Fetches the cells around the given position, only asking the server
+        for what changed since the last time each cell was seen, and returns
+        the ids of the cells that are now up to date in the map cell cache.
+        """
         cellid = get_cell_ids(lat, lng)
-        timestamp = [0, ] * len(cellid)
+        timestamp = self.map_cell_cache.timestamps_for(cellid)
         response_dict = self.get_map_objects(lat, lng, timestamp, cellid)
         map_objects = response_dict.get(
             'responses', {}
         ).get('GET_MAP_OBJECTS', {})
         status = map_objects.get('status', None)
 
-        map_cells = []
         if status and status == 1:
-            map_cells = map_objects['map_cells']
-            position = (lat, lng, 0)
-            map_cells.sort(
-                key=lambda x: distance(
-                    lat,
-                    lng,
-                    x['forts'][0]['latitude'],
-                    x['forts'][0]['longitude']) if x.get('forts', []) else 1e6
-            )
-        return map_cells
+            return cellid
+        return []
+
+    def find_close_cells(self, lat, lng):
+        map_cells = self.map_cell_cache.cells_for(self.update_map_cells(lat, lng))
+        # Cells with forts come first, closest first fort first
+        return sort_by_distance(
+            lat,
+            lng,
+            [x for x in map_cells if x.get('forts', [])],
+            key=lambda x: (x['forts'][0]['latitude'], x['forts'][0]['longitude'])
+        ) + [x for x in map_cells if not x.get('forts', [])]
 
     def check_session(self, position):
         # Check session expiry
@@ -864,7 +955,9 @@ class PokemonGoBot(object):
                     level='info',
                     formatted='Session stale, re-logging in.'
                 )
+                self.api.request_pipeline.stop()
                 self.api = ApiWrapper(config=self.config)
+                self.api.retry_policy.listeners.append(self._emit_retry_policy_event)
                 self.api.set_position(*position)
                 self.login()
                 self.api.activate_signature(self.get_encryption_lib())
@@ -893,15 +986,7 @@ class PokemonGoBot(object):
 
             sys.exit()
 
-        with self.database as conn:
-            c = conn.cursor()
-            c.execute("SELECT COUNT(name) FROM sqlite_master WHERE type='table' AND name='login'")
-
-        result = c.fetchone()
-
-        if result[0] == 1:
-            conn.execute('''INSERT INTO login (timestamp, message) VALUES (?, ?)''', (time.time(), 'LOGIN_SUCCESS'))
-        else:
+        if not self.database_log.insert('login', sender=self, timestamp=time.time(), message='LOGIN_SUCCESS'):
             self.event_manager.emit(
                 'login_failed',
                 sender=self,
@@ -945,6 +1030,7 @@ class PokemonGoBot(object):
     def _setup_api(self):
         # instantiate pgoapi @var ApiWrapper
         self.api = ApiWrapper(config=self.config)
+        self.api.retry_policy.listeners.append(self._emit_retry_policy_event)
 
         # provide player position on the earth
         self._set_starting_position()
@@ -957,6 +1043,23 @@ class PokemonGoBot(object):
         # send empty map_cells and then our position
         self.update_web_location()
 
+    def _emit_retry_policy_event(self, event, data):
+        formats = {
+            'api_backoff': ('debug', 'Request failed ({error}), retry #{attempt} in {delay:.2f}s'),
+            'api_circuit_open': ('warning', 'Server failed {failures} times in a row ({error}), pausing requests for {cooldown:.0f}s'),
+            'api_circuit_half_open': ('info', 'Trying the server again in {delay:.1f}s'),
+            'api_circuit_closed': ('info', 'Server is responding again'),
+            'api_retry_exhausted': ('warning', 'Giving up request after {attempts} attempts ({error})')
+        }
+        level, formatted = formats[event]
+        self.event_manager.emit(
+            event,
+            sender=self,
+            level=level,
+            formatted=formatted,
+            data=data
+        )
+
     def _print_character_info(self):
         # get player profile call
         # ----------------------
@@ -1298,12 +1401,16 @@ class PokemonGoBot(object):
 
         if now - self.last_heartbeat >= self.heartbeat_threshold and not self.hb_locked:
             self.last_heartbeat = now
-            request = self.api.create_request()
-            request.get_player()
-            request.check_awarded_badges()
-            responses = request.call()
-
-            if responses['responses']['GET_PLAYER']['success'] == True:
+            # No need to send these on their own, they can go out with
+            # whatever the main loop asks for next
+            player_request = self.api.queue_request('get_player')
+            badges_request = self.api.queue_request('check_awarded_badges')
+            responses = {'responses': {
+                'GET_PLAYER': player_request.result(flush=False).get('responses', {}).get('GET_PLAYER') or {},
+                'CHECK_AWARDED_BADGES': badges_request.result(flush=False).get('responses', {}).get('CHECK_AWARDED_BADGES') or {}
+            }}
+
+            if responses['responses']['GET_PLAYER'].get('success') == True:
                 # we get the player_data anyway, might as well store it
                 self._player = responses['responses']['GET_PLAYER']['player_data']
                 self.event_manager.emit(
@@ -1313,11 +1420,11 @@ class PokemonGoBot(object):
                     formatted='player_data: {player_data}',
                     data={'player_data': self._player}
                 )
-            if responses['responses']['CHECK_AWARDED_BADGES']['success'] == True:
+            if responses['responses']['CHECK_AWARDED_BADGES'].get('success') == True:
                 # store awarded_badges reponse to be used in a task or part of heartbeat
                 self._awarded_badges = responses['responses']['CHECK_AWARDED_BADGES']
 
-            if self._awarded_badges.has_key('awarded_badges'):
+            if getattr(self, '_awarded_badges', {}).has_key('awarded_badges'):
                 i = 0
                 for badge in self._awarded_badges['awarded_badges']:
                     badgelevel = self._awarded_badges['awarded_badge_levels'][i]
@@ -1331,19 +1438,7 @@ class PokemonGoBot(object):
                         data={'badge': badgename,
                               'level': badgelevel}
                     )
-                    human_behaviour.action_delay(3, 10)
-
-        try:
-            self.web_update_queue.put_nowait(True)  # do this outside of thread every tick
-        except Queue.Full:
-            pass
-
-        threading.Timer(self.heartbeat_threshold, self.heartbeat).start()
-
-    def update_web_location_worker(self):
-        while True:
-            self.web_update_queue.get()
-            self.update_web_location()
+                    action_delay(3, 10)
 
     def display_player_info(self):
             player_stats = player()
@@ -1363,31 +1458,33 @@ class PokemonGoBot(object):
                     '{}'.format(player_stats.poke_stop_visits))
 
     def get_forts(self, order_by_distance=False):
-        forts = [fort
-                 for fort in self.cell['forts']
-                 if 'latitude' in fort and 'type' in fort]
-
         if order_by_distance:
-            forts.sort(key=lambda x: distance(
-                self.position[0],
-                self.position[1],
-                x['latitude'],
-                x['longitude']
-            ))
+            return list(self.fort_index.sorted_by_distance(self.position[0], self.position[1]))
 
-        return forts
+        return self.fort_index.all()
 
     def get_map_objects(self, lat, lng, timestamp, cellid):
         if time.time() - self.last_time_map_object < self.config.map_object_cache_time:
+            self.metrics.cache_lookup('map_objects', hits=1)
             return self.last_map_object
 
-        self.last_map_object = self.api.get_map_objects(
+        self.metrics.cache_lookup('map_objects', misses=1)
+        # Cells asked with a timestamp only come back with what changed
+        delta_cells = len([t for t in timestamp if t])
+        self.metrics.cache_lookup('map_cells', hits=delta_cells, misses=len(timestamp) - delta_cells)
+
+        self.last_map_object = self.api.queue_request(
+            'get_map_objects',
             latitude=f2i(lat),
             longitude=f2i(lng),
             since_timestamp_ms=timestamp,
             cell_id=cellid
-        )
+        ).result()
         self.emit_forts_event(self.last_map_object)
+        self.scheduler.trigger(CELL)
+        self.map_cell_cache.update(
+            self.last_map_object.get('responses', {}).get('GET_MAP_OBJECTS', {}).get('map_cells', [])
+        )
         #if self.last_map_object:
         #    print self.last_map_object
         self.last_time_map_object = time.time()
@@ -1439,11 +1536,16 @@ class PokemonGoBot(object):
                 data={'path': cached_forts_path}
             )
 
-    def _refresh_inventory(self):
+    def _queue_inventory_refresh(self):
         # Perform inventory update every n seconds
         now = time.time()
         if now - self.last_inventory_refresh >= self.inventory_refresh_threshold:
-            inventory.refresh_inventory()
             self.last_inventory_refresh = now
             self.inventory_refresh_counter += 1
-            
+            return self.api.queue_request('get_inventory', last_timestamp_ms=inventory.delta_timestamp())
+
+        return None
+
+    def _refresh_inventory(self, inventory_request):
+        if inventory_request is not None:
+            inventory.refresh_inventory(inventory_request.result())
@@ -4,6 +4,8 @@ import random, base64, struct
 import hashlib
 import os
 import json
+import threading
+from collections import deque
 from pgoapi.exceptions import (ServerSideRequestThrottlingException,
                                NotLoggedInException, ServerBusyOrOfflineException,
                                NoPlayerPositionSetException, EmptySubrequestChainException,
@@ -13,6 +15,9 @@ from pgoapi.protos.POGOProtos.Networking.Requests.RequestType_pb2 import Request
 from pgoapi.utilities import get_time
 from human_behaviour import sleep, gps_noise_rng
 from pokemongo_bot.base_dir import _base_dir
+from pokemongo_bot.rate_limiter import shared_bucket
+from pokemongo_bot.retry_policy import RetryPolicy, THROTTLED, UNEXPECTED_RESPONSE, INVALID_RESPONSE
+from pokemongo_bot.timings import shared_timings
 
 
 class PermaBannedException(Exception):
@@ -45,6 +50,19 @@ class ApiWrapper(PGoApi, object):
 
         self.useVanillaRequest = False
 
+        rate_limit = getattr(config, 'rate_limit', None) or {}
+        ApiRequest.rate_limiter.configure(
+            rate=rate_limit.get('requests_per_second'),
+            capacity=rate_limit.get('burst'),
+            weights=rate_limit.get('weights')
+        )
+
+        # Requests from the main loop, the heartbeat and the pipeline share
+        # one RPC session, only let one of them talk to the server at a time
+        self.call_lock = threading.RLock()
+        self.retry_policy = RetryPolicy()
+        self.request_pipeline = RequestPipeline(self)
+
     def gen_device_id(self):
         if self.config is None or self.config.username is None:
             ApiWrapper.DEVICE_ID = "3d65919ca1c2fc3a8e2bd7cc3f974c34"
@@ -85,6 +103,18 @@ class ApiWrapper(PGoApi, object):
             self._position_alt
         )
 
+    def queue_request(self, method, **kwargs):
+        """
+        Queues a subrequest to be sent along with the other subrequests queued
+        in the meantime, in as few RPC envelopes as possible.
+        :return: A future resolving to the response of this subrequest.
+        :rtype: ApiFuture
+        """
+        return self.request_pipeline.submit(method, **kwargs)
+
+    def flush_requests(self):
+        self.request_pipeline.flush()
+
     def login(self, provider, username, password):
         # login needs base class "create_request"
         self.useVanillaRequest = True
@@ -129,13 +159,212 @@ class ApiWrapper(PGoApi, object):
         return (self.actual_lat, self.actual_lng, self.actual_alt)
 
 
+class ApiFuture(object):
+    """
+    Response of a subrequest queued through ApiWrapper.queue_request, with
+    the task that queued it.
+    """
+
+    def __init__(self, pipeline, name, task=None):
+        self.name = name
+        self.task = task
+        self._pipeline = pipeline
+        self._event = threading.Event()
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def done(self):
+        return self._event.is_set()
+
+    def result(self, timeout=None, flush=True):
+        """
+        Waits for the response. Unless flush is False, the pending subrequests
+        are sent right away instead of waiting for more to be queued.
+        The done callbacks may still be running when it returns. Never wait
+        for another future from a done callback, they run on the pipeline
+        thread.
+        """
+        if flush and not self.done():
+            self._pipeline.flush()
+
+        if not self._event.wait(timeout):
+            raise RequestTimeoutException('{} did not complete in time'.format(self.name))
+
+        if self._exception is not None:
+            raise self._exception
+
+        return self._result
+
+    def add_done_callback(self, callback):
+        with self._lock:
+            if not self.done():
+                self._callbacks.append(callback)
+                return
+
+        callback(self)
+
+    def _set(self, result=None, exception=None):
+        with self._lock:
+            self._result = result
+            self._exception = exception
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                logging.getLogger(__name__).exception('Error in callback for %s', self.name)
+
+
+class RequestTimeoutException(Exception):
+    pass
+
+
+class RequestPipeline(object):
+    """
+    Collects subrequests and sends them from a background thread.
+
+    Everything queued until the next flush is merged into one RPC envelope,
+    or a few if the same subrequest was queued more than once, since the
+    server answers with one response per subrequest type. Subrequests that
+    nobody is waiting for are flushed after max_delay seconds. An envelope
+    is charged to the task that queued its first subrequest.
+    """
+
+    def __init__(self, api, max_delay=1.0):
+        self.api = api
+        self.max_delay = max_delay
+        self.logger = logging.getLogger(__name__)
+        self._condition = threading.Condition()
+        self._pending = []
+        self._pending_since = None
+        self._envelopes = deque()
+        self._thread = None
+        self._stopped = False
+
+    def submit(self, method, **kwargs):
+        future = ApiFuture(self, method.upper(), shared_timings.current_task())
+
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError('Request pipeline is stopped')
+
+            if not self._pending:
+                self._pending_since = time.time()
+            self._pending.append((method, kwargs, future))
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='RequestPipeline')
+                self._thread.daemon = True
+                self._thread.start()
+
+            self._condition.notify()
+
+        return future
+
+    def flush(self):
+        with self._condition:
+            self._flush()
+            self._condition.notify()
+
+    def stop(self, timeout=None):
+        # Whatever is still queued is sent before the thread exits
+        with self._condition:
+            self._stopped = True
+            self._flush()
+            self._condition.notify()
+
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _flush(self):
+        for envelope in self.split_envelopes(self._pending):
+            self._envelopes.append(envelope)
+
+        self._pending = []
+        self._pending_since = None
+
+    @staticmethod
+    def split_envelopes(pending):
+        envelopes = []
+
+        for entry in pending:
+            for envelope in envelopes:
+                if all(queued[2].name != entry[2].name for queued in envelope):
+                    envelope.append(entry)
+                    break
+            else:
+                envelopes.append([entry])
+
+        return envelopes
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._envelopes:
+                    if self._pending:
+                        wait = self._pending_since + self.max_delay - time.time()
+
+                        if wait <= 0:
+                            self._flush()
+                            continue
+
+                        self._condition.wait(wait)
+                    elif self._stopped:
+                        return
+                    else:
+                        self._condition.wait()
+
+                envelope = self._envelopes.popleft()
+
+            self._execute(envelope)
+
+    def _execute(self, envelope):
+        with shared_timings.charged_to(envelope[0][2].task):
+            self._send(envelope)
+
+    def _send(self, envelope):
+        try:
+            request = self.api.create_request()
+
+            for method, kwargs, _ in envelope:
+                getattr(request, method)(**kwargs)
+
+            response = request.call()
+            results = []
+
+            for _, _, future in envelope:
+                if not isinstance(response, dict) or not isinstance(response.get('responses'), dict):
+                    # Failed call, callers read it with .get('responses', {})
+                    results.append({})
+                    continue
+
+                # Hand each caller the envelope as if it had been sent alone
+                result = dict(response)
+                responses = response['responses']
+                result['responses'] = {future.name: responses[future.name]} if future.name in responses else {}
+                results.append(result)
+        except Exception as e:
+            for _, _, future in envelope:
+                future._set(exception=e)
+            return
+
+        for (_, _, future), result in zip(envelope, results):
+            future._set(result=result)
+
+
 class ApiRequest(PGoApiRequest):
+    rate_limiter = shared_bucket
+
     def __init__(self, *args):
         PGoApiRequest.__init__(self, *args)
+        self.call_lock = getattr(args[0], 'call_lock', None) or threading.RLock()
+        self.retry_policy = getattr(args[0], 'retry_policy', None) or RetryPolicy()
         self.logger = logging.getLogger(__name__)
         self.request_callers = []
-        self.last_api_request_time = None
-        self.requests_per_seconds = 2
 
     def can_call(self):
         if not self._req_method_list:
@@ -186,58 +415,51 @@ class ApiRequest(PGoApiRequest):
         return True
 
     def call(self, max_retry=15):
+        with self.call_lock:
+            return self._call_with_retries(max_retry)
+
+    def _call_with_retries(self, max_retry):
         request_callers = self._pop_request_callers()
         if not self.can_call():
             return False  # currently this is never ran, exceptions are raised before
 
-        request_timestamp = None
         api_req_method_list = self._req_method_list
         result = None
-        try_cnt = 0
-        throttling_retry = 0
-        unexpected_response_retry = 0
+        attempts = {}
         while True:
-            request_timestamp = self.throttle_sleep()
+            wait = self.retry_policy.before_call()
+            if wait > 0:
+                self.logger.warning(
+                    'Server keeps failing, pausing requests for {:.1f} seconds.'.format(wait))
+                sleep(wait, delta=0, kind='retry')
+
+            self.throttle_sleep(request_callers)
             # self._call internally clear this field, so save it
             self._req_method_list = [req_method for req_method in api_req_method_list]
-            should_throttle_retry = False
-            should_unexpected_response_retry = False
+            error = None
+            start = time.time()
             try:
                 result = self._call()
             except ServerSideRequestThrottlingException:
-                should_throttle_retry = True
+                error = THROTTLED
             except UnexpectedResponseException:
-                should_unexpected_response_retry = True
-
-            if should_throttle_retry:
-                throttling_retry += 1
-                if throttling_retry >= max_retry:
-                    raise ServerSideRequestThrottlingException('Server throttled too many times')
-                sleep(1)  # huge sleep ?
-                continue  # skip response checking
-
-            if should_unexpected_response_retry:
-                unexpected_response_retry += 1
-                if unexpected_response_retry >= 5:
-                    self.logger.warning(
-                        'Server is not responding correctly to our requests.  Waiting for 30 seconds to reconnect.')
-                    sleep(30)
-                else:
-                    sleep(2)
-                continue
-
-            if not self.is_response_valid(result, request_callers):
-                try_cnt += 1
-                if try_cnt > 3:
-                    self.logger.warning(
-                        'Server seems to be busy or offline - try again - {}/{}'.format(try_cnt, max_retry))
-                if try_cnt >= max_retry:
-                    raise ServerBusyOrOfflineException()
-                sleep(1)
+                error = UNEXPECTED_RESPONSE
             else:
+                if not self.is_response_valid(result, request_callers):
+                    error = INVALID_RESPONSE
+            shared_timings.rpc(request_callers, time.time() - start, error=error is not None)
+
+            if error is None:
+                self.retry_policy.on_success()
                 break
 
-        self.last_api_request_time = request_timestamp
+            attempts[error] = attempts.get(error, 0) + 1
+            if error == INVALID_RESPONSE and attempts[error] > 3:
+                self.logger.warning(
+                    'Server seems to be busy or offline - try again - {}/{}'.format(attempts[error], max_retry))
+
+            sleep(self.retry_policy.on_failure(error, attempts[error], max_retry), delta=0, kind='retry')
+
         return result
 
     def __getattr__(self, func):
@@ -245,14 +467,8 @@ class ApiRequest(PGoApiRequest):
             self.request_callers.append(func)
         return PGoApiRequest.__getattr__(self, func)
 
-    def throttle_sleep(self):
-        now_milliseconds = time.time() * 1000
-        required_delay_between_requests = 1000 / self.requests_per_seconds
-
-        difference = now_milliseconds - (self.last_api_request_time if self.last_api_request_time else 0)
-
-        if self.last_api_request_time != None and difference < required_delay_between_requests:
-            sleep_time = required_delay_between_requests - difference
-            time.sleep(sleep_time / 1000)
-
-        return now_milliseconds
+    def throttle_sleep(self, request_callers=()):
+        delay = self.rate_limiter.acquire(request_callers)
+        if delay > 0:
+            shared_timings.wait('throttle', delay)
+        return delay
@@ -5,6 +5,9 @@ import time
 
 class BaseTask(object):
   TASK_API_VERSION = 1
+  # What makes the TaskScheduler run the task before its next_run_time:
+  # 'inventory', 'cell' or 'position'
+  triggers = ()
 
   def __init__(self, bot, config):
     """
@@ -54,5 +57,12 @@ class BaseTask(object):
           )
 
 
+  def next_run_time(self):
+    """
+    When the task needs to run next, as a timestamp. 0 runs it on every
+    tick, None only when one of its triggers happens.
+    """
+    return 0
+
   def initialize(self):
     pass
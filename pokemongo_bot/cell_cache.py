@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import threading
+from collections import OrderedDict
+
+from s2sphere import Cell, CellId, LatLng
+
+POKEMON_KEYS = ('wild_pokemons', 'catchable_pokemons', 'nearby_pokemons')
+STATIC_KEYS = ('spawn_points', 'decimated_spawn_points', 'fort_summaries')
+
+
+class CachedCell(object):
+    """
+    Last known content of a single S2 cell.
+
+    Forts are kept indexed by id so that the partial fort lists the server
+    sends back for a non zero since_timestamp_ms can be merged in place.
+    Pokemons are transient and are always replaced by the latest response.
+    """
+
+    def __init__(self, s2_cell_id):
+        self.s2_cell_id = s2_cell_id
+        self.current_timestamp_ms = 0
+        self.forts = OrderedDict()
+        self.pokemons = {key: [] for key in POKEMON_KEYS}
+        self.static = {}
+        self.version = 0
+
+        latlng = LatLng.from_point(Cell(CellId(s2_cell_id)).get_center())
+        self.center = (latlng.lat().degrees, latlng.lng().degrees)
+
+    def merge(self, map_cell):
+        changed = False
+
+        for fort in map_cell.get('forts', []):
+            if self.forts.get(fort['id']) != fort:
+                self.forts[fort['id']] = fort
+                changed = True
+
+        for object_id in map_cell.get('deleted_objects', []):
+            if self.forts.pop(object_id, None) is not None:
+                changed = True
+
+        for key in POKEMON_KEYS:
+            pokemons = map_cell.get(key, [])
+
+            if key == 'nearby_pokemons':
+                for p in pokemons:
+                    p['latitude'], p['longitude'] = self.center
+                    p['s2_cell_id'] = self.s2_cell_id
+
+            if self.pokemons[key] != pokemons:
+                self.pokemons[key] = pokemons
+                changed = True
+
+        for key in STATIC_KEYS:
+            if key in map_cell and self.static.get(key) != map_cell[key]:
+                self.static[key] = map_cell[key]
+                changed = True
+
+        # A truncated list means we did not get everything newer than the
+        # timestamp we sent, so ask for the whole cell again next time.
+        if map_cell.get('is_truncated_list', False):
+            self.current_timestamp_ms = 0
+        else:
+            self.current_timestamp_ms = map_cell.get('current_timestamp_ms', self.current_timestamp_ms)
+
+        if changed:
+            self.version += 1
+
+        return changed
+
+    def to_dict(self):
+        map_cell = {
+            's2_cell_id': self.s2_cell_id,
+            'current_timestamp_ms': self.current_timestamp_ms
+        }
+        map_cell.update(self.static)
+
+        if self.forts:
+            map_cell['forts'] = self.forts.values()
+
+        for key in POKEMON_KEYS:
+            if self.pokemons[key]:
+                map_cell[key] = self.pokemons[key]
+
+        return map_cell
+
+
+class MapCellCache(object):
+    """
+    Persistent store of the map cells seen by the bot, keyed by S2 cell id.
+
+    Every cell remembers the current_timestamp_ms of the last response that
+    contained it, which is sent back as since_timestamp_ms so that the server
+    only returns the forts that changed. The combined view of forts and
+    pokemons used by the workers is only rebuilt when one of the requested
+    cells actually changed.
+    """
+
+    def __init__(self, max_cells=500):
+        self.max_cells = max_cells
+        self._cells = OrderedDict()
+        self._lock = threading.RLock()
+        self._meta_key = None
+        self._meta_cell = None
+
+    def __len__(self):
+        return len(self._cells)
+
+    def timestamps_for(self, cell_ids):
+        with self._lock:
+            return [self._cells[cell_id].current_timestamp_ms if cell_id in self._cells else 0
+                    for cell_id in cell_ids]
+
+    def update(self, map_cells):
+        changed = False
+
+        with self._lock:
+            for map_cell in map_cells:
+                cell_id = map_cell['s2_cell_id']
+                cached_cell = self._cells.pop(cell_id, None)
+
+                if cached_cell is None:
+                    cached_cell = CachedCell(cell_id)
+
+                # Re-insert so that the least recently seen cells come first
+                self._cells[cell_id] = cached_cell
+                changed = cached_cell.merge(map_cell) or changed
+
+            while len(self._cells) > self.max_cells:
+                self._cells.popitem(last=False)
+
+        return changed
+
+    def cells_for(self, cell_ids):
+        with self._lock:
+            return [self._cells[cell_id].to_dict() for cell_id in cell_ids if cell_id in self._cells]
+
+    def meta_cell(self, cell_ids):
+        with self._lock:
+            cells = [self._cells[cell_id] for cell_id in cell_ids if cell_id in self._cells]
+            key = tuple((c.s2_cell_id, c.version) for c in cells)
+
+            if key != self._meta_key:
+                meta_cell = {'forts': []}
+                meta_cell.update({k: [] for k in POKEMON_KEYS})
+
+                for cell in cells:
+                    meta_cell['forts'].extend(cell.forts.itervalues())
+
+                    for k in POKEMON_KEYS:
+                        meta_cell[k].extend(cell.pokemons[k])
+
+                self._meta_key = key
+                self._meta_cell = meta_cell
+
+            return self._meta_cell
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self._meta_key = None
+            self._meta_cell = None
@@ -8,6 +8,7 @@ from geopy.distance import great_circle
 from pokemongo_bot.base_task import BaseTask
 from pokemongo_bot.cell_workers.utils import coord2merc, merc2coord
 from pokemongo_bot.constants import Constants
+from pokemongo_bot.fort_index import FortIndex
 from pokemongo_bot.walkers.polyline_walker import PolylineWalker
 from pokemongo_bot.worker_result import WorkerResult
 from pokemongo_bot.item_list import Item
@@ -26,6 +27,8 @@ class CampFort(BaseTask):
 
     def initialize(self):
         self.clusters = None
+        self.clustered_forts = {}
+        self.pair_clusters = {}
         self.cluster = None
         self.walker = None
         self.stay_until = 0
@@ -72,8 +75,7 @@ class CampFort(BaseTask):
         forts = self.get_forts()
 
         if self.cluster is None:
-            if self.clusters is None:
-                self.clusters = self.get_clusters(forts.values())
+            self.clusters = self.get_clusters(forts)
 
             available_clusters = self.get_available_clusters(forts)
 
@@ -122,8 +124,7 @@ class CampFort(BaseTask):
     def get_forts(self):
         radius = self.config_max_distance + Constants.MAX_DISTANCE_FORT_IS_REACHABLE
 
-        forts = [f for f in self.bot.cell["forts"] if ("latitude" in f) and ("type" in f)]
-        forts = [f for f in forts if self.get_distance(self.bot.start_position, f) <= radius]
+        forts = self.bot.fort_index.within(self.bot.start_position[0], self.bot.start_position[1], radius)
 
         return {f["id"]: f for f in forts}
 
@@ -139,70 +140,110 @@ class CampFort(BaseTask):
         return available_clusters
 
     def get_clusters(self, forts):
-        clusters = []
-        points = self.get_all_snap_points(forts)
+        """
+        Returns one cluster per pair of forts that fit in a common circle.
 
-        for c1, c2, fort1, fort2 in points:
-            cluster_1 = self.get_cluster(forts, c1)
-            cluster_2 = self.get_cluster(forts, c2)
+        Clusters are cached per pair and only the pairs close enough to a fort
+        that appeared, disappeared, moved or got or lost a lure since the last
+        call are computed again. The bot position only breaks ties between the
+        two circles of a pair, so moving does not invalidate the cache.
+        """
+        added = [f for i, f in forts.iteritems()
+                 if i not in self.clustered_forts or self.fort_changed(self.clustered_forts[i], f)]
+        removed = [f for i, f in self.clustered_forts.iteritems()
+                   if i not in forts or self.fort_changed(f, forts[i])]
 
-            self.update_cluster_distance(cluster_1)
-            self.update_cluster_distance(cluster_2)
+        if self.clusters is not None and not added and not removed:
+            return self.clusters
 
-            key_1 = self.get_cluster_key(cluster_1)
-            key_2 = self.get_cluster_key(cluster_2)
+        index = FortIndex()
+        index.update(forts.values())
+        reach = 2 * Constants.MAX_DISTANCE_FORT_IS_REACHABLE + 1
 
-            radius = Constants.MAX_DISTANCE_FORT_IS_REACHABLE
+        # Any circle through a fort only reaches forts within twice the radius
+        # of it, so only pairs around the changed forts can have changed.
+        affected = set(f["id"] for f in added + removed)
 
-            if key_1 >= key_2:
-                cluster = cluster_1
+        for fort in added + removed:
+            affected.update(f["id"] for f in index.within(fort["latitude"], fort["longitude"], reach))
 
-                while True:
-                    new_circle, _ = self.get_enclosing_circles(fort1, fort2, radius - 1)
+        self.pair_clusters = {k: c for k, c in self.pair_clusters.iteritems()
+                              if k[0] not in affected and k[1] not in affected}
 
-                    if not new_circle:
-                        break
+        for fort in [forts[i] for i in affected if i in forts]:
+            for other in index.within(fort["latitude"], fort["longitude"], reach):
+                if other is fort:
+                    continue
 
-                    new_cluster = self.get_cluster(cluster["forts"], new_circle)
+                fort1, fort2 = sorted((fort, other), key=lambda f: f["id"])
+                key = (fort1["id"], fort2["id"])
 
-                    if len(new_cluster["forts"]) < len(cluster["forts"]):
-                        break
+                if key not in self.pair_clusters:
+                    self.pair_clusters[key] = self.get_pair_cluster(index, fort1, fort2)
 
-                    cluster = new_cluster
-                    radius -= 1
-            else:
-                cluster = cluster_2
+        self.clustered_forts = dict(forts)
+
+        return [c for c in self.pair_clusters.itervalues() if c is not None]
 
-                while True:
-                    _, new_circle = self.get_enclosing_circles(fort1, fort2, radius - 1)
+    def fort_changed(self, old, new):
+        return (old["latitude"], old["longitude"], old.get("active_fort_modifier") is None) != \
+               (new["latitude"], new["longitude"], new.get("active_fort_modifier") is None)
 
-                    if not new_circle:
-                        break
+    def get_pair_cluster(self, index, fort1, fort2):
+        radius = Constants.MAX_DISTANCE_FORT_IS_REACHABLE
+        c1, c2 = self.get_enclosing_circles(fort1, fort2, radius)
 
-                    new_cluster = self.get_cluster(cluster["forts"], new_circle)
+        if not c1 or not c2:
+            return None
 
-                    if len(new_cluster["forts"]) < len(cluster["forts"]):
-                        break
+        cluster_1 = self.get_cluster(self.get_forts_near(index, c1), c1)
+        cluster_2 = self.get_cluster(self.get_forts_near(index, c2), c2)
 
-                    cluster = new_cluster
-                    radius -= 1
+        self.update_cluster_distance(cluster_1)
+        self.update_cluster_distance(cluster_2)
 
-            clusters.append(cluster)
+        key_1 = self.get_cluster_key(cluster_1)
+        key_2 = self.get_cluster_key(cluster_2)
 
-        return clusters
+        if key_1 >= key_2:
+            cluster = cluster_1
 
-    def get_all_snap_points(self, forts):
-        points = []
-        radius = Constants.MAX_DISTANCE_FORT_IS_REACHABLE
+            while True:
+                new_circle, _ = self.get_enclosing_circles(fort1, fort2, radius - 1)
+
+                if not new_circle:
+                    break
+
+                new_cluster = self.get_cluster(cluster["forts"], new_circle)
+
+                if len(new_cluster["forts"]) < len(cluster["forts"]):
+                    break
 
-        for i in range(0, len(forts)):
-            for j in range(i + 1, len(forts)):
-                c1, c2 = self.get_enclosing_circles(forts[i], forts[j], radius)
+                cluster = new_cluster
+                radius -= 1
+        else:
+            cluster = cluster_2
 
-                if c1 and c2:
-                    points.append((c1, c2, forts[i], forts[j]))
+            while True:
+                _, new_circle = self.get_enclosing_circles(fort1, fort2, radius - 1)
+
+                if not new_circle:
+                    break
+
+                new_cluster = self.get_cluster(cluster["forts"], new_circle)
+
+                if len(new_cluster["forts"]) < len(cluster["forts"]):
+                    break
+
+                cluster = new_cluster
+                radius -= 1
+
+        return cluster
 
-        return points
+    def get_forts_near(self, index, circle):
+        # Index distances use a slightly different earth radius than
+        # great_circle, leave some margin before the exact check.
+        return index.within(circle[0], circle[1], circle[2] + 1)
 
     def get_enclosing_circles(self, fort1, fort2, radius):
         x1, y1 = coord2merc(fort1["latitude"], fort1["longitude"])
@@ -182,23 +182,6 @@ class EvolvePokemon(BaseTask):
             sleep(0.7)
             evolve_result = False
 
-        with self.bot.database as conn:
-            c = conn.cursor()
-            c.execute("SELECT COUNT(name) FROM sqlite_master WHERE type='table' AND name='evolve_log'")
-
-        result = c.fetchone()
-
-        while True:
-            if result[0] == 1:
-                conn.execute('''INSERT INTO evolve_log (pokemon, iv, cp) VALUES (?, ?, ?)''', (pokemon.name, pokemon.iv, pokemon.cp))
-                break
-            else:
-                self.emit_event(
-                    'evolve_log',
-                    sender=self,
-                    level='info',
-                    formatted="evolve_log table not found, skipping log"
-                )
-                break
+        self.bot.database_log.insert('evolve_log', sender=self, pokemon=pokemon.name, iv=pokemon.iv, cp=pokemon.cp)
 
         return evolve_result
@@ -5,7 +5,7 @@ import gpxpy.gpx
 import json
 import time
 from pokemongo_bot.base_task import BaseTask
-from pokemongo_bot.cell_workers.utils import distance, i2f, format_dist
+from pokemongo_bot.cell_workers.utils import distance, distances, i2f, format_dist
 from pokemongo_bot.human_behaviour import sleep
 from pokemongo_bot.walkers.walker_factory import walker_factory
 from pokemongo_bot.worker_result import WorkerResult
@@ -97,26 +97,17 @@ class FollowPath(BaseTask):
         return points
 
     def find_closest_point_idx(self, points):
-        return_idx = 0
-        min_distance = float("inf");
-        
-        for index in range(len(points)):
-            point = points[index]
-            lat = point['lat']
-            lng = point['lng']
-
-            dist = distance(
-                self.bot.position[0],
-                self.bot.position[1],
-                lat,
-                lng
-            )
-
-            if dist < min_distance:
-                min_distance = dist
-                return_idx = index
+        if not points:
+            return 0
+
+        dists = distances(
+            self.bot.position[0],
+            self.bot.position[1],
+            [point['lat'] for point in points],
+            [point['lng'] for point in points]
+        )
 
-        return return_idx
+        return int(dists.argmin())
 
     def endLaps(self):
         duration = int(uniform(self.timer_restart_min, self.timer_restart_max))
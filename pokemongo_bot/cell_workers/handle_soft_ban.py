@@ -16,7 +16,7 @@ class HandleSoftBan(BaseTask):
         if not self.should_run():
             return
 
-        forts = self.bot.get_forts(order_by_distance=True)
+        forts = self.bot.fort_index.nearest(self.bot.position[0], self.bot.position[1], k=1)
 
         if len(forts) == 0:
             return
@@ -1,3 +1,4 @@
+import time
 from datetime import datetime, timedelta
 
 from pokemongo_bot import inventory
@@ -8,6 +9,8 @@ from pokemongo_bot.worker_result import WorkerResult
 
 class IncubateEggs(BaseTask):
     SUPPORTED_TASK_API_VERSION = 1
+    # Eggs only hatch and incubators only free up with an inventory change
+    triggers = ('inventory',)
 
     last_km_walked = 0
 
@@ -227,22 +230,7 @@ class IncubateEggs(BaseTask):
             inventory.player().exp += xp[i]
             self.bot.stardust += stardust[i]
             
-            with self.bot.database as conn:
-                c = conn.cursor()
-                c.execute("SELECT COUNT(name) FROM sqlite_master WHERE type='table' AND name='eggs_hatched_log'")
-            result = c.fetchone()
-            while True:
-                if result[0] == 1:
-                    conn.execute('''INSERT INTO eggs_hatched_log (pokemon, cp, iv, pokemon_id) VALUES (?, ?, ?, ?)''', (pokemon.name, pokemon.cp, pokemon.iv, pokemon.pokemon_id))
-                    break
-                else:
-                    self.emit_event(
-                        'eggs_hatched_log',
-                        sender=self,
-                        level='info',
-                        formatted="eggs_hatched_log table not found, skipping log"
-                    )
-                    break
+            self.bot.database_log.insert('eggs_hatched_log', sender=self, pokemon=pokemon.name, cp=pokemon.cp, iv=pokemon.iv, pokemon_id=pokemon.pokemon_id)
             
         self.bot.metrics.hatched_eggs(len(pokemon_list))
         return True
@@ -278,3 +266,13 @@ class IncubateEggs(BaseTask):
         :rtype: None
         """
         self.next_update = datetime.now() + timedelta(seconds=self.min_interval)
+
+    def next_run_time(self):
+        """
+        Returns when the eggs should be displayed next, for the TaskScheduler.
+        :return: A timestamp, 0 for now.
+        :rtype: float
+        """
+        if self.next_update is None:
+            return 0
+        return time.mktime(self.next_update.timetuple())
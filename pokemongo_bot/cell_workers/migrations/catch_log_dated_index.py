@@ -0,0 +1,5 @@
+from yoyo import step
+
+step(
+    "CREATE INDEX IF NOT EXISTS catch_log_dated ON catch_log (dated)"
+)
@@ -0,0 +1,5 @@
+from yoyo import step
+
+step(
+    "CREATE TABLE IF NOT EXISTS log_daily (log text, day date, count integer, PRIMARY KEY (log, day))"
+)
@@ -0,0 +1,5 @@
+from yoyo import step
+
+step(
+    "CREATE INDEX IF NOT EXISTS pokestop_log_dated ON pokestop_log (dated)"
+)
@@ -0,0 +1,5 @@
+from yoyo import step
+
+step(
+    "CREATE INDEX IF NOT EXISTS vanish_log_dated ON vanish_log (dated)"
+)
@@ -63,7 +63,7 @@ import requests
 
 from pokemongo_bot import inventory
 from pokemongo_bot.base_dir import _base_dir
-from pokemongo_bot.cell_workers.utils import distance, format_dist, format_time, fort_details
+from pokemongo_bot.cell_workers.utils import distance, distances, format_dist, format_time, fort_details
 from pokemongo_bot.walkers.walker_factory import walker_factory
 from pokemongo_bot.worker_result import WorkerResult
 from pokemongo_bot.base_task import BaseTask
@@ -107,6 +107,7 @@ class MoveToMapPokemon(BaseTask):
             return pokemons
 
         now = int(time.time())
+        candidates = []
 
         for pokemon in pokemon_list:
             try:
@@ -136,12 +137,20 @@ class MoveToMapPokemon(BaseTask):
                 continue
 
             pokemon['priority'] = self.config['catch'].get(pokemon['name'], 0)
-            pokemon['dist'] = distance(
-                self.bot.position[0],
-                self.bot.position[1],
-                pokemon['latitude'],
-                pokemon['longitude']
-            )
+            candidates.append(pokemon)
+
+        if not candidates:
+            return pokemons
+
+        dists = distances(
+            self.bot.position[0],
+            self.bot.position[1],
+            [pokemon['latitude'] for pokemon in candidates],
+            [pokemon['longitude'] for pokemon in candidates]
+        )
+
+        for pokemon, dist in zip(candidates, dists):
+            pokemon['dist'] = float(dist)
 
             # If distance to pokemon greater than the max_sniping_distance, then ignore regardless of "snipe" setting
             if pokemon['dist'] > self.config.get('max_sniping_distance', 10000):
@@ -491,22 +500,22 @@ class MoveToMapPokemon(BaseTask):
 
         # Remove stops that are still on timeout
         forts = filter(lambda x: x["id"] not in self.bot.fort_timeouts, forts)
-        i = 0
-        while i < len(forts):
-            ratio = float(self.config.get('max_extra_dist_fort', 20))
-            dist_self_to_fort = distance(self.bot.position[0], self.bot.position[1], forts[i]['latitude'],
-                                         forts[i]['longitude'])
-            dist_fort_to_pokemon = distance(pokemon['latitude'], pokemon['longitude'], forts[i]['latitude'],
-                                            forts[i]['longitude'])
-            total_dist = dist_self_to_fort + dist_fort_to_pokemon
-            dist_self_to_pokemon = distance(self.bot.position[0], self.bot.position[1], pokemon['latitude'],
-                                            pokemon['longitude'])
-            if total_dist < (1 + (ratio / 100)) * dist_self_to_pokemon:
-                i += 1
-            else:
-                del forts[i]
-            # Return nearest fort if there are remaining
-        if len(forts):
-            return forts[0]
+
+        if not forts:
+            return None
+
+        ratio = float(self.config.get('max_extra_dist_fort', 20))
+        lats = [fort['latitude'] for fort in forts]
+        lngs = [fort['longitude'] for fort in forts]
+        dist_self_to_fort = distances(self.bot.position[0], self.bot.position[1], lats, lngs)
+        dist_fort_to_pokemon = distances(pokemon['latitude'], pokemon['longitude'], lats, lngs)
+        total_dist = dist_self_to_fort + dist_fort_to_pokemon
+        dist_self_to_pokemon = distance(self.bot.position[0], self.bot.position[1], pokemon['latitude'],
+                                        pokemon['longitude'])
+
+        # Return nearest fort if there are remaining
+        on_the_way = (total_dist < (1 + (ratio / 100)) * dist_self_to_pokemon).nonzero()[0]
+        if len(on_the_way):
+            return forts[on_the_way[0]]
         else:
             return None
@@ -207,7 +207,11 @@ class NicknamePokemon(BaseTask):
         """
         Iterate over all user pokemons and nickname if needed
         """
-        for pokemon in pokemons().all():  # type: Pokemon
+        bag = pokemons()
+        # compute the stats used by the templates for the whole bag at once
+        bag.evaluate()
+
+        for pokemon in bag.all():  # type: Pokemon
             if not pokemon.is_favorite or not self.ignore_favorites:
                 if pokemon.iv >= self.nickname_above_iv:
                     if self._nickname_pokemon(pokemon):
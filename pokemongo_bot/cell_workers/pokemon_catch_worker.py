@@ -183,12 +183,7 @@ class PokemonCatchWorker(BaseTask):
             self.emit_event('vip_pokemon', formatted='This is a VIP pokemon. Catch!!!')
 
         # check catch limits before catch
-        with self.bot.database as conn:
-            c = conn.cursor()
-            c.execute("SELECT DISTINCT COUNT(encounter_id) FROM catch_log WHERE dated >= datetime('now','-1 day')")
-
-        result = c.fetchone()
-        self.caught_last_24_hour = result[0]
+        self.caught_last_24_hour = self.bot.database_log.count_recent('catch_log')
 
         while True:
             if self.caught_last_24_hour < self.daily_catch_limit:
@@ -380,24 +375,7 @@ class PokemonCatchWorker(BaseTask):
                     level='warning',
                     formatted='Failed to use berry. You may be softbanned.'
                 )
-                with self.bot.database as conn:
-                    c = conn.cursor()
-                    c.execute("SELECT COUNT(name) FROM sqlite_master WHERE type='table' AND name='softban_log'")
-                result = c.fetchone()
-
-                while True:
-                    if result[0] == 1:
-                        source = str("PokemonCatchWorker")
-                        status = str("Possible Softban")
-                        conn.execute('''INSERT INTO softban_log (status, source) VALUES (?, ?)''', (status, source))
-                    break
-                else:
-                    self.emit_event(
-                        'softban_log',
-                        sender=self,
-                        level='info',
-                        formatted="softban_log table not found, skipping log"
-                    )
+                self.bot.database_log.insert('softban_log', sender=self, status=str("Possible Softban"), source=str("PokemonCatchWorker"))
 
         # unknown status code
         else:
@@ -559,23 +537,8 @@ class PokemonCatchWorker(BaseTask):
             # abandon if pokemon vanished
             elif catch_pokemon_status == CATCH_STATUS_VANISHED:
                 #insert into DB
-                with self.bot.database as conn:
-                    c = conn.cursor()
-                    c.execute("SELECT COUNT(name) FROM sqlite_master WHERE type='table' AND name='vanish_log'")
-                result = c.fetchone()
-
-                while True:
-                    if result[0] == 1:
-                        conn.execute('''INSERT INTO vanish_log (pokemon, cp, iv, encounter_id, pokemon_id) VALUES (?, ?, ?, ?, ?)''', (pokemon.name, pokemon.cp, pokemon.iv, str(encounter_id), pokemon.pokemon_id))
-                    break
-                else:
-                    self.emit_event(
-                        'vanish_log',
-                        sender=self,
-                        level='info',
-                        formatted="vanish_log table not found, skipping log"
-                    )
-                    break
+                self.bot.database_log.insert('vanish_log', sender=self, pokemon=pokemon.name, cp=pokemon.cp, iv=pokemon.iv,
+                                             encounter_id=str(encounter_id), pokemon_id=pokemon.pokemon_id)
 
                 self.emit_event(
                     'pokemon_vanished',
@@ -589,6 +552,7 @@ class PokemonCatchWorker(BaseTask):
                     }
                 )
 
+                self.bot.database_log.flush()
                 with self.bot.database as conn:
                     c = conn.cursor()
                     c.execute("SELECT DISTINCT COUNT(encounter_id) FROM vanish_log WHERE dated > (SELECT dated FROM catch_log WHERE dated IN (SELECT MAX(dated) FROM catch_log))")
@@ -651,23 +615,8 @@ class PokemonCatchWorker(BaseTask):
 
 
                 try:
-                    with self.bot.database as conn:
-                        c = conn.cursor()
-                        c.execute("SELECT COUNT(name) FROM sqlite_master WHERE type='table' AND name='catch_log'")
-                    result = c.fetchone()
-
-                    while True:
-                        if result[0] == 1:
-                            conn.execute('''INSERT INTO catch_log (pokemon, cp, iv, encounter_id, pokemon_id) VALUES (?, ?, ?, ?, ?)''', (pokemon.name, pokemon.cp, pokemon.iv, str(encounter_id), pokemon.pokemon_id))
-                        break
-                    else:
-                        self.emit_event(
-                            'catch_log',
-                            sender=self,
-                            level='info',
-                            formatted="catch_log table not found, skipping log"
-                        )
-                        break
+                    self.bot.database_log.insert('catch_log', sender=self, pokemon=pokemon.name, cp=pokemon.cp, iv=pokemon.iv,
+                                                 encounter_id=str(encounter_id), pokemon_id=pokemon.pokemon_id)
                     user_data_caught = os.path.join(_base_dir, 'data', 'caught-%s.json' % self.bot.config.username)
                     with open(user_data_caught, 'ab') as outfile:
                         outfile.write(str(datetime.now()))
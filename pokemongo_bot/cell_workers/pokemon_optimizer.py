@@ -1,14 +1,18 @@
 import difflib
-import itertools
 import json
 import math
 import os
 
+import numpy as np
+
 from pokemongo_bot import inventory
 from pokemongo_bot.base_dir import _base_dir
 from pokemongo_bot.base_task import BaseTask
+from pokemongo_bot.evolution_planner import EvolutionPlanner, FamilyPlan, EVOLVE, EVOLVE_FOR_XP, EVOLVE_XP, NEW_POKEDEX_ENTRY_XP
 from pokemongo_bot.human_behaviour import sleep, action_delay
 from pokemongo_bot.item_list import Item
+from pokemongo_bot.pokemon_ranking import PokemonTable, RuleEvaluator, unique_rows
+from pokemongo_bot.pokemon_release import PokemonReleaser
 from pokemongo_bot.tree_config_builder import ConfigException
 from pokemongo_bot.worker_result import WorkerResult
 
@@ -60,6 +64,9 @@ class PokemonOptimizer(BaseTask):
         if (not self.config_may_use_lucky_egg) and self.config_evolve_only_with_lucky_egg:
             self.config_evolve = False
 
+        self.planner = EvolutionPlanner(self.pokemon_upgrade_cost, self.config_evolve_time)
+        self.releaser = PokemonReleaser(self, self.config_transfer_wait_min, self.config_transfer_wait_max)
+
     def get_pokemon_slot_left(self):
         pokemon_count = inventory.Pokemons.get_space_used()
 
@@ -76,102 +83,50 @@ class PokemonOptimizer(BaseTask):
 
         self.open_inventory()
 
+        bag = inventory.pokemons()
+        pokemons = bag.all()
+        stats = bag.evaluate(pokemons)
+        stats["ncp"] = stats["cp_percent"]
+        table = PokemonTable(pokemons, stats)
+
         keep_all = []
         try_evolve_all = []
         try_upgrade_all = []
 
         for rule in self.config_rules:
-            mode = rule.get("mode", "by_family")
-            names = rule.get("names", [])
-            whitelist_names, blacklist_names = self.get_colorlist_names(names)
-
-            if mode == "by_pokemon":
-                for pokemon_id, pokemon_list in self.group_by_pokemon_id(inventory.pokemons().all()):
-                    name = inventory.pokemons().name_for(pokemon_id)
-
-                    if name in blacklist_names:
-                        continue
-
-                    if whitelist_names and (name not in whitelist_names):
-                        continue
-
-                    keep, try_evolve, try_upgrade = self.get_best_pokemon_for_rule(pokemon_list, rule)
-                    keep_all += keep
-                    try_evolve_all += try_evolve
-                    try_upgrade_all += try_upgrade
-            elif mode == "by_family":
-                for family_id, pokemon_list in self.group_by_family_id(inventory.pokemons().all()):
-                    matching_names = self.get_family_names(family_id)
-
-                    if any(n in blacklist_names for n in matching_names):
-                        continue
-
-                    if whitelist_names and not any(n in whitelist_names for n in matching_names):
-                        continue
-
-                    if family_id == 133:  # "Eevee"
-                        keep, try_evolve, try_upgrade = self.get_multi_best_pokemon_for_rule(pokemon_list, rule, 3)
-                    else:
-                        keep, try_evolve, try_upgrade = self.get_best_pokemon_for_rule(pokemon_list, rule)
-
-                    keep_all += keep
-                    try_evolve_all += try_evolve
-                    try_upgrade_all += try_upgrade
-            elif mode == "overall":
-                pokemon_list = []
-
-                for pokemon in inventory.pokemons().all():
-                    name = pokemon.name
-
-                    if name in blacklist_names:
-                        continue
+            keep, try_evolve, try_upgrade = self.evaluate_rule(table, rule)
+            keep_all.append(keep)
+            try_evolve_all.append(try_evolve)
+            try_upgrade_all.append(try_upgrade)
 
-                    if whitelist_names and (name not in whitelist_names):
-                        continue
+        keep_all = unique_rows(keep_all)
+        try_evolve_all = unique_rows(try_evolve_all)
+        try_upgrade_all = unique_rows(try_upgrade_all)
 
-                    pokemon_list.append(pokemon)
+        family_plans = []
+        families = table.column("first_evolution_id")
 
-                keep, try_evolve, try_upgrade = self.get_best_pokemon_for_rule(pokemon_list, rule)
-                keep_all += keep
-                try_evolve_all += try_evolve
-                try_upgrade_all += try_upgrade
+        for family_id in np.unique(families):
+            pokemon_list = table.take(table.rows(families == family_id))
+            keep = table.take(keep_all[families[keep_all] == family_id])
+            try_evolve = table.take(try_evolve_all[families[try_evolve_all] == family_id])
+            try_upgrade = table.take(try_upgrade_all[families[try_upgrade_all] == family_id])
 
-        keep_all = self.unique_pokemon_list(keep_all)
-        try_evolve_all = self.unique_pokemon_list(try_evolve_all)
-        try_upgrade_all = self.unique_pokemon_list(try_upgrade_all)
+            family_plans.append(self.get_family_plan(int(family_id), pokemon_list, keep, try_evolve, try_upgrade))
 
-        transfer_all = []
-        evolve_all = []
-        upgrade_all = []
-        xp_all = []
+        plan = self.planner.plan(family_plans,
+                                 self.ongoing_stardust_count,
+                                 min(self.config_upgrade_level, inventory.player().level * 2),
+                                 lucky_egg=self.may_use_lucky_egg(),
+                                 evolve_for_xp=self.config_evolve_for_xp,
+                                 min_xp_evolutions=int(math.ceil(self.max_pokemon_storage * 0.02)),
+                                 xp_for=self.get_evolution_xp)
 
-        for family_id, pokemon_list in self.group_by_family_id(inventory.pokemons().all()):
-            keep = [p for p in keep_all if self.get_family_id(p) == family_id]
-            try_evolve = [p for p in try_evolve_all if self.get_family_id(p) == family_id]
-            try_upgrade = [p for p in try_upgrade_all if self.get_family_id(p) == family_id]
-
-            transfer, evolve, upgrade, xp = self.get_evolution_plan(family_id, pokemon_list, keep, try_evolve, try_upgrade)
-
-            transfer_all += transfer
-            evolve_all += evolve
-            upgrade_all += upgrade
-            xp_all += xp
-
-        self.apply_optimization(transfer_all, evolve_all, upgrade_all, xp_all)
+        self.apply_optimization(plan)
 
         return WorkerResult.SUCCESS
 
     def open_inventory(self):
-        for pokemon in inventory.pokemons().all():
-            setattr(pokemon, "ncp", pokemon.cp_percent)
-            setattr(pokemon, "dps", pokemon.moveset.dps)
-            setattr(pokemon, "dps1", pokemon.fast_attack.dps)
-            setattr(pokemon, "dps2", pokemon.charged_attack.dps)
-            setattr(pokemon, "dps_attack", pokemon.moveset.dps_attack)
-            setattr(pokemon, "dps_defense", pokemon.moveset.dps_defense)
-            setattr(pokemon, "attack_perfection", pokemon.moveset.attack_perfection)
-            setattr(pokemon, "defense_perfection", pokemon.moveset.defense_perfection)
-
         self.ongoing_stardust_count = self.bot.stardust
 
     def get_colorlist_names(self, names):
@@ -226,157 +181,72 @@ class PokemonOptimizer(BaseTask):
         else:
             raise ConfigException("Unknown Pokemon name [%s]" % name)
 
-    def group_by_pokemon_id(self, pokemon_list):
-        sorted_list = sorted(pokemon_list, key=self.get_pokemon_id)
-        return itertools.groupby(sorted_list, self.get_pokemon_id)
-
-    def group_by_family_id(self, pokemon_list):
-        sorted_list = sorted(pokemon_list, key=self.get_family_id)
-        return itertools.groupby(sorted_list, self.get_family_id)
-
-    def get_pokemon_id(self, pokemon):
-        return pokemon.pokemon_id
-
-    def get_family_id(self, pokemon):
-        return pokemon.first_evolution_id
-
-    def get_best_pokemon_for_rule(self, pokemon_list, rule):
-        sorted_pokemon = self.sort_pokemon_list_to_keep(pokemon_list, rule)
-
-        if len(sorted_pokemon) == 0:
-            return ([], [], [])
-
-        top = max(rule.get("top", 0), 0)
-        index = int(math.ceil(top)) - 1
-
-        if 0 < top < 1:
-            worst = object()
+    def evaluate_rule(self, table, rule):
+        """
+        Applies a rule to the whole bag.
+        :return: Tuple of the keep, try_evolve and try_upgrade rows of the table.
+        """
+        mode = rule.get("mode", "by_family")
+        names = rule.get("names", [])
+        whitelist_names, blacklist_names = self.get_colorlist_names(names)
+        evaluator = RuleEvaluator(table, rule)
+
+        if mode == "by_pokemon":
+            column = table.column("pokemon_id")
+            allowed = [pid for pid in np.unique(column) if self.is_allowed([inventory.pokemons().name_for(pid)], whitelist_names, blacklist_names)]
+            return evaluator.best(table.rows(np.in1d(column, allowed)), "pokemon_id")
+        elif mode == "by_family":
+            column = table.column("first_evolution_id")
+            allowed = [fid for fid in np.unique(column) if self.is_allowed(self.get_family_names(fid), whitelist_names, blacklist_names)]
+            results = [evaluator.best(table.rows(np.in1d(column, allowed) & (column != 133)), "first_evolution_id")]
+
+            if 133 in allowed:  # "Eevee"
+                results.append(self.get_multi_best_pokemon_for_rule(evaluator, table.rows(column == 133), 3))
+
+            return tuple(np.concatenate(r) for r in zip(*results))
+        elif mode == "overall":
+            allowed = [self.is_allowed([p.name], whitelist_names, blacklist_names) for p in table.pokemons]
+            return evaluator.best(table.rows(np.array(allowed, dtype=bool)))
+
+        return evaluator.split(table.rows(np.zeros(len(table), dtype=bool)))
+
+    def is_allowed(self, matching_names, whitelist_names, blacklist_names):
+        if any(n in blacklist_names for n in matching_names):
+            return False
 
-            for a in rule.get("sort", []):
-                best_attribute = getattr(sorted_pokemon[0], a)
-                setattr(worst, a, best_attribute * (1 - top))
-        elif 0 <= index < len(sorted_pokemon):
-            worst = sorted_pokemon[index]
-        else:
-            worst = sorted_pokemon[-1]
+        if whitelist_names and not any(n in whitelist_names for n in matching_names):
+            return False
 
-        return self.get_better_pokemon_for_rule(sorted_pokemon, rule, worst)
+        return True
 
-    def get_multi_best_pokemon_for_rule(self, family_list, rule, nb_branch):
-        sorted_family = self.sort_pokemon_list_to_keep(family_list, rule)
+    def get_multi_best_pokemon_for_rule(self, evaluator, family_rows, nb_branch):
+        sorted_family, _ = evaluator.rank(family_rows)
 
         # Handle each group of senior independently
-        senior_pokemon_list = [p for p in sorted_family if not p.has_next_evolution()]
-        other_family_list = [p for p in sorted_family if p.has_next_evolution()]
-        senior_pids = set(p.pokemon_id for p in senior_pokemon_list)
-
-        keep_all = []
-        try_evolve_all = []
-        try_upgrade_all = []
+        has_next_evolution = evaluator.table.column("has_next_evolution")[sorted_family]
+        senior_rows = sorted_family[~has_next_evolution]
+        other_family_rows = sorted_family[has_next_evolution]
+        senior_pids = np.unique(evaluator.table.column("pokemon_id")[senior_rows])
 
         if not self.config_evolve:
             # Player handle evolution manually = Fall-back to per Pokemon behavior
-            for _, pokemon_list in self.group_by_pokemon_id(sorted_family):
-                keep, try_evolve, try_upgrade = self.get_best_pokemon_for_rule(pokemon_list, rule)
-                keep_all += keep
-                try_evolve_all += try_evolve
-                try_upgrade_all += try_upgrade
-        else:
-            for _, pokemon_list in self.group_by_pokemon_id(senior_pokemon_list):
-                keep, try_evolve, try_upgrade = self.get_best_pokemon_for_rule(pokemon_list, rule)
-                keep_all += keep
-                try_evolve_all += try_evolve
-                try_upgrade_all += try_upgrade
-
-            if len(other_family_list) > 0:
-                if len(senior_pids) < nb_branch:
-                    # We did not get every combination yet = All other Pokemon are potentially good to keep
-                    worst = other_family_list[-1]
-                else:
-                    best = keep_all + try_evolve_all + try_upgrade_all
-                    worst = self.sort_pokemon_list_to_keep(best, rule)[-1]
-
-                keep, try_evolve, try_upgrade = self.get_better_pokemon_for_rule(other_family_list, rule, worst, 12)
-                keep_all += keep
-                try_evolve_all += try_evolve
-                try_upgrade_all += try_upgrade
-
-        return keep_all, try_evolve_all, try_upgrade_all
-
-    def get_better_pokemon_for_rule(self, pokemon_list, rule, worst, limit=1000):
-        min_score = self.get_score(worst, rule)[0]
-        scored_list = [(p, self.get_score(p, rule)) for p in pokemon_list]
-        scored_keep = [x for x in scored_list if (x[1][0] >= min_score) and (x[1][1] is True)][:limit]
-        keep = [x[0] for x in scored_keep]
-        try_evolve = [x[0] for x in scored_keep if x[1][2] is True]
-        try_upgrade = [x[0] for x in scored_keep if (x[1][2] is False) and (x[1][3] is True)]
-
-        return keep, try_evolve, try_upgrade
-
-    def sort_pokemon_list_to_keep(self, pokemon_list, rule):
-        scored_list = [(p, self.get_score(p, rule)) for p in pokemon_list]
-        scored_keep = [x for x in scored_list if x[1][1] is True]
-        scored_keep.sort(key=lambda x: x[1][0], reverse=True)
-
-        return [p for p, x in scored_keep]
-
-    def get_score(self, pokemon, rule):
-        score = []
-
-        for a in rule.get("sort", []):
-            value = getattr(pokemon, a, 0)
-            score.append(value)
-
-        rule_keep = rule.get("keep", True)
-        rule_evolve = rule.get("evolve", True)
-        rule_upgrade = rule.get("upgrade", False)
-
-        keep = rule_keep not in [False, {}]
-        keep &= self.satisfy_requirements(pokemon, rule_keep)
-
-        may_try_evolve = (hasattr(pokemon, "has_next_evolution") and pokemon.has_next_evolution())
-        may_try_evolve &= rule_evolve not in [False, {}]
-        may_try_evolve &= self.satisfy_requirements(pokemon, rule_evolve)
-
-        may_try_upgrade = rule_upgrade not in [False, {}]
-        may_try_upgrade &= self.satisfy_requirements(pokemon, rule_upgrade)
-
-        return tuple(score), keep, may_try_evolve, may_try_upgrade
-
-    def satisfy_requirements(self, pokemon, req):
-        if type(req) is bool:
-            return req
-
-        satisfy = True
-
-        for a, v in req.items():
-            value = getattr(pokemon, a, 0)
+            return evaluator.best(sorted_family, "pokemon_id")
 
-            if (type(v) is str) or (type(v) is unicode):
-                v = float(v)
+        results = [evaluator.best(senior_rows, "pokemon_id")]
 
-            if type(v) is list:
-                if type(v[0]) is list:
-                    satisfy_range = False
-
-                    for r in v:
-                        satisfy_range |= (value >= r[0]) and (value <= r[1])
-
-                    satisfy &= satisfy_range
-                else:
-                    satisfy &= (value >= v[0]) and (value <= v[1])
-            elif v < 0:
-                satisfy &= (value <= abs(v))
+        if len(other_family_rows) > 0:
+            if len(senior_pids) < nb_branch:
+                # We did not get every combination yet = All other Pokemon are potentially good to keep
+                worst = other_family_rows[-1]
             else:
-                satisfy &= (value >= v)
+                best, _ = evaluator.rank(np.concatenate(results[0]))
+                worst = best[-1]
 
-        return satisfy
+            results.append(evaluator.better_than(other_family_rows, worst, 12))
 
-    def unique_pokemon_list(self, pokemon_list):
-        seen = set()
-        return [p for p in pokemon_list if not (p.unique_id in seen or seen.add(p.unique_id))]
+        return tuple(np.concatenate(r) for r in zip(*results))
 
-    def get_evolution_plan(self, family_id, family_list, keep, try_evolve, try_upgrade):
+    def get_family_plan(self, family_id, family_list, keep, try_evolve, try_upgrade):
         candies = inventory.candies().get(family_id).quantity
 
         # All the rest is crap, for now
@@ -385,166 +255,75 @@ class PokemonOptimizer(BaseTask):
         crap = [p for p in crap if not p.in_fort and not p.is_favorite]
         crap.sort(key=lambda p: (p.iv, p.cp), reverse=True)
 
-        # We will gain a candy whether we choose to transfer or evolve these Pokemon
-        candies += len(crap)
-
-        evolve = []
-
-        for pokemon in try_evolve:
-            candies -= pokemon.evolution_cost
-
-            if candies < 0:
-                continue
-
-            candies += 1
-            evolve.append(pokemon)
-
-        upgrade = []
-        upgrade_level = min(self.config_upgrade_level, inventory.player().level * 2)
-
-        for pokemon in try_upgrade:
-            level = int(pokemon.level * 2) - 1
-
-            if level >= upgrade_level:
-                continue
+        evolution_cost = inventory.pokemons().evolution_cost_for(family_id)
+        return FamilyPlan(family_id, candies, crap, try_evolve, try_upgrade, evolution_cost)
 
-            full_upgrade_candy_cost = 0
-            full_upgrade_stardust_cost = 0
+    def get_evolution_xp(self, pokemon):
+        if pokemon.has_seen_next_evolution():
+            return EVOLVE_XP
+        return EVOLVE_XP + NEW_POKEDEX_ENTRY_XP
 
-            for i in range(level, upgrade_level):
-                upgrade_cost = self.pokemon_upgrade_cost[i - 1]
-                full_upgrade_candy_cost += upgrade_cost[0]
-                full_upgrade_stardust_cost += upgrade_cost[1]
-
-            candies -= full_upgrade_candy_cost
-            self.ongoing_stardust_count -= full_upgrade_stardust_cost
-
-            if (candies < 0) or (self.ongoing_stardust_count < 0):
-                continue
-
-            upgrade.append(pokemon)
-
-        if self.config_evolve_for_xp:
-            # Compute how many crap we should keep if we want to batch evolve them for xp
-            lowest_evolution_cost = inventory.pokemons().evolution_cost_for(family_id)
-
-            # transfer + keep_for_xp = len(crap)
-            # leftover_candies = candies - len(crap) + transfer * 1
-            # keep_for_xp = (leftover_candies - 1) / (lowest_evolution_cost - 1)
-            # keep_for_xp = (candies - len(crap) + transfer - 1) / (lowest_evolution_cost - 1)
-            # keep_for_xp = (candies - keep_for_xp - 1) / (lowest_evolution_cost - 1)
-
-            if (candies > 0) and lowest_evolution_cost:
-                keep_for_xp = int((candies - 1) / lowest_evolution_cost)
-            else:
-                keep_for_xp = 0
-
-            xp = [p for p in crap if p.has_next_evolution() and p.evolution_cost == lowest_evolution_cost][:keep_for_xp]
-
-            # If not much to evolve, better keep the candies
-            if len(xp) < math.ceil(self.max_pokemon_storage * 0.02):
-                xp = []
-
-            transfer = [p for p in crap if p not in xp]
-        else:
-            xp = []
-            transfer = crap
-
-        return (transfer, evolve, upgrade, xp)
+    def may_use_lucky_egg(self):
+        if not (self.config_evolve and self.config_may_use_lucky_egg) or self.bot.config.test:
+            return False
+        return inventory.items().get(Item.ITEM_LUCKY_EGG.value).count > 0  # @UndefinedVariable
 
-    def apply_optimization(self, transfer, evolve, upgrade, xp):
-        transfer_count = len(transfer)
-        evolve_count = len(evolve)
-        upgrade_count = len(upgrade)
-        xp_count = len(xp)
+    def apply_optimization(self, plan):
+        transfer_count = len(plan.transfer)
+        evolve_count = plan.count(EVOLVE)
+        upgrade_count = len(plan.upgrade)
+        xp_count = plan.count(EVOLVE_FOR_XP)
 
         if transfer_count > 0:
             self.logger.info("Transferring %s Pokemon", transfer_count)
 
-            for pokemon in transfer:
-                self.transfer_pokemon(pokemon)
+            self.transfer_pokemons([step.pokemon for step in plan.transfer])
 
         evolve_xp_count = evolve_count + xp_count
 
         if evolve_xp_count > 0:
             skip_evolve = False
+            plan.lucky_egg = False
 
             if self.config_evolve and self.config_may_use_lucky_egg and (not self.bot.config.test):
                 lucky_egg = inventory.items().get(Item.ITEM_LUCKY_EGG.value)  # @UndefinedVariable
+                count_for_lucky_egg = self.planner.lucky_egg_threshold(self.config_evolve_count_for_lucky_egg)
 
                 if lucky_egg.count == 0:
                     if self.config_evolve_only_with_lucky_egg:
                         skip_evolve = True
                         self.emit_event("skip_evolve",
                                         formatted="Skipping evolution step. No lucky egg available")
-                elif evolve_xp_count < self.config_evolve_count_for_lucky_egg:
+                elif evolve_xp_count < count_for_lucky_egg:
                     if self.config_evolve_only_with_lucky_egg:
                         skip_evolve = True
                         self.emit_event("skip_evolve",
-                                        formatted="Skipping evolution step. Not enough Pokemon to evolve with lucky egg: %s/%s" % (evolve_xp_count, self.config_evolve_count_for_lucky_egg))
+                                        formatted="Skipping evolution step. Not enough Pokemon to evolve with lucky egg: %s/%s" % (evolve_xp_count, count_for_lucky_egg))
                     elif self.get_pokemon_slot_left() > self.config_min_slots_left:
                         skip_evolve = True
                         self.emit_event("skip_evolve",
-                                        formatted="Waiting for more Pokemon to evolve with lucky egg: %s/%s" % (evolve_xp_count, self.config_evolve_count_for_lucky_egg))
+                                        formatted="Waiting for more Pokemon to evolve with lucky egg: %s/%s" % (evolve_xp_count, count_for_lucky_egg))
                 else:
-                    self.use_lucky_egg()
+                    plan.lucky_egg = self.use_lucky_egg()
 
             if not skip_evolve:
-                if evolve_count > 0:
-                    self.logger.info("Evolving %s Pokemon (the best)", evolve_count)
-
-                    for pokemon in evolve:
-                        self.evolve_pokemon(pokemon)
+                self.logger.info("Evolving %s Pokemon (%s the best, %s for xp) [%s xp]", evolve_xp_count, evolve_count, xp_count, plan.xp)
 
-                if xp_count > 0:
-                    self.logger.info("Evolving %s Pokemon (for xp)", xp_count)
+                if plan.deferred:
+                    self.logger.info("Keeping %s Pokemon to evolve with the next lucky egg", len(plan.deferred))
 
-                    for pokemon in xp:
-                        self.evolve_pokemon(pokemon)
+                for step in plan.evolve:
+                    self.evolve_pokemon(step.pokemon)
 
         if upgrade_count > 0:
             self.logger.info("Upgrading %s Pokemon [%s stardust]", upgrade_count, self.bot.stardust)
 
-            for pokemon in upgrade:
-                self.upgrade_pokemon(pokemon)
-
-    def transfer_pokemon(self, pokemon):
-        if self.config_transfer and (not self.bot.config.test):
-            response_dict = self.bot.api.release_pokemon(pokemon_id=pokemon.unique_id)
-        else:
-            response_dict = {"responses": {"RELEASE_POKEMON": {"candy_awarded": 0}}}
-
-        if not response_dict:
-            return False
-
-        candy_awarded = response_dict.get("responses", {}).get("RELEASE_POKEMON", {}).get("candy_awarded", 0)
-        candy = inventory.candies().get(pokemon.pokemon_id)
-
-        if self.config_transfer and (not self.bot.config.test):
-            candy.add(candy_awarded)
-
-        self.emit_event("pokemon_release",
-                        formatted="Exchanged {pokemon} [IV {iv}] [CP {cp}] [{candy} candies]",
-                        data={"pokemon": pokemon.name,
-                              "iv": pokemon.iv,
-                              "cp": pokemon.cp,
-                              "candy": candy.quantity})
-
-        if self.config_transfer and (not self.bot.config.test):
-            inventory.pokemons().remove(pokemon.unique_id)
-
-            with self.bot.database as db:
-                cursor = db.cursor()
-                cursor.execute("SELECT COUNT(name) FROM sqlite_master WHERE type='table' AND name='transfer_log'")
+            for step in plan.upgrade:
+                self.upgrade_pokemon(step.pokemon)
 
-                db_result = cursor.fetchone()
-
-                if db_result[0] == 1:
-                    db.execute("INSERT INTO transfer_log (pokemon, iv, cp) VALUES (?, ?, ?)", (pokemon.name, pokemon.iv, pokemon.cp))
-
-            action_delay(self.config_transfer_wait_min, self.config_transfer_wait_max)
-
-        return True
+    def transfer_pokemons(self, pokemons):
+        transfer = self.config_transfer and (not self.bot.config.test)
+        return self.releaser.release(pokemons, send=transfer, update=transfer)
 
     def use_lucky_egg(self):
         lucky_egg = inventory.items().get(Item.ITEM_LUCKY_EGG.value)  # @UndefinedVariable
@@ -617,14 +396,7 @@ class PokemonOptimizer(BaseTask):
             new_pokemon = inventory.Pokemon(evolution)
             inventory.pokemons().add(new_pokemon)
 
-            with self.bot.database as db:
-                cursor = db.cursor()
-                cursor.execute("SELECT COUNT(name) FROM sqlite_master WHERE type='table' AND name='evolve_log'")
-
-                db_result = cursor.fetchone()
-
-                if db_result[0] == 1:
-                    db.execute("INSERT INTO evolve_log (pokemon, iv, cp) VALUES (?, ?, ?)", (pokemon.name, pokemon.iv, pokemon.cp))
+            self.bot.database_log.insert("evolve_log", sender=self, pokemon=pokemon.name, iv=pokemon.iv, cp=pokemon.cp)
 
             sleep(self.config_evolve_time, 0.1)
 
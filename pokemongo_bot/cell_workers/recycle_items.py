@@ -1,5 +1,6 @@
 import json
 import os
+import time
 
 from pokemongo_bot import inventory
 from pokemongo_bot.base_dir import _base_dir
@@ -55,7 +56,8 @@ class RecycleItems(BaseTask):
     }
     """
     SUPPORTED_TASK_API_VERSION = 1
-
+    # The space left only changes with the inventory
+    triggers = ('inventory',)
 
     def initialize(self):
         self.items_filter = self.config.get('item_filter', {})
@@ -111,6 +113,16 @@ class RecycleItems(BaseTask):
 
         return False
 
+    def next_run_time(self):
+        """
+        Returns when the next forced recycle is due, for the TaskScheduler.
+        :return: A timestamp, None without forced recycles.
+        :rtype: float
+        """
+        if not self.recycle_force:
+            return None
+        return time.mktime(self._next_force.timetuple())
+
     def _get_next_force_schedule(self):
         now = dt.now()
         next_time = now + timedelta(seconds=int(uniform(self.minInterval, self.maxInterval)))
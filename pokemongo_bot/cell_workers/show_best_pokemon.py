@@ -1,4 +1,5 @@
 import ctypes
+import time
 from datetime import datetime, timedelta
 
 from pokemongo_bot import inventory
@@ -86,6 +87,18 @@ class ShowBestPokemon(BaseTask):
         """
         self.next_update = datetime.now() + timedelta(seconds=self.min_interval)
 
+    def next_run_time(self):
+        """
+        Returns when the pokemon should be displayed next, for the TaskScheduler.
+        :return: A timestamp, 0 for now or None when nothing is displayed.
+        :rtype: float
+        """
+        if not self.info_to_show or not self.amount:
+            return None
+        if self.next_update is None:
+            return 0
+        return time.mktime(self.next_update.timetuple())
+
     def print_pokemons(self, pokemons):
         """
         Logs the pokemon into the terminal using an event.
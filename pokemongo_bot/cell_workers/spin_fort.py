@@ -11,7 +11,7 @@ from pokemongo_bot.constants import Constants
 from pokemongo_bot.human_behaviour import action_delay
 from pokemongo_bot.worker_result import WorkerResult
 from pokemongo_bot.base_task import BaseTask
-from utils import distance, format_time, fort_details
+from utils import format_time, fort_details
 
 SPIN_REQUEST_RESULT_SUCCESS = 1
 SPIN_REQUEST_RESULT_OUT_OF_RANGE = 2
@@ -93,24 +93,10 @@ class SpinFort(BaseTask):
                         formatted='Found nothing in pokestop {pokestop}.',
                         data={'pokestop': fort_name}
                     )
-                with self.bot.database as conn:
-                    c = conn.cursor()
-                    c.execute("SELECT COUNT(name) FROM sqlite_master WHERE type='table' AND name='pokestop_log'")
-                result = c.fetchone()
-                c.execute("SELECT DISTINCT COUNT(pokestop) FROM pokestop_log WHERE dated >= datetime('now','-1 day')")
-                if c.fetchone()[0] >= self.config.get('daily_spin_limit', 2000):
+                if self.bot.database_log.count_recent('pokestop_log') >= self.config.get('daily_spin_limit', 2000):
                     self.emit_event('spin_limit', formatted='WARNING! You have reached your daily spin limit')
                     sys.exit(2)
-                while True:
-                    if result[0] == 1:
-                        conn.execute('''INSERT INTO pokestop_log (pokestop, exp, items) VALUES (?, ?, ?)''', (fort_name, str(experience_awarded), str(items_awarded)))
-                        break
-                    else:
-                        self.emit_event('pokestop_log',
-                                        sender=self,
-                                        level='info',
-                                        formatted="pokestop_log table not found, skipping log")
-                        break
+                self.bot.database_log.insert('pokestop_log', sender=self, pokestop=fort_name, exp=str(experience_awarded), items=str(items_awarded))
                 pokestop_cooldown = spin_details.get(
                     'cooldown_complete_timestamp_ms')
                 self.bot.fort_timeouts.update({fort["id"]: pokestop_cooldown})
@@ -157,20 +143,7 @@ class SpinFort(BaseTask):
                         'softban',
                         formatted='Probably got softban.'
                     )
-                    with self.bot.database as conn:
-                        c = conn.cursor()
-                        c.execute("SELECT COUNT(name) FROM sqlite_master WHERE type='table' AND name='softban_log'")
-                    result = c.fetchone()
-
-                    if result[0] == 1:
-                        source = str("PokemonCatchWorker")
-                        status = str("Possible Softban")
-                        conn.execute('''INSERT INTO softban_log (status, source) VALUES (?, ?)''', (status, source))
-                    else:
-                        self.emit_event('softban_log',
-                                        sender=self,
-                                        level='info',
-                                        formatted="softban_log table not found, skipping log")
+                    self.bot.database_log.insert('softban_log', sender=self, status=str("Possible Softban"), source=str("PokemonCatchWorker"))
 
                 self.bot.fort_timeouts[fort["id"]] = (time.time() + 300) * 1000  # Don't spin for 5m
 
@@ -183,23 +156,13 @@ class SpinFort(BaseTask):
         return WorkerResult.SUCCESS
 
     def get_forts_in_range(self):
-        forts = self.bot.get_forts(order_by_distance=True)
-        forts = filter(lambda fort: fort["id"] not in self.bot.fort_timeouts, forts)
-
         if self.bot.config.replicate_gps_xy_noise:
-            forts = filter(lambda fort: distance(
-                self.bot.noised_position[0],
-                self.bot.noised_position[1],
-                fort['latitude'],
-                fort['longitude']
-            ) <= Constants.MAX_DISTANCE_FORT_IS_REACHABLE, forts)
+            position = self.bot.noised_position
         else:
-            forts = filter(lambda fort: distance(
-                self.bot.position[0],
-                self.bot.position[1],
-                fort['latitude'],
-                fort['longitude']
-            ) <= Constants.MAX_DISTANCE_FORT_IS_REACHABLE, forts)
+            position = self.bot.position
+
+        forts = self.bot.fort_index.within(position[0], position[1], Constants.MAX_DISTANCE_FORT_IS_REACHABLE)
+        forts = filter(lambda fort: fort["id"] not in self.bot.fort_timeouts, forts)
 
         return forts
 
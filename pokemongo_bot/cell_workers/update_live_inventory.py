@@ -1,5 +1,6 @@
 import ctypes
 import logging
+import time
 from datetime import datetime, timedelta
 
 from pokemongo_bot import inventory
@@ -108,6 +109,16 @@ class UpdateLiveInventory(BaseTask):
         """
         self.next_update = datetime.now() + timedelta(seconds=self.min_interval)
 
+    def next_run_time(self):
+        """
+        Returns when the items should be displayed next, for the TaskScheduler.
+        :return: A timestamp, 0 for now.
+        :rtype: float
+        """
+        if self.next_update is None:
+            return 0
+        return time.mktime(self.next_update.timetuple())
+
     def print_inv(self, items, is_debug=False):
         """
         Logs the items into the terminal using an event.
@@ -1,4 +1,5 @@
 import ctypes
+import time
 
 from sys import stdout, platform as _platform
 from datetime import datetime, timedelta
@@ -188,6 +189,18 @@ class UpdateLiveStats(BaseTask):
         """
         self.next_update = datetime.now() + timedelta(seconds=self.min_interval)
 
+    def next_run_time(self):
+        """
+        Returns when the stats should be displayed next, for the TaskScheduler.
+        :return: A timestamp, 0 for now or None when nothing is displayed.
+        :rtype: float
+        """
+        if not self.terminal_title and not self.terminal_log or not self.displayed_stats:
+            return None
+        if self.next_update is None:
+            return 0
+        return time.mktime(self.next_update.timetuple())
+
     def _log_on_terminal(self, stats):
         """
         Logs the stats into the terminal using an event.
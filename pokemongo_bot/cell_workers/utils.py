@@ -1,12 +1,11 @@
 # -*- coding: utf-8 -*-
 
 import struct
+import time
 from math import asin, atan, cos, exp, log, pi, sin, sqrt, tan
 
 from colorama import init
-from networkx.algorithms.clique import find_cliques
 
-import networkx as nx
 import numpy as np
 
 from datetime import datetime as dt, timedelta
@@ -54,6 +53,36 @@ def distance(lat1, lon1, lat2, lon2):
     return 12742 * asin(sqrt(a)) * 1000
 
 
+def distances(lat, lon, lats, lons):
+    """
+    Batched version of `distance`: returns the distances in meters from one
+    origin to every (lats[i], lons[i]) as a numpy array.
+    """
+    p = 0.017453292519943295
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    a = 0.5 - np.cos((lats - lat) * p) / 2 + cos(lat * p) * \
+        np.cos(lats * p) * (1 - np.cos((lons - lon) * p)) / 2
+    return 12742 * np.arcsin(np.sqrt(np.clip(a, 0, 1))) * 1000
+
+
+def sort_by_distance(lat, lon, items, key=None):
+    """
+    Sorts items by their distance to the given position in one batched
+    distance computation. `key` maps an item to its (lat, lon) and defaults to
+    its 'latitude' and 'longitude' fields.
+    """
+    if not items:
+        return []
+
+    if key is None:
+        key = lambda x: (x['latitude'], x['longitude'])
+
+    lats, lons = zip(*[key(item) for item in items])
+    order = np.argsort(distances(lat, lon, lats, lons), kind='mergesort')
+    return [items[i] for i in order]
+
+
 def convert(distance, from_unit, to_unit):  # Converts units
     # Example of converting distance from meters to feet:
     # convert(100.0,"m","ft")
@@ -234,27 +263,89 @@ def rad2deg(rad):
     return rad * 180.0 / pi
 
 
+def _densest_disc(xy, weights, radius):
+    """
+    Finds the disc of the given radius covering the most points, ties broken
+    by the highest sum of weights. Every optimal disc can be moved until it
+    either is centered on a point or has two points on its border, so only
+    those snap centers are tried. Points are bucketed on a grid of 2 * radius
+    so each point is only paired with its neighbours.
+
+    Returns the indices of the covered points and the center of the disc.
+    """
+    cell = 2.0 * radius
+    keys = np.floor(xy / cell).astype(np.int64)
+    grid = {}
+    for idx, key in enumerate(map(tuple, keys)):
+        grid.setdefault(key, []).append(idx)
+
+    r2 = radius ** 2 * (1 + 1e-9)
+    best_key, best_members, best_center = None, None, None
+
+    for i in xrange(len(xy)):
+        ki, kj = keys[i]
+        neighbours = [j for di in (-1, 0, 1) for dj in (-1, 0, 1)
+                      for j in grid.get((ki + di, kj + dj), [])]
+
+        # A disc through this point can not cover more than its neighbours
+        if best_key is not None and len(neighbours) < best_key[0]:
+            continue
+
+        neighbours = np.array(neighbours)
+        local = xy[neighbours]
+
+        delta = local - xy[i]
+        d = np.sqrt((delta ** 2).sum(axis=1))
+        partners = (neighbours > i) & (d > 0) & (d <= cell)
+
+        # The point itself plus both discs passing through it and a partner
+        mid = (local[partners] + xy[i]) / 2
+        h = np.sqrt(np.maximum(radius ** 2 - (d[partners] / 2) ** 2, 0))
+        normal = np.column_stack((-delta[partners, 1], delta[partners, 0])) / d[partners][:, None]
+        centers = np.vstack((xy[i][None, :], mid + normal * h[:, None], mid - normal * h[:, None]))
+
+        covered = ((centers[:, None, :] - local[None, :, :]) ** 2).sum(axis=2) <= r2
+        counts = covered.sum(axis=1)
+        weight_sums = covered.dot(weights[neighbours])
+
+        row = np.lexsort((weight_sums, counts))[-1]
+        key = (counts[row], weight_sums[row])
+
+        if best_key is None or key > best_key:
+            best_key = key
+            best_members = neighbours[covered[row]]
+            best_center = centers[row]
+
+    return best_members, best_center
+
+
 def find_biggest_cluster(radius, points, order=None):
-    graph = nx.Graph()
-    for point in points:
-            if order is '9QM=':
-                #is a lure module - 9QM=
-                now = int(time.time())
-                remaining = now - point['last_modified_timestamp_ms']
-                f = point['latitude'], point['longitude'], remaining
-            else:
-                f = point['latitude'], point['longitude'], 0
-            graph.add_node(f)
-            for node in graph.nodes():
-                if node != f and distance(f[0], f[1], node[0], node[1]) <= radius*2:
-                    graph.add_edge(f, node)
-    cliques = list(find_cliques(graph))
-    if len(cliques) > 0:
-        max_clique = max(list(find_cliques(graph)), key=lambda l: (len(l), sum(x[2] for x in l)))
-        merc_clique = [coord2merc(x[0], x[1]) for x in max_clique]
-        clique_x, clique_y = zip(*merc_clique)
-        best_point = np.mean(clique_x), np.mean(clique_y)
-        best_coord = merc2coord(best_point)
-        return {'latitude': best_coord[0], 'longitude': best_coord[1], 'num_points': len(max_clique)}
-    else:
+    if not points:
         return None
+
+    if order == '9QM=':
+        # is a lure module - 9QM=
+        now = int(time.time())
+        weights = np.array([now - point['last_modified_timestamp_ms'] for point in points], dtype=np.float64)
+    else:
+        weights = np.zeros(len(points))
+
+    # Work on a local equirectangular projection in meters, using the same
+    # earth radius as `distance`. This is accurate at cluster scale.
+    lats = np.array([point['latitude'] for point in points], dtype=np.float64)
+    lngs = np.array([point['longitude'] for point in points], dtype=np.float64)
+    p = 0.017453292519943295
+    lat0 = lats.mean()
+    xy = np.column_stack((lngs * p * 6371000 * cos(lat0 * p), lats * p * 6371000))
+
+    members, center = _densest_disc(xy, weights, radius)
+
+    merc_cluster = [coord2merc(lats[i], lngs[i]) for i in members]
+    cluster_x, cluster_y = zip(*merc_cluster)
+    best_coord = merc2coord((np.mean(cluster_x), np.mean(cluster_y)))
+
+    # Prefer the middle of the cluster, unless it leaves some forts out of range
+    if distances(best_coord[0], best_coord[1], lats[members], lngs[members]).max() > radius:
+        best_coord = center[1] / (p * 6371000), center[0] / (p * 6371000 * cos(lat0 * p))
+
+    return {'latitude': best_coord[0], 'longitude': best_coord[1], 'num_points': len(members)}
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+from pokemongo_bot.event_manager import EventNotRegisteredException
+
+DEFAULT_FLUSH_INTERVAL = 10.0
+DEFAULT_MAX_PENDING = 50
+ONE_DAY = 24 * 60 * 60
+
+
+class RollingCounter(object):
+    """
+    Counts the events of the last `window` seconds.
+    """
+
+    def __init__(self, window, timestamps=()):
+        self.window = window
+        self._timestamps = deque(sorted(timestamps))
+
+    def add(self, timestamp):
+        self._timestamps.append(timestamp)
+
+    def count(self, now=None):
+        start = (now or time.time()) - self.window
+
+        while self._timestamps and self._timestamps[0] < start:
+            self._timestamps.popleft()
+
+        return len(self._timestamps)
+
+
+class DatabaseLog(object):
+    """
+    Batched writer for the log tables of the bot database.
+
+    The tables and their columns are read once when the log is created.
+    Rows are queued in memory and written with one executemany and one
+    transaction per statement, once max_pending rows are waiting or
+    flush_interval seconds went by. Rows that could not be written because
+    the database was busy are queued again. Rows get their `dated` value
+    when they are queued, so batching does not move them in time. Code
+    reading these tables calls flush first to see every row.
+
+    count_recent answers how many rows a table got in the last day from
+    memory: the counter is seeded from the table once and every insert
+    keeps it up to date.
+    """
+
+    def __init__(self, connection, event_manager=None, flush_interval=DEFAULT_FLUSH_INTERVAL, max_pending=DEFAULT_MAX_PENDING):
+        self.connection = connection
+        self.event_manager = event_manager
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.logger = logging.getLogger(type(self).__name__)
+        self._lock = threading.RLock()
+        self._pending = OrderedDict()
+        self._pending_count = 0
+        self._last_flush = time.time()
+        self._missing_tables = set()
+        self._counters = {}
+
+        self._enable_wal()
+        self.tables = self._read_schema()
+
+    def _enable_wal(self):
+        try:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            # With WAL, commits no longer need to wait for the disk
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+        except sqlite3.DatabaseError as e:
+            self.logger.warning('Could not enable the WAL journal: %s', e)
+
+    def _read_schema(self):
+        tables = {}
+        cursor = self.connection.execute("SELECT name FROM sqlite_master WHERE type='table'")
+
+        for (name,) in cursor.fetchall():
+            tables[name] = [row[1] for row in self.connection.execute('PRAGMA table_info("%s")' % name)]
+
+        return tables
+
+    def insert(self, table, sender=None, **values):
+        """
+        Queues a row for the table.
+        :return: False when the table does not exist.
+        :rtype: bool
+        """
+        columns = self.tables.get(table)
+
+        if columns is None:
+            self._table_missing(table, sender)
+            return False
+
+        now = time.time()
+
+        if 'dated' in columns and 'dated' not in values:
+            # Same format as CURRENT_TIMESTAMP
+            values['dated'] = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(now))
+
+        names = sorted(values)
+        # The same text for every row of a table lets sqlite reuse the statement
+        statement = 'INSERT INTO %s (%s) VALUES (%s)' % (table, ', '.join(names), ', '.join(['?'] * len(names)))
+
+        with self._lock:
+            self._pending.setdefault(statement, []).append(tuple(values[n] for n in names))
+            self._pending_count += 1
+
+            for (name, _), counter in self._counters.iteritems():
+                if name == table:
+                    counter.add(now)
+
+            if self._pending_count >= self.max_pending:
+                self.flush()
+
+        return True
+
+    def pending(self):
+        return self._pending_count
+
+    def count_recent(self, table, window=ONE_DAY):
+        """
+        Number of rows the table got in the last `window` seconds.
+        :rtype: int
+        """
+        if table not in self.tables:
+            return 0
+
+        with self._lock:
+            counter = self._counters.get((table, window))
+
+            if counter is None:
+                counter = self._counters[(table, window)] = self._seed_counter(table, window)
+
+            return counter.count()
+
+    def _seed_counter(self, table, window):
+        # The queued rows have to be in the table to be counted
+        self.flush()
+        cursor = self.connection.execute(
+            "SELECT strftime('%%s', dated) FROM %s WHERE dated >= datetime('now', ?)" % table,
+            ('-%d seconds' % window,)
+        )
+        return RollingCounter(window, [int(dated) for (dated,) in cursor.fetchall() if dated])
+
+    def flush_if_due(self):
+        if self._pending_count and time.time() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes every queued row.
+        :return: The number of rows written.
+        :rtype: int
+        """
+        with self._lock:
+            pending, count = self._pending, self._pending_count
+            self._pending = OrderedDict()
+            self._pending_count = 0
+            self._last_flush = time.time()
+
+            if not count:
+                return 0
+
+            written = 0
+
+            # One failing table does not roll back the others
+            for statement, rows in pending.iteritems():
+                try:
+                    with self.connection:
+                        self.connection.executemany(statement, rows)
+                except sqlite3.OperationalError as e:
+                    # Locked or busy database, written with the next flush
+                    self.logger.warning('Could not write %s log rows, retrying later: %s', len(rows), e)
+                    self._pending[statement] = rows
+                    self._pending_count += len(rows)
+                except sqlite3.Error as e:
+                    self.logger.error('Could not write %s log rows: %s', len(rows), e)
+                else:
+                    written += len(rows)
+
+        return written
+
+    def _table_missing(self, table, sender):
+        if table in self._missing_tables:
+            return
+
+        self._missing_tables.add(table)
+        self.emit(table, sender=sender, formatted='{} table not found, skipping log'.format(table))
+
+    def emit(self, event, sender=None, formatted='', data={}):
+        try:
+            self.event_manager.emit(event, sender=sender or self, level='info', formatted=formatted, data=data)
+        except (AttributeError, EventNotRegisteredException):
+            self.logger.info(formatted.format(**data))
+
+
+class LogRetention(object):
+    """
+    Rolls the old rows of the log tables into daily counts.
+
+    Every `interval` seconds, the rows of the days that are more than
+    `days` old are counted by table and day in log_daily, then deleted.
+    Whole days are rolled at once, so a day is never counted twice. With
+    `vacuum`, the freed pages are given back to the file system with an
+    incremental vacuum, the first compaction switching the database to
+    incremental auto vacuum.
+    """
+
+    DAILY_TABLE = 'log_daily'
+
+    def __init__(self, database_log, days=30, interval=24 * 60 * 60, vacuum=True):
+        self.database_log = database_log
+        self.connection = database_log.connection
+        # The daily limits count the rows of the last day
+        self.days = max(int(days), 2)
+        self.interval = interval
+        self.vacuum = vacuum
+        self.logger = logging.getLogger(type(self).__name__)
+        self._last_run = None
+
+    @property
+    def tables(self):
+        return sorted(name for name, columns in self.database_log.tables.iteritems()
+                      if 'dated' in columns and name != self.DAILY_TABLE)
+
+    def run_if_due(self):
+        if self._last_run is None or time.time() - self._last_run >= self.interval:
+            self.run()
+
+    def run(self):
+        """
+        :return: The number of rows rolled into log_daily.
+        :rtype: int
+        """
+        self._last_run = time.time()
+
+        if self.DAILY_TABLE not in self.database_log.tables:
+            self.logger.warning('%s table not found, the logs are not compacted', self.DAILY_TABLE)
+            return 0
+
+        cutoff = self.connection.execute("SELECT date('now', ?)", ('-%d days' % self.days,)).fetchone()[0]
+        rolled = 0
+
+        with self.database_log._lock:
+            self.database_log.flush()
+
+            try:
+                with self.connection:
+                    for table in self.tables:
+                        rolled += self.roll(table, cutoff)
+
+                if rolled and self.vacuum:
+                    self.free_pages()
+            except sqlite3.Error as e:
+                self.logger.error('Could not compact the logs: %s', e)
+                return 0
+
+        if rolled:
+            self.database_log.emit(
+                'log_compacted',
+                formatted='Rolled {rows} log rows older than {days} days into daily counts',
+                data={'rows': rolled, 'days': self.days}
+            )
+
+        return rolled
+
+    def roll(self, table, cutoff):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO {daily} (log, day, count) "
+            "SELECT ?, date(dated), COUNT(*) + COALESCE("
+            "(SELECT count FROM {daily} WHERE log = ? AND day = date({table}.dated)), 0) "
+            "FROM {table} WHERE dated < ? GROUP BY date(dated)".format(daily=self.DAILY_TABLE, table=table),
+            (table, table, cutoff)
+        )
+        return self.connection.execute('DELETE FROM %s WHERE dated < ?' % table, (cutoff,)).rowcount
+
+    def free_pages(self):
+        # 2 is INCREMENTAL, switching to it only applies after a full VACUUM
+        if self.connection.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            self.connection.execute('PRAGMA incremental_vacuum').fetchall()
+        else:
+            self.connection.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            self.connection.execute('VACUUM')
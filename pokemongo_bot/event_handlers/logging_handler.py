@@ -10,6 +10,9 @@ from pokemongo_bot.event_manager import EventHandler
 class LoggingHandler(EventHandler):
     EVENT_COLOR_MAP = {
         'api_error':                         'red',
+        'api_circuit_closed':                'green',
+        'api_circuit_open':                  'red',
+        'api_retry_exhausted':               'red',
         'badges':                            'blue',
         'bot_exit':                          'red',
         'bot_start':                         'green',
@@ -34,6 +37,7 @@ class LoggingHandler(EventHandler):
         'level_up_reward':                   'green',
         'location_cache_error':              'yellow',
         'location_cache_ignored':            'yellow',
+        'log_compacted':                     'green',
         'login_failed':                      'red',
         'login_log':                         'magenta',
         'login_successful':                  'green',
@@ -57,6 +61,7 @@ class LoggingHandler(EventHandler):
         'pokemon_not_in_range':              'yellow',
         'pokemon_keep':                      'green',
         'pokemon_release':                   'green',
+        'pokemon_release_batch':             'green',
         'pokemon_upgraded':                  'green',
         'pokemon_vanished':                  'red',
         'pokestop_empty':                    'yellow',
@@ -71,6 +76,7 @@ class LoggingHandler(EventHandler):
         'spin_limit':                        'red',
         'spun_pokestop':                     'cyan',
         'threw_berry_failed':                'red',
+        'timing_stats':                      'magenta',
         'transfer_log':                      'magenta',
         'unknown_spin_result':               'red',
         'unset_pokemon_nickname':            'red',
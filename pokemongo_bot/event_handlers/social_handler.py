@@ -92,6 +92,8 @@ class MyMQTTClass:
 
 
 class SocialHandler(EventHandler):
+    asynchronous = True
+
     def __init__(self, bot):
         super(SocialHandler, self).__init__()
         self.bot = bot
@@ -8,7 +8,7 @@ from pokemongo_bot.event_manager import EventHandler
 
 
 class SocketIoHandler(EventHandler):
-
+    asynchronous = True
 
     def __init__(self, bot, url):
         self.bot = bot
@@ -183,20 +183,16 @@ class TelegramClass:
     def send_player_stats_to_chat(self, chat_id):
         stats = self._get_player_stats()
         if stats:
-            with self.bot.database as conn:
-                cur = conn.cursor()
-                cur.execute("SELECT DISTINCT COUNT(encounter_id) FROM catch_log WHERE dated >= datetime('now','-1 day')")
-                catch_day = cur.fetchone()[0]
-                cur.execute("SELECT DISTINCT COUNT(pokestop) FROM pokestop_log WHERE dated >= datetime('now','-1 day')")
-                ps_day = cur.fetchone()[0]
-                res = (
-                    "*"+self.bot.config.username+"*",
-                    "_Level:_ "+str(stats["level"]),
-                    "_XP:_ "+str(stats["experience"])+"/"+str(stats["next_level_xp"]),
-                    "_Pokemons Captured:_ "+str(stats["pokemons_captured"])+" ("+str(catch_day)+" _last 24h_)",
-                    "_Poke Stop Visits:_ "+str(stats["poke_stop_visits"])+" ("+str(ps_day)+" _last 24h_)",
-                    "_KM Walked:_ "+str("%.2f" % stats["km_walked"])
-                )
+            catch_day = self.bot.database_log.count_recent('catch_log')
+            ps_day = self.bot.database_log.count_recent('pokestop_log')
+            res = (
+                "*"+self.bot.config.username+"*",
+                "_Level:_ "+str(stats["level"]),
+                "_XP:_ "+str(stats["experience"])+"/"+str(stats["next_level_xp"]),
+                "_Pokemons Captured:_ "+str(stats["pokemons_captured"])+" ("+str(catch_day)+" _last 24h_)",
+                "_Poke Stop Visits:_ "+str(stats["poke_stop_visits"])+" ("+str(ps_day)+" _last 24h_)",
+                "_KM Walked:_ "+str("%.2f" % stats["km_walked"])
+            )
             self.sendMessage(chat_id=chat_id, parse_mode='Markdown', text="\n".join(res))
             self.sendLocation(chat_id=chat_id, latitude=self.bot.api._position_lat, longitude=self.bot.api._position_lng)
         else:
@@ -461,6 +457,9 @@ class TelegramDBInit:
 
 
 class TelegramHandler(EventHandler):
+    # Stays on the bot thread: it reads its subscriptions through the bot
+    # database connection, which sqlite only lets the thread that opened it use.
+
     def __init__(self, bot, config):
         initiator = TelegramDBInit(bot.database)
         self.bot = bot
@@ -1,7 +1,19 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
+
+import logging
+import Queue
+import threading
+import time
 from sys import stdout
 
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+BLOCK = 'block'
+
+# Queued by stop() to end the thread of an asynchronous handler
+_STOP = object()
+
 
 class EventNotRegisteredException(Exception):
     pass
@@ -12,6 +24,12 @@ class EventMalformedException(Exception):
 
 
 class EventHandler(object):
+    # Handlers doing network I/O set asynchronous so that the EventManager
+    # gives them their own queue and thread. When the queue is full, the
+    # overflow policy drops the oldest or the newest event, or blocks emit.
+    asynchronous = False
+    queue_size = 1000
+    overflow = DROP_OLDEST
 
     def __init__(self):
         pass
@@ -20,11 +38,129 @@ class EventHandler(object):
         raise NotImplementedError("Please implement")
 
 
+class AsyncEventHandler(EventHandler):
+    """
+    Hands the events to a handler on its own thread, through a bounded
+    queue, so that a slow handler does not stall the bot.
+
+    `stats` counts the events queued, handled, dropped and the handler
+    errors, with the deepest the queue went.
+    """
+
+    def __init__(self, handler, queue_size=None, overflow=None):
+        self.handler = handler
+        self.overflow = overflow or handler.overflow
+        self.name = type(handler).__name__
+        self.logger = logging.getLogger(self.name)
+        self._queue = Queue.Queue(maxsize=queue_size or handler.queue_size)
+        self._lock = threading.Lock()
+        self.stats = {'queued': 0, 'handled': 0, 'dropped': 0, 'errors': 0, 'max_depth': 0}
+        self._stopped = False
+
+        self._thread = threading.Thread(target=self._run, name='%sThread' % self.name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def handle_event(self, event, sender, level, formatted_msg, data):
+        item = (event, sender, level, formatted_msg, data)
+
+        if self._stopped:
+            self._dropped()
+            return
+
+        if self.overflow == BLOCK:
+            self._queue.put(item)
+        else:
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    break
+                except Queue.Full:
+                    if self.overflow == DROP_NEWEST:
+                        self._dropped()
+                        return
+
+                try:
+                    self._queue.get_nowait()
+                    self._queue.task_done()
+                    self._dropped()
+                except Queue.Empty:
+                    pass
+
+        with self._lock:
+            self.stats['queued'] += 1
+            self.stats['max_depth'] = max(self.stats['max_depth'], self._queue.qsize())
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def join(self, timeout=None):
+        """
+        Waits until the queued events are handled.
+        :return: Whether the queue was emptied before the timeout.
+        :rtype: bool
+        """
+        deadline = None if timeout is None else time.time() + timeout
+
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.01)
+
+        return True
+
+    def stop(self, timeout=None):
+        """
+        Ends the thread once the events queued so far are handled. Later
+        events are dropped.
+        :return: Whether the thread ended before the timeout.
+        :rtype: bool
+        """
+        self._stopped = True
+
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except Queue.Full:
+            return False
+
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _dropped(self):
+        with self._lock:
+            self.stats['dropped'] += 1
+            dropped = self.stats['dropped']
+
+        # The first drop and then every 100th, not to flood the log
+        if dropped % 100 == 1:
+            self.logger.warning('%s is too slow, %s events dropped so far', self.name, dropped)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+
+            if item is _STOP:
+                self._queue.task_done()
+                return
+
+            try:
+                self.handler.handle_event(*item)
+                key = 'handled'
+            except Exception as e:
+                self.logger.error('Error while handling the %s event: %s', item[0], e)
+                key = 'errors'
+            finally:
+                self._queue.task_done()
+
+            with self._lock:
+                self.stats[key] += 1
+
+
 class EventManager(object):
 
     def __init__(self, limit_output=False, *handlers):
         self._registered_events = dict()
-        self._handlers = list(handlers) or []
+        self._handlers = [self._wrap(h) for h in handlers]
         self._last_event = None
         self._limit_output = limit_output
 
@@ -38,7 +174,41 @@ class EventManager(object):
                     print '* {}'.format(parameter)
 
     def add_handler(self, event_handler):
-        self._handlers.append(event_handler)
+        self._handlers.append(self._wrap(event_handler))
+
+    def _wrap(self, event_handler):
+        if event_handler.asynchronous:
+            return AsyncEventHandler(event_handler)
+        return event_handler
+
+    def queue_stats(self):
+        """
+        :return: The stats of the queue of every asynchronous handler, by name.
+        :rtype: dict
+        """
+        return dict((h.name, dict(h.stats, depth=h.depth()))
+                    for h in self._handlers if isinstance(h, AsyncEventHandler))
+
+    def flush(self, timeout=None):
+        """
+        Waits until the asynchronous handlers handled the queued events.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+
+        for handler in self._handlers:
+            if isinstance(handler, AsyncEventHandler):
+                handler.join(None if deadline is None else max(deadline - time.time(), 0))
+
+    def stop(self, timeout=None):
+        """
+        Ends the threads of the asynchronous handlers, once they handled
+        the queued events.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+
+        for handler in self._handlers:
+            if isinstance(handler, AsyncEventHandler):
+                handler.stop(None if deadline is None else max(deadline - time.time(), 0))
 
     def register_event(self, name, parameters=[]):
         self._registered_events[name] = parameters
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import namedtuple
+
+import numpy as np
+
+from pokemongo_bot.inventory import LevelToCPm
+
+EVOLVE_XP = 500
+NEW_POKEDEX_ENTRY_XP = 500
+LUCKY_EGG_DURATION = 30 * 60
+
+TRANSFER = 'transfer'
+EVOLVE = 'evolve'
+EVOLVE_FOR_XP = 'evolve_for_xp'
+UPGRADE = 'upgrade'
+
+Step = namedtuple('Step', ['action', 'pokemon', 'xp'])
+
+
+class FamilyPlan(object):
+    """
+    What the PokemonOptimizer may do with the Pokemon of one family.
+
+    `crap` are the Pokemon nobody wants to keep. They are either transferred
+    or evolved for xp, which brings one candy in both cases.
+    """
+
+    def __init__(self, family_id, candies, crap, try_evolve, try_upgrade, evolution_cost):
+        self.family_id = family_id
+        self.candies = candies + len(crap)
+        self.crap = crap
+        self.try_evolve = try_evolve
+        self.try_upgrade = try_upgrade
+        self.evolution_cost = evolution_cost
+        self.evolve = []
+        self.upgrade = []
+        self.xp = []
+
+    @property
+    def transfer(self):
+        return [p for p in self.crap if p not in self.xp]
+
+
+class OptimizationPlan(object):
+    """
+    Ordered steps the PokemonOptimizer runs back-to-back: transfers first,
+    then evolutions, then upgrades.
+    """
+
+    def __init__(self, lucky_egg=False):
+        self.lucky_egg = lucky_egg
+        self.transfer = []
+        self.evolve = []
+        self.upgrade = []
+        self.deferred = []
+        self.stardust = 0
+
+    @property
+    def xp(self):
+        xp = sum(s.xp for s in self.evolve)
+        return xp * 2 if self.lucky_egg else xp
+
+    @property
+    def steps(self):
+        return self.transfer + self.evolve + self.upgrade
+
+    def count(self, action):
+        return len([s for s in self.steps if s.action == action])
+
+
+class EvolutionPlanner(object):
+    """
+    Chooses the evolutions and upgrades of the whole bag at once.
+
+    Candies are budgeted by family and stardust for the whole bag, so the
+    upgrades of every family compete for it by CP gained per stardust.
+    When a lucky egg is used, evolutions are ordered by xp and the
+    evolutions for xp that would not fit in the egg are kept for the next
+    egg instead of being wasted.
+    """
+
+    def __init__(self, upgrade_costs, evolve_time=25, lucky_egg_duration=LUCKY_EGG_DURATION):
+        costs = np.asarray(upgrade_costs, dtype=int).reshape(-1, 2)
+        self.cumulative_costs = np.vstack([np.zeros((1, 2), dtype=int), np.cumsum(costs, axis=0)])
+        self.evolve_time = evolve_time
+        self.lucky_egg_duration = lucky_egg_duration
+
+    @property
+    def lucky_egg_capacity(self):
+        # The wait after an evolution is up to 10% longer than evolve_time
+        if self.evolve_time <= 0:
+            return None
+        return int(self.lucky_egg_duration / (self.evolve_time * 1.1))
+
+    def lucky_egg_threshold(self, count):
+        # Waiting for more evolutions than an egg can hold would never end
+        capacity = self.lucky_egg_capacity
+        return count if capacity is None else min(count, capacity)
+
+    def upgrade_cost(self, level, upgrade_level):
+        """
+        Candies and stardust needed to upgrade a Pokemon from a level index
+        (2 * level - 1) to another.
+        """
+        if level >= upgrade_level:
+            return 0, 0
+
+        candy, stardust = self.cumulative_costs[upgrade_level - 1] - self.cumulative_costs[level - 1]
+        return int(candy), int(stardust)
+
+    def cp_gain(self, pokemon, upgrade_level):
+        cp_multiplier = LevelToCPm.cp_multiplier_for((upgrade_level + 1) / 2.0)
+        return pokemon.cp_exact * ((cp_multiplier / pokemon.cp_m) ** 2 - 1)
+
+    def plan(self, families, stardust, upgrade_level, lucky_egg=False, evolve_for_xp=True, min_xp_evolutions=0, xp_for=None):
+        """
+        :param families: FamilyPlan of every family of the bag.
+        :param stardust: Stardust the upgrades may use.
+        :param upgrade_level: Level index the upgraded Pokemon are brought to.
+        :param lucky_egg: Whether a lucky egg is used before evolving.
+        :param min_xp_evolutions: Smallest batch of evolutions for xp worth
+                                  spending the candies of a family.
+        :param xp_for: Function giving the xp of the evolution of a Pokemon.
+        :rtype: OptimizationPlan
+        """
+        xp_for = xp_for or (lambda p: EVOLVE_XP)
+        plan = OptimizationPlan(lucky_egg)
+
+        for family in families:
+            self.plan_evolutions(family)
+
+        plan.stardust = self.plan_upgrades(families, stardust, upgrade_level)
+
+        if evolve_for_xp:
+            for family in families:
+                self.plan_xp_evolutions(family, min_xp_evolutions)
+
+        evolve = [Step(EVOLVE, p, xp_for(p)) for f in families for p in f.evolve]
+        evolve += [Step(EVOLVE_FOR_XP, p, xp_for(p)) for f in families for p in f.xp]
+        capacity = self.lucky_egg_capacity
+
+        if lucky_egg:
+            # Stable, the best Pokemon stay ahead of the ones evolved for xp
+            evolve.sort(key=lambda s: s.xp, reverse=True)
+
+            if capacity is not None and len(evolve) > capacity:
+                late = evolve[capacity:]
+                plan.deferred = [s.pokemon for s in late if s.action == EVOLVE_FOR_XP]
+                evolve = evolve[:capacity] + [s for s in late if s.action == EVOLVE]
+
+        plan.transfer = [Step(TRANSFER, p, 0) for f in families for p in f.transfer]
+        plan.evolve = evolve
+        plan.upgrade = [Step(UPGRADE, p, 0) for f in families for p in f.upgrade]
+        return plan
+
+    def plan_evolutions(self, family):
+        for pokemon in family.try_evolve:
+            if pokemon.evolution_cost > family.candies:
+                continue
+
+            # Evolving gives one candy back
+            family.candies -= pokemon.evolution_cost - 1
+            family.evolve.append(pokemon)
+
+    def plan_upgrades(self, families, stardust, upgrade_level):
+        candidates = []
+
+        for family in families:
+            for pokemon in family.try_upgrade:
+                level = int(pokemon.level * 2) - 1
+
+                if level >= upgrade_level:
+                    continue
+
+                candy, dust = self.upgrade_cost(level, upgrade_level)
+                candidates.append((self.cp_gain(pokemon, upgrade_level) / dust, family, pokemon, candy, dust))
+
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        spent = 0
+
+        for _, family, pokemon, candy, dust in candidates:
+            if (candy > family.candies) or (spent + dust > stardust):
+                continue
+
+            family.candies -= candy
+            spent += dust
+            family.upgrade.append(pokemon)
+
+        return spent
+
+    def plan_xp_evolutions(self, family, min_xp_evolutions):
+        cost = family.evolution_cost
+
+        # transfer + keep_for_xp = len(crap)
+        # leftover_candies = candies - len(crap) + transfer * 1
+        # keep_for_xp = (leftover_candies - 1) / (lowest_evolution_cost - 1)
+        # keep_for_xp = (candies - len(crap) + transfer - 1) / (lowest_evolution_cost - 1)
+        # keep_for_xp = (candies - keep_for_xp - 1) / (lowest_evolution_cost - 1)
+
+        if (family.candies > 0) and cost:
+            keep_for_xp = int((family.candies - 1) / cost)
+        else:
+            keep_for_xp = 0
+
+        xp = [p for p in family.crap if p.has_next_evolution() and p.evolution_cost == cost][:keep_for_xp]
+
+        # If not much to evolve, better keep the candies
+        if len(xp) < min_xp_evolutions:
+            xp = []
+
+        family.xp = xp
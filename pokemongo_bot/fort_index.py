@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import heapq
+from math import cos, floor, pi, radians
+
+from pokemongo_bot.cell_workers.utils import distances, sort_by_distance
+
+# Size of a grid bucket in degrees, roughly 220 meters of latitude
+GRID_STEP = 0.002
+# Same earth radius as cell_workers.utils.distance
+METERS_PER_DEGREE = 6371000 * pi / 180
+
+
+class FortIndex(object):
+    """
+    Grid bucketed index of the forts known to the bot.
+
+    The index is kept in sync with the meta cell through `update`, which only
+    touches the forts that were added, removed or changed. It answers nearest
+    and within-radius queries without sorting every fort by distance.
+    """
+
+    def __init__(self, step=GRID_STEP):
+        self.step = step
+        self.version = 0
+        self._source = None
+        self._forts = {}
+        self._buckets = {}
+        self._sorted_key = None
+        self._sorted = []
+
+    def __len__(self):
+        return len(self._forts)
+
+    def _key(self, lat, lng):
+        return int(floor(lat / self.step)), int(floor(lng / self.step))
+
+    def _add(self, fort):
+        key = self._key(fort['latitude'], fort['longitude'])
+        self._forts[fort['id']] = (fort, key)
+        self._buckets.setdefault(key, {})[fort['id']] = fort
+
+    def _remove(self, fort_id):
+        _, key = self._forts.pop(fort_id)
+        bucket = self._buckets[key]
+        del bucket[fort_id]
+
+        if not bucket:
+            del self._buckets[key]
+
+    def update(self, forts):
+        # The meta cell hands out the same list for as long as nothing changed
+        if forts is self._source:
+            return
+
+        self._source = forts
+        current = {f['id']: f for f in forts if 'latitude' in f and 'type' in f}
+        changed = False
+
+        for fort_id in [i for i in self._forts if i not in current]:
+            self._remove(fort_id)
+            changed = True
+
+        for fort_id, fort in current.iteritems():
+            indexed = self._forts.get(fort_id)
+
+            if indexed is not None:
+                if indexed[0] is fort:
+                    continue
+                self._remove(fort_id)
+
+            self._add(fort)
+            changed = True
+
+        if changed:
+            self.version += 1
+
+    def all(self):
+        return [fort for fort, _ in self._forts.itervalues()]
+
+    def iter_nearest(self, lat, lng, max_distance=None):
+        """
+        Yields (distance, fort) tuples in increasing distance from the given
+        position, visiting the grid ring by ring around it.
+        """
+        ci, cj = self._key(lat, lng)
+        rings = {}
+
+        for i, j in self._buckets:
+            rings.setdefault(max(abs(i - ci), abs(j - cj)), []).append((i, j))
+
+        heap = []
+        ring_numbers = sorted(rings)
+
+        for index, r in enumerate(ring_numbers):
+            forts = [fort for key in rings[r] for fort in self._buckets[key].itervalues()]
+            ring_distances = distances(lat, lng, [f['latitude'] for f in forts], [f['longitude'] for f in forts])
+
+            for dist, fort in zip(ring_distances, forts):
+                heapq.heappush(heap, (float(dist), fort['id'], fort))
+
+            if index + 1 < len(ring_numbers):
+                # Forts in the next ring are at least that many buckets away,
+                # using the narrowest bucket side those rings can reach.
+                next_r = ring_numbers[index + 1]
+                bound = (next_r - 1) * self.step * METERS_PER_DEGREE * cos(radians(min(abs(lat) + next_r * self.step, 90.0)))
+            else:
+                bound = float('inf')
+
+            while heap and heap[0][0] <= bound:
+                dist, _, fort = heapq.heappop(heap)
+
+                if max_distance is not None and dist > max_distance:
+                    return
+
+                yield dist, fort
+
+            if max_distance is not None and bound > max_distance:
+                return
+
+    def nearest(self, lat, lng, k=None, max_distance=None):
+        forts = []
+
+        for _, fort in self.iter_nearest(lat, lng, max_distance):
+            forts.append(fort)
+
+            if k is not None and len(forts) >= k:
+                break
+
+        return forts
+
+    def within(self, lat, lng, radius):
+        return self.nearest(lat, lng, max_distance=radius)
+
+    def sorted_by_distance(self, lat, lng):
+        key = (lat, lng, self.version)
+
+        if key != self._sorted_key:
+            self._sorted = sort_by_distance(lat, lng, self.all())
+            self._sorted_key = key
+
+        return self._sorted
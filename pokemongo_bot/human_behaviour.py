@@ -3,9 +3,13 @@
 import time
 from random import random, uniform, gauss
 
+from pokemongo_bot.timings import shared_timings
 
-def sleep(seconds, delta=0.3):
-    time.sleep(jitter(seconds,delta))
+
+def sleep(seconds, delta=0.3, kind='sleep'):
+    seconds = jitter(seconds,delta)
+    time.sleep(seconds)
+    shared_timings.wait(kind, seconds)
 
 
 def jitter(value, delta=0.3):
@@ -18,6 +22,7 @@ def action_delay(low, high):
     longNum = uniform(low, high)
     shortNum = float("{0:.2f}".format(longNum))
     time.sleep(shortNum)
+    shared_timings.wait('action_delay', shortNum)
 
 
 def random_lat_long_delta():
@@ -1,11 +1,15 @@
+import bisect
 import json
 import logging
 import os
 import time
 from collections import OrderedDict
 
+import numpy as np
+
 from pokemongo_bot.base_dir import _base_dir
 from pokemongo_bot.services.item_recycle_worker import ItemRecycler
+from pokemongo_bot.task_scheduler import INVENTORY
 
 '''
 Helper class for updating/retrieving Inventory data
@@ -64,7 +68,7 @@ class _BaseInventoryComponent(_StaticInventoryComponent):
         assert self.ID_FIELD is not None
         ret = {}
         for item in inventory:
-            data = item['inventory_item_data']
+            data = item.get('inventory_item_data', {})
             if self.TYPE in data:
                 item = data[self.TYPE]
                 key = item[self.ID_FIELD]
@@ -74,6 +78,10 @@ class _BaseInventoryComponent(_StaticInventoryComponent):
     def refresh(self, inventory):
         self._data = self.retrieve_data(inventory)
 
+    def apply_delta(self, inventory):
+        # only the items that changed since the last refresh are parsed again
+        self._data.update(self.retrieve_data(inventory))
+
     def get(self, object_id):
         return self._data.get(object_id)
 
@@ -122,6 +130,11 @@ class Player(_BaseInventoryComponent):
     def refresh(self,inventory):
         self.player_stats = self.retrieve_data(inventory)
 
+    def apply_delta(self, inventory):
+        player_stats = self.retrieve_data(inventory)
+        if player_stats:
+            self.player_stats = player_stats
+
     def parse(self, item):
         if not item:
             item = {}
@@ -135,7 +148,7 @@ class Player(_BaseInventoryComponent):
     def retrieve_data(self, inventory):
         ret = {}
         for item in inventory:
-            data = item['inventory_item_data']
+            data = item.get('inventory_item_data', {})
             if self.TYPE in data:
                 item = data[self.TYPE]
                 ret = item
@@ -424,8 +437,51 @@ class Pokemons(_BaseInventoryComponent):
                                     if not data[idx-1].has_next_evolution]
             assert len(p.last_evolution_ids) > 0
 
+        cls._init_stat_tables(data)
         return data
 
+    # Base attack/defense/stamina by pokemon id (row 0 is unused)
+    BASE_STATS = None  # type: np.ndarray
+    # Ids of the final evolutions by pokemon id, padded with the first one
+    LAST_EVOLUTIONS = None  # type: np.ndarray
+
+    @classmethod
+    def _init_stat_tables(cls, data):
+        cls.BASE_STATS = np.zeros((len(data) + 1, 3))
+        width = max(len(p.last_evolution_ids) for p in data)
+        cls.LAST_EVOLUTIONS = np.zeros((len(data) + 1, width), dtype=int)
+
+        for p in data:
+            cls.BASE_STATS[p.id] = (p.base_attack, p.base_defense, p.base_stamina)
+            ids = p.last_evolution_ids
+            cls.LAST_EVOLUTIONS[p.id] = ids + ids[:1] * (width - len(ids))
+
+    def evaluate(self, pokemons=None):
+        """
+        Computes the derived stats of many pokemons with a few array
+        operations, and caches them on the Pokemon instances.
+        :param pokemons: Pokemons to evaluate, the whole bag by default.
+        :return: Dict of arrays (pokemon_id, level, iv, cp_exact, cp_percent,
+                 ivcp), in the order of the pokemons.
+        :rtype: dict
+        """
+        if pokemons is None:
+            pokemons = self.all()
+
+        stats = evaluate_pokemons(
+            [p.pokemon_id for p in pokemons],
+            [(p.iv_attack, p.iv_defense, p.iv_stamina) for p in pokemons],
+            [p.cp_m for p in pokemons])
+
+        # Same sanity check as Pokemon.cp_exact, for wrong level or IV data
+        assert (np.maximum(stats['cp_exact'].astype(int), 10) == [p.cp for p in pokemons]).all()
+
+        for i, pokemon in enumerate(pokemons):
+            pokemon._cp_exact = stats['cp_exact'].item(i)
+            pokemon._ivcp = stats['ivcp'].item(i)
+
+        return stats
+
     @classmethod
     def get_space_used(cls):
         """
@@ -505,6 +561,10 @@ class Pokemons(_BaseInventoryComponent):
             raise ValueError("Pokemon not present in the inventory")
         self._data.pop(pokemon_unique_id)
 
+    def discard(self, pokemon_unique_id):
+        # same as remove, but the pokemon may already be gone locally
+        self._data.pop(pokemon_unique_id, None)
+
 
 #
 # Static Components
@@ -586,28 +646,66 @@ class LevelToCPm(_StaticInventoryComponent):
     MAX_CPM = .0
     # half of the lowest difference between CPMs
     HALF_DIFF_BETWEEN_HALF_LVL = 14e-3
+    # every half level from 1 and its CP multiplier, as arrays
+    LEVELS = None  # type: np.ndarray
+    CPMS = None  # type: np.ndarray
+    _level_list = None
+    _cpm_list = None
 
     @classmethod
     def init_static_data(cls):
         super(LevelToCPm, cls).init_static_data()
+        cls.LEVELS = np.array(sorted(float(level) for level in cls.STATIC_DATA))
+        cls.CPMS = np.array([cls.STATIC_DATA[cls._key(level)] for level in cls.LEVELS])
+        assert np.all(np.diff(cls.LEVELS) == .5)
+        assert np.all(np.diff(cls.CPMS) > .0)
+        cls._level_list = cls.LEVELS.tolist()
+        cls._cpm_list = cls.CPMS.tolist()
         cls.MAX_CPM = cls.cp_multiplier_for(cls.MAX_LEVEL)
         assert cls.MAX_CPM > .0
 
+    @staticmethod
+    def _key(level):
+        return str(int(level) if level.is_integer() else level)
+
     @classmethod
     def cp_multiplier_for(cls, level):
         # type: (Union[float, int, string]) -> float
         level = float(level)
-        level = str(int(level) if level.is_integer() else level)
-        return cls.STATIC_DATA[level]
+        index = int(level * 2) - 2
+        if not 0 <= index < len(cls.LEVELS) or cls.LEVELS[index] != level:
+            raise KeyError(cls._key(level))
+        return cls.CPMS.item(index)
 
     @classmethod
     def level_from_cpm(cls, cp_multiplier):
         # type: (float) -> float
-        for lvl, cpm in cls.STATIC_DATA.iteritems():
-            diff = abs(cpm - cp_multiplier)
-            if diff <= cls.HALF_DIFF_BETWEEN_HALF_LVL:
-                return float(lvl)
-        raise ValueError("Unknown cp_multiplier: {}".format(cp_multiplier))
+        # plain lists, numpy is slower than bisect for a single value
+        cpms = cls._cpm_list
+        right = min(max(bisect.bisect_left(cpms, cp_multiplier), 1), len(cpms) - 1)
+        index = right - 1 if cp_multiplier - cpms[right - 1] <= cpms[right] - cp_multiplier else right
+        if abs(cpms[index] - cp_multiplier) > cls.HALF_DIFF_BETWEEN_HALF_LVL:
+            raise ValueError("Unknown cp_multiplier: {}".format(cp_multiplier))
+        return cls._level_list[index]
+
+    @classmethod
+    def levels_from_cpms(cls, cp_multipliers):
+        # type: (Iterable[float]) -> np.ndarray
+        """
+        Vectorized level_from_cpm, picks the level with the closest CPM.
+        """
+        cp_multipliers = np.asarray(cp_multipliers, dtype=float)
+        right = np.clip(np.searchsorted(cls.CPMS, cp_multipliers), 1, len(cls.CPMS) - 1)
+        left = right - 1
+        closest = np.where(
+            cp_multipliers - cls.CPMS[left] <= cls.CPMS[right] - cp_multipliers, left, right)
+        diff = np.abs(cls.CPMS[closest] - cp_multipliers)
+
+        if np.any(diff > cls.HALF_DIFF_BETWEEN_HALF_LVL):
+            raise ValueError("Unknown cp_multiplier: {}".format(
+                cp_multipliers[diff > cls.HALF_DIFF_BETWEEN_HALF_LVL][0]))
+
+        return cls.LEVELS[closest]
 
 
 class _Attacks(_StaticInventoryComponent):
@@ -793,8 +891,9 @@ class PokemonInfo(object):
         self.fast_attacks = self._process_attacks()
         self.charged_attack = self._process_attacks(charged=True)
 
-        # prepare movesets
-        self.movesets = self._process_movesets()
+        # movesets are prepared on first use, see movesets
+        self._movesets = None
+        self._movesets_by_moves = None
 
         # Basic Values of the pokemon (identical for all pokemons of one kind)
         self.base_attack = data['BaseAttack']
@@ -848,6 +947,27 @@ class PokemonInfo(object):
     def is_captured(self):
         return pokedex().captured(self.id)
 
+    @property
+    def movesets(self):
+        # type: () -> List[Moveset]
+        # Only the species actually met during the session need them, so
+        # they are not computed for all the pokemons at startup
+        if self._movesets is None:
+            self._movesets = self._process_movesets()
+            self._movesets_by_moves = {
+                (m.fast_attack.id, m.charged_attack.id): m for m in self._movesets}
+        return self._movesets
+
+    def moveset_for(self, fast_attack, charged_attack):
+        # type: (Attack, ChargedAttack) -> Moveset
+        """
+        :return: The moveset made of these attacks, None if the pokemon
+                 is not supposed to learn them
+        """
+        if self._movesets_by_moves is None:
+            self.movesets
+        return self._movesets_by_moves.get((fast_attack.id, charged_attack.id))
+
     def _process_movesets(self):
         # type: () -> List[Moveset]
         """
@@ -925,6 +1045,17 @@ class PokemonInfo(object):
 
 
 class Pokemon(object):
+    # A full bag holds hundreds of these and they are rebuilt on every full
+    # inventory refresh, so keep them small
+    __slots__ = (
+        '_data', 'unique_id', 'pokemon_id', 'static',
+        'cp', 'cp_bm', 'cp_am', 'cp_m', 'level', 'hp_max', 'hp',
+        'iv_attack', 'iv_defense', 'iv_stamina', 'iv',
+        'name', 'nickname_raw', 'nickname', 'in_fort', 'is_favorite',
+        'fast_attack', 'charged_attack',
+        '_ivcp', '_cp_exact', '_moveset'
+    )
+
     def __init__(self, data):
         self._data = data
         # Unique ID for this particular Pokemon
@@ -960,11 +1091,6 @@ class Pokemon(object):
         self.iv_defense = data.get('individual_defense', 0)
         self.iv_stamina = data.get('individual_stamina', 0)
 
-        # Basic Values of the pokemon (identical for all pokemons of one kind)
-        base_attack = self.static.base_attack
-        base_defense = self.static.base_defense
-        base_stamina = self.static.base_stamina
-
         self.name = self.static.name
         self.nickname_raw = data.get('nickname', '')
         self.nickname = self.nickname_raw or self.name
@@ -978,23 +1104,10 @@ class Pokemon(object):
         # Individial values (IV) perfection percent
         self.iv = self._compute_iv_perfection()
 
-        # IV CP perfection - kind of IV perfection percent but calculated
-        #  using weight of each IV in its contribution to CP of the best
-        #  evolution of current pokemon
-        # So it tends to be more accurate than simple IV perfection
-        self.ivcp = self._compute_cp_perfection()
-
-        # Exact value of current CP (not rounded)
-        self.cp_exact = _calc_cp(
-            base_attack, base_defense, base_stamina,
-            self.iv_attack, self.iv_defense, self.iv_stamina, self.cp_m)
-        assert max(int(self.cp_exact), 10) == self.cp
-
-        # Percent of maximum possible CP
-        self.cp_percent = self.cp_exact / self.static.max_cp
-
-        # Get moveset instance with calculated DPS and perfection percents
-        self.moveset = self._get_moveset()
+        # Derived values below are only computed when first read
+        self._ivcp = None
+        self._cp_exact = None
+        self._moveset = None
 
     def __str__(self):
         return self.name
@@ -1051,6 +1164,73 @@ class Pokemon(object):
     def iv_display(self):
         return '{}/{}/{}'.format(self.iv_attack, self.iv_defense, self.iv_stamina)
 
+    @property
+    def ivcp(self):
+        # IV CP perfection - kind of IV perfection percent but calculated
+        #  using weight of each IV in its contribution to CP of the best
+        #  evolution of current pokemon
+        # So it tends to be more accurate than simple IV perfection
+        if self._ivcp is None:
+            self._ivcp = self._compute_cp_perfection()
+        return self._ivcp
+
+    @property
+    def cp_exact(self):
+        # Exact value of current CP (not rounded)
+        if self._cp_exact is None:
+            cp_exact = _calc_cp(
+                self.static.base_attack, self.static.base_defense, self.static.base_stamina,
+                self.iv_attack, self.iv_defense, self.iv_stamina, self.cp_m)
+            assert max(int(cp_exact), 10) == self.cp
+            self._cp_exact = cp_exact
+        return self._cp_exact
+
+    @property
+    def cp_percent(self):
+        # Percent of maximum possible CP
+        return self.cp_exact / self.static.max_cp
+
+    @property
+    def moveset(self):
+        # Moveset instance with calculated DPS and perfection percents
+        if self._moveset is None:
+            self._moveset = self._get_moveset()
+        return self._moveset
+
+    # Shortcuts used as sort keys and requirements by the PokemonOptimizer
+
+    @property
+    def ncp(self):
+        return self.cp_percent
+
+    @property
+    def dps(self):
+        return self.moveset.dps
+
+    @property
+    def dps1(self):
+        return self.fast_attack.dps
+
+    @property
+    def dps2(self):
+        return self.charged_attack.dps
+
+    @property
+    def dps_attack(self):
+        return self.moveset.dps_attack
+
+    @property
+    def dps_defense(self):
+        return self.moveset.dps_defense
+
+    @property
+    def attack_perfection(self):
+        return self.moveset.attack_perfection
+
+    @property
+    def defense_perfection(self):
+        return self.moveset.defense_perfection
+
     def _compute_iv_perfection(self):
         total_iv = self.iv_attack + self.iv_defense + self.iv_stamina
         iv_perfection = round((total_iv / 45.0), 2)
@@ -1099,12 +1279,7 @@ class Pokemon(object):
     def _get_moveset(self):
         move1 = self.fast_attack
         move2 = self.charged_attack
-        movesets = self.static.movesets
-        current_moveset = None
-        for moveset in movesets:  # type: Moveset
-            if moveset.fast_attack == move1 and moveset.charged_attack == move2:
-                current_moveset = moveset
-                break
+        current_moveset = self.static.moveset_for(move1, move2)
 
         if current_moveset is None:
             error = "Unexpected moveset [{}, {}] for #{} {}," \
@@ -1248,6 +1423,11 @@ class Moveset(object):
 
 
 class Inventory(object):
+    # The bot keeps its cached inventory up to date between refreshes
+    # (releases, catches, used items...), ask for the whole inventory
+    # again from time to time in case it drifted from the server.
+    FULL_REFRESH_INTERVAL = 600
+
     def __init__(self, bot):
         self.bot = bot
         self.pokedex = Pokedex()
@@ -1257,50 +1437,86 @@ class Inventory(object):
         self.pokemons = Pokemons()
         self.player = Player(self.bot)  # include inventory inside Player?
         self.egg_incubators = None
+        self.last_timestamp_ms = None
+        self.last_full_refresh = 0
         self.refresh()
         self.item_inventory_size = None
         self.pokemon_inventory_size = None
 
+    def delta_timestamp(self):
+        """
+        Timestamp to send as last_timestamp_ms with GET_INVENTORY, so that
+        the server only returns the items changed since then.
+        :return: The timestamp, 0 when the whole inventory is needed.
+        :rtype: int
+        """
+        if self.last_timestamp_ms is None:
+            return 0
+        if time.time() - self.last_full_refresh >= self.FULL_REFRESH_INTERVAL:
+            return 0
+        return self.last_timestamp_ms
+
     def refresh(self, inventory=None):
         if inventory is None:
-            inventory = self.bot.api.get_inventory()
+            inventory = self.bot.api.get_inventory(last_timestamp_ms=self.delta_timestamp())
 
-        inventory = inventory['responses']['GET_INVENTORY']['inventory_delta']['inventory_items']
-        for i in (self.pokedex, self.candy, self.items, self.pokemons, self.player):
-            i.refresh(inventory)
+        responses = inventory.get('responses', {}) if isinstance(inventory, dict) else {}
+        inventory_delta = responses.get('GET_INVENTORY', {}).get('inventory_delta')
 
-        # self.applied_items = [x["inventory_item_data"] for x in inventory if "applied_items" in x["inventory_item_data"]]
-        self.egg_incubators = [x["inventory_item_data"] for x in inventory if "egg_incubators" in x["inventory_item_data"]]
+        # The call failed, the cached inventory stays as it is
+        if inventory_delta is None:
+            return
 
-        self.update_web_inventory()
+        inventory = inventory_delta.get('inventory_items', [])
 
-    def init_inventory_outfile(self):
-        web_inventory = os.path.join(_base_dir, "web", "inventory-%s.json" % self.bot.config.username)
+        # original_timestamp_ms is the last_timestamp_ms we sent, 0 when the
+        # response holds the whole inventory
+        if inventory_delta.get('original_timestamp_ms', 0):
+            changed = self.apply_delta(inventory)
+        else:
+            for i in (self.pokedex, self.candy, self.items, self.pokemons, self.player):
+                i.refresh(inventory)
 
-        if not os.path.exists(web_inventory):
-            self.bot.logger.info('No inventory file %s found. Creating a new one' % web_inventory)
+            # self.applied_items = [x["inventory_item_data"] for x in inventory if "applied_items" in x["inventory_item_data"]]
+            self.egg_incubators = [x["inventory_item_data"] for x in inventory if "egg_incubators" in x["inventory_item_data"]]
+            self.last_full_refresh = time.time()
+            changed = True
 
-            json_inventory = []
+        if 'new_timestamp_ms' in inventory_delta:
+            self.last_timestamp_ms = inventory_delta['new_timestamp_ms']
 
-            with open(web_inventory, "w") as outfile:
-                json.dump(json_inventory, outfile)
+        if changed:
+            self.bot.scheduler.trigger(INVENTORY)
+            self.update_web_inventory()
 
-    def update_web_inventory(self):
-        web_inventory = os.path.join(_base_dir, "web", "inventory-%s.json" % self.bot.config.username)
+    def apply_delta(self, inventory):
+        """
+        Applies the items changed since the last refresh to the cached
+        inventory, leaving the unchanged ones (and their objects) untouched.
+        :return: Whether anything changed.
+        :rtype: bool
+        """
+        if not inventory:
+            return False
 
-        if not os.path.exists(web_inventory):
-            self.init_inventory_outfile()
+        for item in inventory:
+            deleted_key = item.get('deleted_item_key')
+            if deleted_key:
+                # only pokemons and eggs are ever deleted
+                self.pokemons.discard(deleted_key)
+
+        for i in (self.pokedex, self.candy, self.items, self.pokemons, self.player):
+            i.apply_delta(inventory)
 
-        json_inventory = self.jsonify_inventory()
+        egg_incubators = [x["inventory_item_data"] for x in inventory if "egg_incubators" in x.get("inventory_item_data", {})]
+        if egg_incubators:
+            self.egg_incubators = egg_incubators
 
-        try:
-            with open(web_inventory, "w") as outfile:
-                json.dump(json_inventory, outfile)
-        except (IOError, ValueError) as e:
-            self.bot.logger.info('[x] Error while opening inventory file for write: %s' % e, 'red')
-            pass
-        except:
-            raise FileIOException("Unexpected error writing to {}".web_inventory)
+        return True
+
+    def update_web_inventory(self):
+        web_inventory = os.path.join(_base_dir, "web", "inventory-%s.json" % self.bot.config.username)
+        self.bot.web_writer.write(web_inventory, self.jsonify_inventory())
 
     def jsonify_inventory(self):
         json_inventory = []
@@ -1392,6 +1608,53 @@ def _calc_cp(base_attack, base_defense, base_stamina,
         * (cp_multiplier ** 2) / 10
 
 
+def calc_cp_array(pokemon_ids, ivs, cp_multipliers):
+    """
+    Vectorized _calc_cp for many pokemons at once.
+    :param pokemon_ids: Array of N pokemon ids
+    :param ivs: Array of N (attack, defense, stamina) individual values
+    :param cp_multipliers: Array of N CP multipliers
+    :return: Array of N exact CPs
+    """
+    base = Pokemons.BASE_STATS[np.asarray(pokemon_ids, dtype=int)]
+    ivs = np.asarray(ivs, dtype=float).reshape(-1, 3)
+    stats = base + ivs
+    return stats[:, 0] * np.sqrt(stats[:, 1]) * np.sqrt(stats[:, 2]) \
+        * (np.asarray(cp_multipliers, dtype=float) ** 2) / 10
+
+
+def evaluate_pokemons(pokemon_ids, ivs, cp_multipliers):
+    """
+    Derived stats of many pokemons, same values as the Pokemon properties.
+    :return: Dict of arrays: pokemon_id, level, iv, cp_exact, cp_percent, ivcp
+    :rtype: dict
+    """
+    pokemon_ids = np.asarray(pokemon_ids, dtype=int)
+    ivs = np.asarray(ivs, dtype=float).reshape(-1, 3)
+    cp_multipliers = np.asarray(cp_multipliers, dtype=float)
+    max_cpm = np.full(len(pokemon_ids), LevelToCPm.MAX_CPM)
+
+    cp_exact = calc_cp_array(pokemon_ids, ivs, cp_multipliers)
+    max_cp = calc_cp_array(pokemon_ids, np.full_like(ivs, 15), max_cpm)
+
+    # CP perfection at max level, for the best of the final evolutions
+    ivcp = np.full(len(pokemon_ids), -np.inf)
+    for column in Pokemons.LAST_EVOLUTIONS[pokemon_ids].T:
+        worst_cp = calc_cp_array(column, np.zeros_like(ivs), max_cpm)
+        perfect_cp = calc_cp_array(column, np.full_like(ivs, 15), max_cpm)
+        current_cp = calc_cp_array(column, ivs, max_cpm)
+        ivcp = np.maximum(ivcp, (current_cp - worst_cp) / (perfect_cp - worst_cp))
+
+    return {
+        'pokemon_id': pokemon_ids,
+        'level': LevelToCPm.levels_from_cpms(cp_multipliers),
+        'iv': np.round(ivs.sum(axis=1) / 45.0, 2),
+        'cp_exact': cp_exact,
+        'cp_percent': cp_exact / max_cp,
+        'ivcp': ivcp
+    }
+
+
 # Initialize static data in the right order
 Types()  # init Types
 LevelToCPm()  # init LevelToCPm
@@ -1428,6 +1691,16 @@ def refresh_inventory(data=None):
     except AttributeError:
         print '_inventory was not initialized'
 
+def delta_timestamp():
+    """
+    Timestamp to send as last_timestamp_ms with the next GET_INVENTORY.
+    :return: The timestamp, 0 to get the whole inventory.
+    :rtype: int
+    """
+    if _inventory is None:
+        return 0
+    return _inventory.delta_timestamp()
+
 def jsonify_inventory():
     try:
         return _inventory.jsonify_inventory()
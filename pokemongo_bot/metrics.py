@@ -2,6 +2,7 @@ import time
 from datetime import timedelta
 from pokemongo_bot.inventory import Pokemons, refresh_inventory
 from pokemongo_bot import inventory
+from pokemongo_bot.timings import RollingHistogram
 
 class Metrics(object):
 
@@ -28,6 +29,9 @@ class Metrics(object):
 
         self.player_stats = []
 
+        self.ticks = RollingHistogram()
+        self.cache = {}
+
     def runtime(self):
         return timedelta(seconds=round(time.time() - self.start_time))
 
@@ -98,6 +102,14 @@ class Metrics(object):
     def released_pokemon(self, count=1):
         self.releases += count
 
+    def tick_done(self, seconds):
+        self.ticks.add(seconds)
+
+    def cache_lookup(self, cache, hits=0, misses=0):
+        counts = self.cache.setdefault(cache, {'hits': 0, 'misses': 0})
+        counts['hits'] += hits
+        counts['misses'] += misses
+
     def capture_stats(self):
         try:
             uniq_pokemon_list = set()
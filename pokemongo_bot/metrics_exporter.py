@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import logging
+import socket
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+from pokemongo_bot.rate_limiter import shared_bucket
+from pokemongo_bot.timings import shared_timings
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+PREFIX = 'pokemongo_bot_'
+QUANTILES = (('0.5', 'p50'), ('0.9', 'p90'), ('0.99', 'p99'))
+
+# Metrics attribute, OpenMetrics name and help of the player counters
+PLAYER_COUNTERS = (
+    ('xp', 'xp', 'Experience of the player'),
+    ('visits', 'pokestop_visits', 'Pokestops visited by the player'),
+    ('encounters', 'pokemon_encountered', 'Pokemon encountered by the player'),
+    ('captures', 'pokemon_captured', 'Pokemon captured by the player'),
+    ('throws', 'pokeballs_thrown', 'Pokeballs thrown by the player'),
+    ('evolutions', 'evolutions', 'Pokemon evolved by the player'),
+    ('distance', 'walked_kilometers', 'Kilometers walked by the player')
+)
+
+
+def escape(value):
+    return unicode(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricFamily(object):
+    def __init__(self, name, kind, help_text):
+        self.name = PREFIX + name
+        self.kind = kind
+        self.help_text = help_text
+        self.samples = []
+
+    def add(self, value, suffix='', **labels):
+        self.samples.append((suffix, labels, value))
+
+    def add_summary(self, summary, **labels):
+        for quantile, key in QUANTILES:
+            self.add(summary[key], quantile=quantile, **labels)
+        self.add(summary['total'], '_sum', **labels)
+        self.add(summary['count'], '_count', **labels)
+
+    def lines(self, account):
+        yield '# TYPE {} {}'.format(self.name, self.kind)
+        yield '# HELP {} {}'.format(self.name, self.help_text)
+
+        for suffix, labels, value in self.samples:
+            labels = sorted(dict(labels, account=account).iteritems())
+            yield '{}{}{{{}}} {}'.format(
+                self.name, suffix,
+                ','.join('{}="{}"'.format(k, escape(v)) for k, v in labels),
+                repr(float(value))
+            )
+
+
+def collect(bot):
+    """
+    Reads the metrics of the bot.
+    :rtype: list of MetricFamily
+    """
+    metrics = bot.metrics
+    families = []
+
+    def family(name, kind, help_text):
+        families.append(MetricFamily(name, kind, help_text))
+        return families[-1]
+
+    family('uptime_seconds', 'gauge', 'Seconds since the bot started').add(time.time() - metrics.start_time)
+
+    for attribute, name, help_text in PLAYER_COUNTERS:
+        latest = getattr(metrics, attribute)['latest']
+        if latest >= 0:
+            family(name, 'counter', help_text).add(latest, '_total')
+
+    family('pokemon_released', 'counter', 'Pokemon released since the bot started').add(metrics.releases, '_total')
+    family('eggs_hatched', 'counter', 'Eggs hatched since the bot started').add(metrics.eggs['hatched'], '_total')
+
+    family('tick_seconds', 'summary', 'Duration of the ticks of the bot').add_summary(metrics.ticks.summary())
+
+    timings = shared_timings.stats()
+    tasks = family('task_seconds', 'summary', 'Duration of the work of each task')
+    task_calls = family('task_api_calls', 'counter', 'RPC envelopes sent by each task, the queued ones included')
+    for name, summary in timings['tasks'].iteritems():
+        tasks.add_summary(summary, task=name)
+        task_calls.add(summary['api_calls'], '_total', task=name)
+
+    rpcs = family('rpc_seconds', 'summary', 'Duration of the RPC envelopes holding each RPC type')
+    rpc_errors = family('rpc_errors', 'counter', 'Failed and retried attempts of each RPC type')
+    for name, summary in timings['rpcs'].iteritems():
+        rpcs.add_summary(summary, rpc=name)
+        rpc_errors.add(summary['errors'], '_total', rpc=name)
+
+    waits = family('wait_seconds', 'summary', 'Time spent sleeping, by kind of wait')
+    for name, summary in timings['waits'].iteritems():
+        waits.add_summary(summary, kind=name)
+
+    rate_limit = shared_bucket.stats()
+    family('rate_limit_waits', 'counter', 'Requests delayed by the rate limiter').add(rate_limit['waits'], '_total')
+
+    depth = family('event_queue_depth', 'gauge', 'Events waiting for each asynchronous event handler')
+    dropped = family('events_dropped', 'counter', 'Events dropped by each asynchronous event handler')
+    for name, stats in bot.event_manager.queue_stats().iteritems():
+        depth.add(stats['depth'], handler=name)
+        dropped.add(stats['dropped'], '_total', handler=name)
+
+    family('database_log_pending', 'gauge', 'Log rows waiting to be written').add(bot.database_log.pending())
+
+    hits = family('cache_hits', 'counter', 'Lookups answered by each cache')
+    misses = family('cache_misses', 'counter', 'Lookups each cache could not answer')
+    for name, counts in metrics.cache.items():
+        hits.add(counts['hits'], '_total', cache=name)
+        misses.add(counts['misses'], '_total', cache=name)
+
+    return families
+
+
+def render(bot):
+    """
+    :return: The metrics of the bot in the OpenMetrics text format.
+    :rtype: unicode
+    """
+    lines = []
+
+    for family in collect(bot):
+        lines.extend(family.lines(bot.config.username))
+
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class MetricsExporter(object):
+    """
+    Serves the metrics of the bot on http://host:port/metrics, for
+    Prometheus or any OpenMetrics scraper.
+    """
+
+    def __init__(self, bot, host='127.0.0.1', port=9400):
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self.logger = logging.getLogger(type(self).__name__)
+        self.server = None
+
+    def start(self):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+
+                try:
+                    body = render(exporter.bot).encode('utf-8')
+                except Exception as e:
+                    exporter.logger.error('Could not collect the metrics: %s', e)
+                    self.send_error(500)
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            self.server = _Server((self.host, self.port), Handler)
+        except socket.error as e:
+            self.logger.warning('Could not serve metrics on %s:%s: %s', self.host, self.port, e)
+            return self
+
+        self.port = self.server.server_address[1]
+
+        thread = threading.Thread(target=self.server.serve_forever, name='MetricsExporter')
+        thread.daemon = True
+        thread.start()
+
+        self.logger.info('Serving metrics on http://%s:%s/metrics', self.host, self.port)
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
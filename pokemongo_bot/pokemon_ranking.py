@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import math
+
+import numpy as np
+
+
+def _numeric(values):
+    # Non numeric columns (names...) are compared through their sorted rank
+    if values.dtype.kind not in 'biuf':
+        values = np.unique(values, return_inverse=True)[1]
+    return values.astype(float)
+
+
+def unique_rows(row_lists):
+    """
+    Concatenates lists of rows, keeping the first occurrence of each row.
+    """
+    rows = np.concatenate([np.zeros(0, dtype=int)] + list(row_lists)).astype(int)
+    _, first = np.unique(rows, return_index=True)
+    return rows[np.sort(first)]
+
+
+class PokemonTable(object):
+    """
+    Columnar view of a list of Pokemon.
+
+    Every column is a numpy array built on first use from the Pokemon
+    attribute of the same name, so a rule only pays for the attributes it
+    sorts or filters on. Rows are the positions of the Pokemon in the list.
+    """
+
+    def __init__(self, pokemons, columns=None):
+        self.pokemons = list(pokemons)
+        self._columns = {}
+
+        for name, values in (columns or {}).items():
+            self._columns[name] = np.asarray(values)
+
+    def __len__(self):
+        return len(self.pokemons)
+
+    def column(self, attribute):
+        values = self._columns.get(attribute)
+
+        if values is None:
+            if attribute == 'has_next_evolution':
+                values = np.array([p.has_next_evolution() for p in self.pokemons], dtype=bool)
+            else:
+                values = np.array([getattr(p, attribute, 0) for p in self.pokemons])
+
+            self._columns[attribute] = values
+
+        return values
+
+    def rows(self, mask=None):
+        if mask is None:
+            return np.arange(len(self.pokemons))
+        return np.flatnonzero(mask)
+
+    def take(self, rows):
+        return [self.pokemons[i] for i in rows]
+
+
+class RuleEvaluator(object):
+    """
+    Evaluates a PokemonOptimizer rule on every row of a PokemonTable at once.
+
+    Scores are compared like the tuples of the "sort" attributes: the first
+    attribute first, the next ones breaking the ties. Rows are ranked by
+    score, best first, keeping the table order between equal scores.
+    """
+
+    def __init__(self, table, rule):
+        self.table = table
+        self.rule = rule
+        self.top = max(rule.get("top", 0), 0)
+        self.keys = [_numeric(table.column(a)) for a in rule.get("sort", [])]
+
+        self.keep = self.requirement_mask(rule.get("keep", True))
+        self.evolve = table.column('has_next_evolution') & self.requirement_mask(rule.get("evolve", True))
+        self.upgrade = self.requirement_mask(rule.get("upgrade", False))
+
+    def requirement_mask(self, req):
+        if req in [False, {}]:
+            return np.zeros(len(self.table), dtype=bool)
+
+        if type(req) is bool:
+            return np.ones(len(self.table), dtype=bool)
+
+        mask = np.ones(len(self.table), dtype=bool)
+
+        for a, v in req.items():
+            value = self.table.column(a)
+
+            if (type(v) is str) or (type(v) is unicode):
+                v = float(v)
+
+            if type(v) is list:
+                if type(v[0]) is list:
+                    mask &= np.any([(value >= r[0]) & (value <= r[1]) for r in v], axis=0)
+                else:
+                    mask &= (value >= v[0]) & (value <= v[1])
+            elif v < 0:
+                mask &= (value <= abs(v))
+            else:
+                mask &= (value >= v)
+
+        return mask
+
+    def rank(self, rows, group_by=None):
+        """
+        Drops the rows the rule does not keep and sorts the others by group,
+        then by score.
+        :return: Tuple of the sorted rows and of their group ids.
+        """
+        rows = np.asarray(rows, dtype=int)
+        rows = rows[self.keep[rows]]
+
+        if group_by is None:
+            groups = np.zeros(len(rows), dtype=int)
+        else:
+            groups = self.table.column(group_by)[rows]
+
+        # lexsort is stable and sorts by the last key first
+        order = np.lexsort([-k[rows] for k in reversed(self.keys)] + [groups])
+        return rows[order], groups[order]
+
+    def at_least(self, rows, thresholds):
+        selected = np.ones(len(rows), dtype=bool)
+
+        for key, threshold in reversed(zip(self.keys, thresholds)):
+            values = key[rows]
+            selected = (values > threshold) | ((values == threshold) & selected)
+
+        return selected
+
+    def best(self, rows, group_by=None):
+        """
+        Keeps the "top" best rows of every group, and the rows tied with
+        the worst of them. A top between 0 and 1 keeps the rows scoring at
+        least that fraction below the best of their group.
+        :return: Tuple of the keep, try_evolve and try_upgrade rows.
+        """
+        rows, groups = self.rank(rows, group_by)
+
+        if len(rows) == 0:
+            return self.split(rows)
+
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = groups[1:] != groups[:-1]
+        starts = np.flatnonzero(first)
+        sizes = np.diff(np.append(starts, len(rows)))
+        group_of_row = np.cumsum(first) - 1
+
+        if 0 < self.top < 1:
+            thresholds = [k[rows[starts]] * (1 - self.top) for k in self.keys]
+        else:
+            index = int(math.ceil(self.top)) - 1
+            offsets = np.where((0 <= index) & (index < sizes), index, sizes - 1)
+            worst = rows[starts + offsets]
+            thresholds = [k[worst] for k in self.keys]
+
+        selected = self.at_least(rows, [t[group_of_row] for t in thresholds])
+        return self.split(rows[selected])
+
+    def better_than(self, rows, worst, limit=None):
+        """
+        Keeps the rows scoring at least as much as the worst row, up to limit.
+        :return: Tuple of the keep, try_evolve and try_upgrade rows.
+        """
+        rows, _ = self.rank(rows)
+        selected = rows[self.at_least(rows, [k[worst] for k in self.keys])]
+        return self.split(selected[:limit])
+
+    def split(self, rows):
+        evolve = self.evolve[rows]
+        return rows, rows[evolve], rows[~evolve & self.upgrade[rows]]
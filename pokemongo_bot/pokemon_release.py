@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+
+from pokemongo_bot import inventory
+from pokemongo_bot.human_behaviour import action_delay
+
+try:
+    from pgoapi.protos.POGOProtos.Networking.Requests.Messages.ReleasePokemonMessage_pb2 import ReleasePokemonMessage
+    # Older protocols only know the single pokemon_id field
+    MULTI_RELEASE = 'pokemon_ids' in ReleasePokemonMessage.DESCRIPTOR.fields_by_name
+except ImportError:
+    MULTI_RELEASE = False
+
+SUCCESS = 1
+# Most Pokemon sent in one RELEASE_POKEMON request
+MAX_BATCH_SIZE = 50
+
+
+def summarize(pokemons):
+    counts = OrderedDict()
+
+    for pokemon in pokemons:
+        counts[pokemon.name] = counts.get(pokemon.name, 0) + 1
+
+    return ', '.join(name if count == 1 else '%s x%s' % (name, count) for name, count in counts.iteritems())
+
+
+class PokemonReleaser(object):
+    """
+    Releases many Pokemon with as few RELEASE_POKEMON requests as the
+    protocol allows.
+
+    Up to batch_size Pokemon share a request when the protocol has the
+    repeated pokemon_ids field, otherwise each of them needs its own. In
+    both cases the transfer wait happens between requests only. Each
+    Pokemon gets its pokemon_release event once its request succeeded,
+    and a single pokemon_release_batch event sums up the release.
+    """
+
+    def __init__(self, task, wait_min=1, wait_max=4, batch_size=MAX_BATCH_SIZE):
+        self.task = task
+        self.bot = task.bot
+        self.wait_min = wait_min
+        self.wait_max = wait_max
+        self.batch_size = batch_size if MULTI_RELEASE else 1
+
+    def release(self, pokemons, send=True, update=True):
+        """
+        :param pokemons: Pokemon to release.
+        :param send: Whether the requests are sent. When not, every release
+                     is assumed to succeed with one candy per Pokemon.
+        :param update: Whether the inventory and the transfer_log are updated.
+        :return: The Pokemon that were released.
+        :rtype: list
+        """
+        released = []
+        candy_awarded = 0
+
+        for start in range(0, len(pokemons), self.batch_size):
+            if send and start > 0:
+                action_delay(self.wait_min, self.wait_max)
+
+            batch = pokemons[start:start + self.batch_size]
+            candy = self.send_release(batch) if send else len(batch)
+
+            if candy is None:
+                continue
+
+            # The server only tells the total, every Pokemon is worth the same
+            share, left = divmod(candy, len(batch))
+
+            for index, pokemon in enumerate(batch):
+                if update:
+                    self.update_inventory(pokemon, share + (1 if index < left else 0))
+                self.emit_release(pokemon)
+
+            if update:
+                self.bot.metrics.released_pokemon(len(batch))
+
+            released += batch
+            candy_awarded += candy
+
+        if not released:
+            return released
+
+        self.task.emit_event(
+            'pokemon_release_batch',
+            formatted="Released {count} Pokemon ({pokemons}) [+{candy} candies]",
+            data={
+                'count': len(released),
+                'candy': candy_awarded,
+                'pokemons': summarize(released)
+            }
+        )
+
+        return released
+
+    def send_release(self, batch):
+        if len(batch) == 1:
+            response_dict = self.bot.api.release_pokemon(pokemon_id=batch[0].unique_id)
+        else:
+            response_dict = self.bot.api.release_pokemon(pokemon_ids=[p.unique_id for p in batch])
+
+        if not response_dict:
+            return None
+
+        response = response_dict.get('responses', {}).get('RELEASE_POKEMON') or {}
+
+        if response.get('result', SUCCESS) != SUCCESS:
+            return None
+
+        return response.get('candy_awarded', 0)
+
+    def update_inventory(self, pokemon, candy):
+        inventory.candies().get(pokemon.pokemon_id).add(candy)
+        inventory.pokemons().remove(pokemon.unique_id)
+        self.bot.database_log.insert('transfer_log', sender=self.task, pokemon=pokemon.name, iv=pokemon.iv, cp=pokemon.cp)
+
+    def emit_release(self, pokemon):
+        candy = inventory.candies().get(pokemon.pokemon_id).quantity
+        self.task.emit_event(
+            'pokemon_release',
+            formatted="Released {} (CP: {}, IV: {}, IVCP: {}) You now have {} {} candies".format(
+                pokemon.name, pokemon.cp, pokemon.iv, pokemon.ivcp, candy, pokemon.name),
+            data={
+                'pokemon': pokemon.name,
+                'iv': pokemon.iv,
+                'cp': pokemon.cp,
+                'ivcp': pokemon.ivcp,
+                'candy': candy
+            }
+        )
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import threading
+import time
+
+DEFAULT_REQUESTS_PER_SECOND = 2.0
+DEFAULT_BURST = 3.0
+
+
+class TokenBucket(object):
+    """
+    Thread safe token bucket limiting how fast requests are sent to the server.
+
+    Tokens are refilled at `rate` per second up to `capacity`, which is the
+    size of the burst allowed after a quiet period. Every envelope costs the
+    highest weight among the RPCs it contains, so expensive calls can be
+    made to use up more of the budget than cheap ones.
+    """
+
+    def __init__(self, rate=DEFAULT_REQUESTS_PER_SECOND, capacity=DEFAULT_BURST, weights=None):
+        self._lock = threading.Lock()
+        self.rate = None
+        self.capacity = None
+        self.weights = {}
+        self.configure(rate, capacity, weights)
+
+        self.tokens = self.capacity
+        self.last_refill = time.time()
+        self.reset_stats()
+
+    def configure(self, rate=None, capacity=None, weights=None):
+        if rate is not None and rate <= 0:
+            raise ValueError('rate must be greater than zero')
+        if capacity is not None and capacity < 1:
+            raise ValueError('capacity must be at least 1')
+
+        with self._lock:
+            if rate is not None:
+                self.rate = float(rate)
+            if capacity is not None:
+                self.capacity = float(capacity)
+            if weights is not None:
+                self.weights = {k.upper(): float(v) for k, v in weights.iteritems()}
+
+    def reset_stats(self):
+        with self._lock:
+            self.acquired = 0
+            self.waits = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+            self.acquired_by_type = {}
+
+    def weight_for(self, request_types):
+        return max([self.weights.get(t.upper(), 1.0) for t in request_types] or [1.0])
+
+    def reserve(self, request_types=()):
+        """
+        Takes the tokens needed for an envelope and returns how long the
+        caller has to wait before sending it. The balance is allowed to go
+        negative so concurrent callers queue up behind each other.
+        """
+        weight = self.weight_for(request_types)
+
+        with self._lock:
+            now = time.time()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            self.tokens -= weight
+
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+            self.acquired += 1
+            for request_type in request_types:
+                request_type = request_type.upper()
+                self.acquired_by_type[request_type] = self.acquired_by_type.get(request_type, 0) + 1
+
+            if delay > 0:
+                self.waits += 1
+                self.total_wait += delay
+                self.max_wait = max(self.max_wait, delay)
+
+        return delay
+
+    def acquire(self, request_types=()):
+        delay = self.reserve(request_types)
+
+        if delay > 0:
+            time.sleep(delay)
+
+        return delay
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'capacity': self.capacity,
+                'acquired': self.acquired,
+                'waits': self.waits,
+                'total_wait': self.total_wait,
+                'max_wait': self.max_wait,
+                'average_wait': self.total_wait / self.waits if self.waits else 0.0,
+                'acquired_by_type': dict(self.acquired_by_type)
+            }
+
+
+# Every ApiRequest of the process draws from this bucket
+shared_bucket = TokenBucket()
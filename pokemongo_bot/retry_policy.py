@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import random
+import threading
+import time
+
+from pgoapi.exceptions import ServerBusyOrOfflineException, ServerSideRequestThrottlingException
+
+THROTTLED = 'throttled'
+UNEXPECTED_RESPONSE = 'unexpected_response'
+INVALID_RESPONSE = 'invalid_response'
+
+
+class ExponentialBackoff(object):
+    """
+    Exponential backoff with jitter: the n-th retry waits around
+    base * factor ** (n - 1) seconds, never more than max_delay.
+    """
+
+    def __init__(self, base=0.5, factor=2.0, max_delay=30.0, jitter=0.5):
+        self.base = base
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delay(self, attempt):
+        delay = min(self.max_delay, self.base * self.factor ** max(attempt - 1, 0))
+        return delay * random.uniform(1 - self.jitter, 1)
+
+
+class CircuitBreaker(object):
+    """
+    Stops every request for a while once too many calls failed in a row.
+
+    After `threshold` consecutive failures the circuit opens for `cooldown`
+    seconds. The first call after that is let through as a probe: a success
+    closes the circuit again, a failure reopens it for twice as long, up to
+    `max_cooldown`.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, threshold=5, cooldown=10.0, max_cooldown=120.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.current_cooldown = cooldown
+
+    def remaining(self, now):
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.current_cooldown - now)
+
+    def before_call(self, now):
+        """
+        Returns how long to wait before the next call may be sent. When the
+        circuit is open, that call becomes the probe and the circuit goes
+        half open.
+        """
+        if self.state != self.OPEN:
+            return 0.0
+
+        remaining = self.remaining(now)
+        self.state = self.HALF_OPEN
+        return remaining
+
+    def record_success(self):
+        closed = self.state != self.CLOSED
+        self.state = self.CLOSED
+        self.failures = 0
+        self.current_cooldown = self.cooldown
+        return closed
+
+    def record_failure(self, now):
+        self.failures += 1
+
+        if self.state == self.HALF_OPEN:
+            self.current_cooldown = min(self.max_cooldown, self.current_cooldown * 2)
+        elif self.state == self.OPEN or self.failures < self.threshold:
+            return False
+
+        self.state = self.OPEN
+        self.opened_at = now
+        return True
+
+
+class RetryPolicy(object):
+    """
+    Decides how long ApiRequest.call waits between retries.
+
+    Every error class has its own backoff and retry budget, None meaning
+    that the call keeps retrying. A circuit breaker shared by all the
+    requests of the session pauses the calls while the server keeps failing.
+    Listeners are called with (event, data) whenever the policy backs off or
+    the circuit changes state.
+    """
+
+    DEFAULT_BACKOFFS = {
+        THROTTLED: ExponentialBackoff(base=0.5, max_delay=8.0),
+        UNEXPECTED_RESPONSE: ExponentialBackoff(base=1.0, max_delay=30.0),
+        INVALID_RESPONSE: ExponentialBackoff(base=0.5, max_delay=8.0)
+    }
+    EXCEPTIONS = {
+        THROTTLED: lambda: ServerSideRequestThrottlingException('Server throttled too many times'),
+        INVALID_RESPONSE: ServerBusyOrOfflineException
+    }
+
+    def __init__(self, backoffs=None, budgets=None, breaker=None):
+        self.backoffs = dict(self.DEFAULT_BACKOFFS, **(backoffs or {}))
+        self.budgets = budgets or {}
+        self.breaker = breaker or CircuitBreaker()
+        self.listeners = []
+        self._lock = threading.Lock()
+
+    def budget_for(self, error, max_retry):
+        if error in self.budgets:
+            return self.budgets[error]
+        # The server sometimes answers garbage for minutes, the breaker
+        # slows the retries down instead of giving up on them.
+        if error == UNEXPECTED_RESPONSE:
+            return None
+        return max_retry
+
+    def notify(self, event, **data):
+        for listener in self.listeners:
+            listener(event, data)
+
+    def before_call(self):
+        with self._lock:
+            was_open = self.breaker.state == CircuitBreaker.OPEN
+            delay = self.breaker.before_call(time.time())
+
+        if was_open:
+            self.notify('api_circuit_half_open', delay=delay)
+
+        return delay
+
+    def on_success(self):
+        with self._lock:
+            closed = self.breaker.record_success()
+
+        if closed:
+            self.notify('api_circuit_closed')
+
+    def on_failure(self, error, attempt, max_retry):
+        """
+        Records a failed attempt and returns how long to wait before the
+        next one. Raises when the budget of the error class is spent.
+        """
+        with self._lock:
+            opened = self.breaker.record_failure(time.time())
+            cooldown = self.breaker.current_cooldown
+            failures = self.breaker.failures
+
+        if opened:
+            self.notify('api_circuit_open', error=error, failures=failures, cooldown=cooldown)
+
+        budget = self.budget_for(error, max_retry)
+
+        if budget is not None and attempt >= budget:
+            self.notify('api_retry_exhausted', error=error, attempts=attempt)
+            raise self.EXCEPTIONS.get(error, ServerBusyOrOfflineException)()
+
+        # The cooldown of the breaker replaces the backoff
+        delay = 0.0 if opened else self.backoffs[error].delay(attempt)
+        self.notify('api_backoff', error=error, attempt=attempt, delay=delay)
+        return delay
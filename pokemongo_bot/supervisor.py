@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import ctypes
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import time
+
+from pokemongo_bot.base_dir import _base_dir
+
+RUNNING = 'running'
+WAITING = 'waiting'
+FINISHED = 'finished'
+
+
+def load_accounts(config_dir):
+    """
+    Reads the config file of every account of the directory, a JSON file
+    with at least a username.
+    :rtype: list of Account
+    """
+    logger = logging.getLogger('Supervisor')
+    accounts = []
+
+    for path in sorted(glob.glob(os.path.join(config_dir, '*.json'))):
+        try:
+            with open(path, 'rb') as data:
+                username = json.load(data).get('username')
+        except (IOError, ValueError, AttributeError) as e:
+            logger.warning('Skipping %s: %s', path, e)
+            continue
+
+        if not username:
+            logger.warning('Skipping %s: no username', path)
+            continue
+
+        accounts.append(Account(os.path.abspath(path), username))
+
+    return accounts
+
+
+def preload(encrypt_lib=None):
+    """
+    Loads what every bot needs before the account processes are forked,
+    so that they start without reading it again: the modules, the static
+    inventory data and the encryption library.
+    """
+    from pokemongo_bot import inventory
+
+    pending = [inventory._StaticInventoryComponent]
+    while pending:
+        cls = pending.pop()
+        pending.extend(cls.__subclasses__())
+        if cls.STATIC_DATA_FILE is not None:
+            cls.init_static_data()
+
+    if encrypt_lib and os.path.isfile(encrypt_lib):
+        ctypes.cdll.LoadLibrary(encrypt_lib)
+
+
+def _run_target(target, ready, config_path):
+    # Sets ready once the process runs inside multiprocessing's own error
+    # handling, from where a SIGINT can no longer unwind the stack forked
+    # from the supervisor
+    ready.set()
+    target(config_path)
+
+
+class Account(object):
+    def __init__(self, config_path, username):
+        self.config_path = config_path
+        self.username = username
+        self.process = None
+        self.ready = None
+        self.started = None
+        self.next_start = 0
+        self.restarts = 0
+        self.failures = 0
+        self.exitcode = None
+        self.finished = False
+
+    @property
+    def state(self):
+        if self.process is not None:
+            return RUNNING
+        return FINISHED if self.finished else WAITING
+
+    def player_stats(self):
+        """
+        :return: The player stats of the last inventory the bot wrote to
+                 the web directory, an empty dict if there is none yet.
+        :rtype: dict
+        """
+        path = os.path.join(_base_dir, 'web', 'inventory-%s.json' % self.username)
+
+        try:
+            with open(path, 'rb') as data:
+                items = json.load(data)
+        except (IOError, ValueError):
+            return {}
+
+        for item in items:
+            stats = item.get('inventory_item_data', {}).get('player_stats')
+            if stats:
+                return stats
+
+        return {}
+
+
+class Supervisor(object):
+    """
+    Runs one bot process per account, forked from this process so that
+    they share what preload() loaded.
+
+    Logins are spread `stagger` seconds apart and at most `processes`
+    accounts run at once. An account whose process fails is started again
+    after restart_delay seconds, doubling up to max_restart_delay while it
+    keeps failing. An account that exits cleanly (interrupted, bad
+    credentials) is not restarted.
+    """
+
+    def __init__(self, accounts, target, processes=None, stagger=30,
+                 restart_delay=60, max_restart_delay=3600, status_interval=300):
+        self.accounts = accounts
+        self.target = target
+        self.processes = processes or len(accounts)
+        self.stagger = stagger
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.status_interval = status_interval
+        self.logger = logging.getLogger(type(self).__name__)
+        self.next_login = 0
+        self.last_report = time.time()
+
+    def run(self, poll_interval=1):
+        try:
+            while not all(account.finished for account in self.accounts):
+                self.check()
+
+                if self.status_interval and time.time() - self.last_report >= self.status_interval:
+                    self.report()
+
+                time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            self.logger.info('Stopping %d account(s)', len(self.running()))
+        finally:
+            self.stop()
+            self.report()
+
+    def running(self):
+        return [account for account in self.accounts if account.process is not None]
+
+    def check(self):
+        now = time.time()
+
+        for account in self.running():
+            if not account.process.is_alive():
+                self._exited(account, now)
+
+        running = len(self.running())
+
+        for account in self.accounts:
+            if running >= self.processes or now < self.next_login:
+                break
+
+            if account.state == WAITING and account.next_start <= now:
+                self.start(account)
+                running += 1
+
+    def start(self, account):
+        ready = multiprocessing.Event()
+        process = multiprocessing.Process(target=_run_target, args=(self.target, ready, account.config_path),
+                                          name=account.username)
+        process.start()
+
+        account.process = process
+        account.ready = ready
+        account.started = time.time()
+        self.next_login = account.started + self.stagger
+        self.logger.info('Started %s (pid %s)', account.username, process.pid)
+
+    def _exited(self, account, now):
+        account.process.join()
+        account.exitcode = account.process.exitcode
+        account.process = None
+
+        if account.exitcode == 0:
+            account.finished = True
+            self.logger.info('%s exited', account.username)
+            return
+
+        # A bot that ran for a while before failing starts over with the
+        # shortest delay
+        if now - account.started >= self.max_restart_delay:
+            account.failures = 0
+
+        delay = min(self.restart_delay * 2 ** account.failures, self.max_restart_delay)
+        account.failures += 1
+        account.restarts += 1
+        account.next_start = now + delay
+        self.logger.warning('%s failed with exit code %s, restarting in %d seconds',
+                            account.username, account.exitcode, delay)
+
+    def stop(self, timeout=30):
+        """
+        Interrupts the bots so that they save their state, killing the ones
+        still running after the timeout.
+        """
+        running = self.running()
+        deadline = time.time() + timeout
+        # A terminal already sent SIGINT to the bots, give them a moment,
+        # leaving the interrupted ones the rest of the timeout
+        grace = time.time() + min(5, timeout / 2.0)
+
+        for account in running:
+            account.process.join(max(0, grace - time.time()))
+            if not account.process.is_alive():
+                continue
+
+            # Only a process that reported it started can be interrupted,
+            # the other ones are killed
+            if account.ready.wait(max(0, grace - time.time())):
+                try:
+                    os.kill(account.process.pid, signal.SIGINT)
+                except OSError:
+                    pass
+            else:
+                account.process.terminate()
+
+        for account in running:
+            account.process.join(max(0, deadline - time.time()))
+            if account.process.is_alive():
+                self.logger.warning('Killing %s', account.username)
+                account.process.terminate()
+                account.process.join()
+
+            account.exitcode = account.process.exitcode
+            account.process = None
+            account.finished = True
+
+    def status(self):
+        """
+        :return: The state, process and player stats of every account.
+        :rtype: list of dict
+        """
+        now = time.time()
+        status = []
+
+        for account in self.accounts:
+            stats = account.player_stats()
+            status.append({
+                'username': account.username,
+                'state': account.state,
+                'pid': account.process.pid if account.process else None,
+                'uptime': now - account.started if account.process else 0,
+                'restarts': account.restarts,
+                'exitcode': account.exitcode,
+                'level': stats.get('level'),
+                'experience': stats.get('experience')
+            })
+
+        return status
+
+    def report(self):
+        self.last_report = time.time()
+        status = self.status()
+        lines = ['{:<20} {:<9} {:>7} {:>10} {:>8} {:>5} {:>10}'.format(
+            'account', 'state', 'pid', 'uptime(m)', 'restarts', 'level', 'xp')]
+
+        for s in status:
+            lines.append('{:<20} {:<9} {:>7} {:>10.0f} {:>8} {:>5} {:>10}'.format(
+                s['username'], s['state'], s['pid'] or '-', s['uptime'] / 60, s['restarts'],
+                s['level'] or '-', s['experience'] or '-'))
+
+        self.logger.info('%d/%d account(s) running, %d restart(s)\n%s',
+                         len(self.running()), len(status), sum(s['restarts'] for s in status), '\n'.join(lines))
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import time
+from collections import OrderedDict
+
+from pokemongo_bot.timings import shared_timings
+from pokemongo_bot.worker_result import WorkerResult
+
+INVENTORY = 'inventory'
+CELL = 'cell'
+POSITION = 'position'
+
+
+class TaskState(object):
+    def __init__(self):
+        self.runs = 0
+        self.skips = 0
+        self.time = 0.0
+        self.last_run = None
+        self.seen = {}
+
+
+class TaskScheduler(object):
+    """
+    Runs the tasks of the bot that are due, in config order.
+
+    A task is due when its next_run_time is reached or when something it
+    declared in `triggers` happened since it last ran. Tasks that do not
+    override next_run_time run on every tick, like they always did, and
+    every task runs on its first tick. Like before, a task returning
+    RUNNING ends the tick.
+    """
+
+    def __init__(self):
+        self._fired = dict((name, 0) for name in (INVENTORY, CELL, POSITION))
+        self._states = {}
+        self._workers = None
+
+    def trigger(self, name):
+        self._fired[name] = self._fired.get(name, 0) + 1
+
+    def is_due(self, task, state, now):
+        if state.last_run is None:
+            return True
+
+        for name in getattr(task, 'triggers', ()):
+            if self._fired.get(name, 0) != state.seen.get(name, 0):
+                return True
+
+        next_run_time = task.next_run_time() if hasattr(task, 'next_run_time') else 0
+        return next_run_time is not None and next_run_time <= now
+
+    def run(self, workers):
+        """
+        :return: The result of the last task that ran, None if none did.
+        """
+        if workers is not self._workers:
+            self._workers = workers
+            self._states = dict((w, self._states.get(w) or TaskState()) for w in workers)
+
+        result = None
+
+        for worker in workers:
+            state = self._states[worker]
+            now = time.time()
+
+            if not self.is_due(worker, state, now):
+                state.skips += 1
+                continue
+
+            state.seen = dict(self._fired)
+            with shared_timings.task(type(worker).__name__):
+                result = worker.work()
+            state.last_run = time.time()
+            state.runs += 1
+            state.time += state.last_run - now
+
+            if result == WorkerResult.RUNNING:
+                break
+
+        return result
+
+    def stats(self):
+        """
+        :return: The runs, skips and seconds spent of every task, by name in
+                 config order.
+        :rtype: OrderedDict
+        """
+        stats = OrderedDict()
+
+        for worker in self._workers or []:
+            state = self._states[worker]
+            total = stats.setdefault(type(worker).__name__, {'runs': 0, 'skips': 0, 'time': 0.0})
+            total['runs'] += state.runs
+            total['skips'] += state.skips
+            total['time'] += state.time
+
+        return stats
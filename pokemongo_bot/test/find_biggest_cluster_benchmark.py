@@ -0,0 +1,61 @@
+"""
+Compares utils.find_biggest_cluster with the networkx clique search it
+replaced, on random forts spread over a city sized area.
+
+Run with: python -m pokemongo_bot.test.find_biggest_cluster_benchmark
+"""
+import random
+import timeit
+
+import networkx as nx
+import numpy as np
+from networkx.algorithms.clique import find_cliques
+
+from pokemongo_bot.cell_workers.utils import coord2merc, distance, find_biggest_cluster, merc2coord
+
+SIZES = (50, 200, 1000)
+RADIUS = 50
+REPEAT = 3
+
+
+def find_biggest_cluster_cliques(radius, points):
+    graph = nx.Graph()
+    for point in points:
+        f = point['latitude'], point['longitude'], 0
+        graph.add_node(f)
+        for node in graph.nodes():
+            if node != f and distance(f[0], f[1], node[0], node[1]) <= radius * 2:
+                graph.add_edge(f, node)
+    cliques = list(find_cliques(graph))
+    if len(cliques) > 0:
+        max_clique = max(cliques, key=lambda l: (len(l), sum(x[2] for x in l)))
+        merc_clique = [coord2merc(x[0], x[1]) for x in max_clique]
+        clique_x, clique_y = zip(*merc_clique)
+        best_coord = merc2coord((np.mean(clique_x), np.mean(clique_y)))
+        return {'latitude': best_coord[0], 'longitude': best_coord[1], 'num_points': len(max_clique)}
+    return None
+
+
+def random_forts(count, lat=37.3968, lng=-5.9946):
+    # Keep the density of a busy city center: about 100 forts per km2
+    spread = 0.005 * (count / 100.0) ** 0.5
+    return [{'latitude': lat + random.uniform(-spread, spread),
+             'longitude': lng + random.uniform(-spread, spread)} for _ in xrange(count)]
+
+
+def main():
+    random.seed(0)
+    print '{:>6} {:>12} {:>12} {:>8} {:>8}'.format('forts', 'cliques (s)', 'grid (s)', 'cliques', 'grid')
+
+    for size in SIZES:
+        forts = random_forts(size)
+        old = min(timeit.repeat(lambda: find_biggest_cluster_cliques(RADIUS, forts), number=1, repeat=REPEAT))
+        new = min(timeit.repeat(lambda: find_biggest_cluster(RADIUS, forts), number=1, repeat=REPEAT))
+        print '{:>6} {:>12.4f} {:>12.4f} {:>8} {:>8}'.format(
+            size, old, new,
+            find_biggest_cluster_cliques(RADIUS, forts)['num_points'],
+            find_biggest_cluster(RADIUS, forts)['num_points'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+import random
+import unittest
+
+from pokemongo_bot.cell_workers.utils import distance, find_biggest_cluster
+
+
+class FindBiggestClusterTestCase(unittest.TestCase):
+
+    def testNoPoints(self):
+        self.assertIsNone(find_biggest_cluster(50, []))
+
+    def testSinglePoint(self):
+        result = find_biggest_cluster(50, [{'latitude': 37.3968, 'longitude': -5.9946}])
+        self.assertEqual(result['num_points'], 1)
+        self.assertAlmostEqual(result['latitude'], 37.3968)
+        self.assertAlmostEqual(result['longitude'], -5.9946)
+
+    def testClusterIsInRange(self):
+        random.seed(1)
+        for _ in xrange(20):
+            points = [{'latitude': 37.3968 + random.uniform(-0.003, 0.003),
+                       'longitude': -5.9946 + random.uniform(-0.003, 0.003)} for _ in xrange(40)]
+            result = find_biggest_cluster(50, points)
+            in_range = [p for p in points
+                        if distance(result['latitude'], result['longitude'], p['latitude'], p['longitude']) <= 50.01]
+            self.assertGreaterEqual(len(in_range), result['num_points'])
+
+    def testFindsDensestDisc(self):
+        center = {'latitude': 37.3968, 'longitude': -5.9946}
+        cluster = [{'latitude': center['latitude'] + dlat, 'longitude': center['longitude'] + dlng}
+                   for dlat, dlng in ((0.0002, 0), (-0.0002, 0), (0, 0.0002), (0, -0.0002))]
+        far_away = [{'latitude': 37.41, 'longitude': -5.98}, {'latitude': 37.38, 'longitude': -6.01}]
+
+        result = find_biggest_cluster(50, far_away + cluster)
+        self.assertEqual(result['num_points'], 4)
+        self.assertLess(distance(result['latitude'], result['longitude'], center['latitude'], center['longitude']), 1)
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+
+
+class TimerJob(object):
+    def __init__(self, service, name, interval, func, jitter):
+        self.service = service
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.jitter = jitter
+        self.next_run = None
+        self.runs = 0
+        self.errors = 0
+        self.cancelled = False
+
+    def cancel(self):
+        self.service.cancel(self)
+
+
+class TimerService(object):
+    """
+    Runs the periodic background jobs of the bot from one long-lived thread.
+
+    Jobs wait in a heap ordered by their next run time and run one at a
+    time, so they should be short. Each run is delayed by up to `jitter`
+    seconds on top of the interval. A job that raises is logged and keeps
+    its schedule.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(type(self).__name__)
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def schedule(self, interval, func, name=None, jitter=0, delay=None):
+        """
+        Runs func every interval seconds, the first time after delay
+        seconds, or after interval seconds when delay is None.
+        :rtype: TimerJob
+        """
+        job = TimerJob(self, name or func.__name__, interval, func, jitter)
+
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError('Timer service is stopped')
+
+            self._push(job, time.time() + (interval if delay is None else delay))
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='TimerService')
+                self._thread.daemon = True
+                self._thread.start()
+
+            self._condition.notify()
+
+        return job
+
+    def cancel(self, job):
+        # The entry stays in the heap and is dropped when it comes up
+        with self._condition:
+            job.cancelled = True
+            self._condition.notify()
+
+    def stop(self, timeout=None):
+        """
+        Cancels every job and waits for the one running to finish.
+        :return: Whether the timer thread exited before the timeout.
+        :rtype: bool
+        """
+        with self._condition:
+            self._stopped = True
+            for _, _, job in self._heap:
+                job.cancelled = True
+            self._heap = []
+            self._condition.notify()
+
+        thread = self._thread
+        if thread is None or thread is threading.current_thread():
+            return True
+
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def jobs(self):
+        """
+        :return: The jobs still scheduled, the next one to run first.
+        :rtype: list of TimerJob
+        """
+        with self._condition:
+            return [job for _, _, job in sorted(self._heap) if not job.cancelled]
+
+    def _push(self, job, when):
+        if job.jitter:
+            when += random.uniform(0, job.jitter)
+
+        job.next_run = when
+        heapq.heappush(self._heap, (when, next(self._sequence), job))
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._stopped:
+                        return
+
+                    if self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)
+                        continue
+
+                    wait = self._heap[0][0] - time.time() if self._heap else None
+
+                    if wait is not None and wait <= 0:
+                        break
+
+                    self._condition.wait(wait)
+
+                _, _, job = heapq.heappop(self._heap)
+
+            try:
+                job.func()
+            except Exception as e:
+                job.errors += 1
+                self.logger.exception('Timer job %s failed: %s', job.name, e)
+            finally:
+                job.runs += 1
+
+            with self._condition:
+                if not job.cancelled and not self._stopped:
+                    self._push(job, time.time() + job.interval)
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+DEFAULT_SAMPLES = 500
+
+
+class RollingHistogram(object):
+    """
+    Durations of the last `size` samples, the count and total being kept
+    since the start.
+    """
+
+    def __init__(self, size=DEFAULT_SAMPLES):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def percentile(self, fraction):
+        if not self.samples:
+            return 0.0
+
+        ordered = sorted(self.samples)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(0.5),
+            'p90': self.percentile(0.9),
+            'p99': self.percentile(0.99),
+            'max': max(self.samples) if self.samples else 0.0
+        }
+
+
+class Timings(object):
+    """
+    Thread safe record of where the time of the bot goes.
+
+    Tasks are timed around their work method. While a task runs, the RPCs
+    it sends and the time it spends waiting (sleeps, action delays, rate
+    limiting) are added to it, on top of being recorded by RPC type and by
+    kind of wait. Work done on another thread for a task, like sending the
+    requests it queued, is added to it through `charged_to`.
+    """
+
+    def __init__(self, samples=DEFAULT_SAMPLES):
+        self.samples = samples
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.tasks = {}
+            self.rpcs = {}
+            self.waits = {}
+
+    def _entry(self, table, name):
+        entry = table.get(name)
+
+        if entry is None:
+            entry = table[name] = {'histogram': RollingHistogram(self.samples), 'api_calls': 0, 'wait': 0.0, 'errors': 0}
+
+        return entry
+
+    @contextmanager
+    def task(self, name):
+        previous = self.current_task()
+        self._local.task = name
+        start = time.time()
+
+        try:
+            yield
+        finally:
+            self._local.task = previous
+
+            with self._lock:
+                self._entry(self.tasks, name)['histogram'].add(time.time() - start)
+
+    def current_task(self):
+        return getattr(self._local, 'task', None)
+
+    @contextmanager
+    def charged_to(self, task):
+        """
+        Adds the RPCs and waits of the block to the task, without timing
+        the block as a run of it.
+        """
+        previous = self.current_task()
+        self._local.task = task
+
+        try:
+            yield
+        finally:
+            self._local.task = previous
+
+    def rpc(self, request_types, seconds, error=False):
+        """
+        Records an envelope, for each of the RPC types it holds.
+        """
+        task = self.current_task()
+
+        with self._lock:
+            for request_type in request_types or ['UNKNOWN']:
+                entry = self._entry(self.rpcs, request_type.upper())
+                entry['histogram'].add(seconds)
+                entry['errors'] += 1 if error else 0
+
+            if task is not None:
+                self._entry(self.tasks, task)['api_calls'] += 1
+
+    def wait(self, kind, seconds):
+        task = self.current_task()
+
+        with self._lock:
+            self._entry(self.waits, kind)['histogram'].add(seconds)
+
+            if task is not None:
+                self._entry(self.tasks, task)['wait'] += seconds
+
+    def stats(self):
+        def summarize(table):
+            return dict((name, dict(entry['histogram'].summary(), api_calls=entry['api_calls'],
+                                    wait=entry['wait'], errors=entry['errors']))
+                        for name, entry in table.iteritems())
+
+        with self._lock:
+            return {'tasks': summarize(self.tasks), 'rpcs': summarize(self.rpcs), 'waits': summarize(self.waits)}
+
+    def report(self):
+        """
+        :return: The stats as a table, the entries taking the most time first.
+        :rtype: unicode
+        """
+        stats = self.stats()
+        lines = ['{:<28} {:>7} {:>9} {:>8} {:>8} {:>8} {:>9} {:>9}'.format(
+            '', 'count', 'total(s)', 'p50(ms)', 'p90(ms)', 'p99(ms)', 'api calls', 'wait(s)')]
+
+        for section in ('tasks', 'rpcs', 'waits'):
+            lines.append(section.capitalize())
+
+            for name, s in sorted(stats[section].iteritems(), key=lambda e: e[1]['total'], reverse=True):
+                lines.append('  {:<26} {:>7} {:>9.2f} {:>8.0f} {:>8.0f} {:>8.0f} {:>9} {:>9.2f}'.format(
+                    name, s['count'], s['total'], s['p50'] * 1000, s['p90'] * 1000, s['p99'] * 1000,
+                    s['api_calls'], s['wait']))
+
+        return '\n'.join(lines)
+
+
+# Every task, request and sleep of the process records here
+shared_timings = Timings()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class WebFileWriter(object):
+    """
+    Writes the JSON files of the web UI and the data directory on its own
+    thread.
+
+    Only the latest payload of a file waits to be written. It is serialized
+    when it is queued, so that the caller can keep changing it, and skipped
+    when it did not change since the last write. Files are written to a
+    temporary file that is then renamed over the old one, so readers never
+    see half of a file.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(type(self).__name__)
+        self._pending = OrderedDict()
+        self._digests = {}
+        self._writing = False
+        self._stopped = False
+        self._condition = threading.Condition()
+
+        self._thread = threading.Thread(target=self._run, name='WebFileWriter')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, path, payload):
+        """
+        Queues the JSON of the payload for the file, replacing what was
+        still waiting for it.
+        """
+        try:
+            data = json.dumps(payload)
+        except (TypeError, ValueError) as e:
+            self.logger.info('[x] Error while serializing %s: %s', path, e)
+            return
+
+        with self._condition:
+            if self._stopped:
+                return
+
+            self._pending.pop(path, None)
+            self._pending[path] = data
+            self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Waits until the queued files are written.
+        :return: Whether everything was written before the timeout.
+        :rtype: bool
+        """
+        deadline = None if timeout is None else time.time() + timeout
+
+        with self._condition:
+            while self._pending or self._writing:
+                if deadline is None:
+                    self._condition.wait()
+                elif time.time() < deadline:
+                    self._condition.wait(deadline - time.time())
+                else:
+                    return False
+
+            return True
+
+    def stop(self, timeout=None):
+        """
+        Writes the queued files and ends the writer thread. Later writes
+        are ignored.
+        :return: Whether everything was written before the timeout.
+        :rtype: bool
+        """
+        written = self.flush(timeout)
+
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+        if written:
+            self._thread.join(timeout)
+
+        return written
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    if self._stopped:
+                        return
+                    self._condition.wait()
+
+                path, data = self._pending.popitem(last=False)
+                self._writing = True
+
+            try:
+                self._write(path, data)
+            finally:
+                with self._condition:
+                    self._writing = False
+                    self._condition.notify_all()
+
+    def _write(self, path, data):
+        digest = hashlib.sha1(data).hexdigest()
+
+        if self._digests.get(path) == digest and os.path.exists(path):
+            return
+
+        temp_path = path + '.tmp'
+
+        try:
+            with open(temp_path, 'w') as outfile:
+                outfile.write(data)
+
+            if os.name == 'nt' and os.path.exists(path):
+                # Windows does not rename over an existing file
+                os.remove(path)
+            os.rename(temp_path, path)
+        except (IOError, OSError) as e:
+            self.logger.info('[x] Error while writing %s: %s', path, e)
+            return
+
+        self._digests[path] = digest
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Runs the bot for every account config of a directory, restarting the ones
+that crash. See docs/multiple_accounts.md.
+"""
+import argparse
+import sys
+
+import pokecli
+from pokemongo_bot.supervisor import Supervisor, load_accounts, preload
+
+
+def run_account(config_path):
+    sys.argv = [sys.argv[0], '--config', config_path]
+    pokecli.main()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "accounts",
+        help="Directory holding one config file per account"
+    )
+    parser.add_argument(
+        "--processes",
+        help="Accounts running at once, all of them by default",
+        type=int,
+        default=None
+    )
+    parser.add_argument(
+        "--stagger",
+        help="Seconds between two logins",
+        type=int,
+        default=30
+    )
+    parser.add_argument(
+        "--restart_delay",
+        help="Seconds before restarting a crashed account, doubled on every crash in a row",
+        type=int,
+        default=60
+    )
+    parser.add_argument(
+        "--max_restart_delay",
+        help="Most seconds before restarting a crashed account",
+        type=int,
+        default=3600
+    )
+    parser.add_argument(
+        "--status_interval",
+        help="Seconds between two status reports, 0 to disable",
+        type=int,
+        default=300
+    )
+    parser.add_argument(
+        "--encrypt_lib",
+        help="Encryption library to load once for all the accounts",
+        type=str,
+        default=None
+    )
+    config = parser.parse_args()
+
+    accounts = load_accounts(config.accounts)
+    if not accounts:
+        pokecli.logger.critical('No account config found in %s', config.accounts)
+        sys.exit(1)
+
+    preload(config.encrypt_lib)
+
+    Supervisor(
+        accounts,
+        run_account,
+        processes=config.processes,
+        stagger=config.stagger,
+        restart_delay=config.restart_delay,
+        max_restart_delay=config.max_restart_delay,
+        status_interval=config.status_interval
+    ).run()
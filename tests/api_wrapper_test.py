@@ -1,3 +1,4 @@
+import threading
 import unittest
 from mock import MagicMock, patch
 from timeout_decorator import timeout, TimeoutError
@@ -6,7 +7,10 @@ from tests import FakeApi, get_fake_conf
 
 from pgoapi import PGoApi
 from pgoapi.exceptions import NotLoggedInException, ServerBusyOrOfflineException, NoPlayerPositionSetException, EmptySubrequestChainException
-from pokemongo_bot.api_wrapper import ApiWrapper
+from pokemongo_bot.api_wrapper import ApiWrapper, RequestPipeline
+from pokemongo_bot.inventory import Inventory
+from pokemongo_bot.rate_limiter import TokenBucket
+from pokemongo_bot.timings import Timings
 
 class TestApiWrapper(unittest.TestCase):
     def test_raises_not_logged_in_exception(self):
@@ -100,19 +104,19 @@ class TestApiWrapper(unittest.TestCase):
     def test_api_call_throttle_should_pass(self):
         request = FakeApi().create_request()
         request.is_response_valid = MagicMock(return_value=True)
-        request.requests_per_seconds = 5
+        request.rate_limiter = TokenBucket(rate=5, capacity=1)
 
-        for i in range(request.requests_per_seconds):
+        for i in range(5):
             request.call()
 
     @timeout(1) # expects a timeout
     def test_api_call_throttle_should_fail(self):
         request = FakeApi().create_request()
         request.is_response_valid = MagicMock(return_value=True)
-        request.requests_per_seconds = 5
+        request.rate_limiter = TokenBucket(rate=5, capacity=1)
 
         with self.assertRaises(TimeoutError):
-            for i in range(request.requests_per_seconds * 2):
+            for i in range(10):
                 request.call()
 
     @patch('pokemongo_bot.api_wrapper.ApiRequest.is_response_valid')
@@ -121,3 +125,89 @@ class TestApiWrapper(unittest.TestCase):
 
         result = FakeApi().get_inventory()
         self.assertEqual(result, 'mock return')
+
+
+class TestRequestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.api = MagicMock()
+        self.request = self.api.create_request.return_value
+        self.request.call.return_value = {
+            'responses': {'GET_INVENTORY': {'success': True}, 'GET_MAP_OBJECTS': {'status': 1}},
+            'status_code': 1
+        }
+        self.pipeline = RequestPipeline(self.api, max_delay=60)
+
+    def tearDown(self):
+        self.pipeline.stop()
+
+    @timeout(1)
+    def test_subrequests_share_one_envelope(self):
+        inventory_future = self.pipeline.submit('get_inventory')
+        map_future = self.pipeline.submit('get_map_objects', latitude=1, longitude=2)
+
+        self.assertEqual(map_future.result(), {'responses': {'GET_MAP_OBJECTS': {'status': 1}}, 'status_code': 1})
+        self.assertEqual(inventory_future.result(), {'responses': {'GET_INVENTORY': {'success': True}}, 'status_code': 1})
+        self.assertEqual(self.api.create_request.call_count, 1)
+        self.request.get_inventory.assert_called_once_with()
+        self.request.get_map_objects.assert_called_once_with(latitude=1, longitude=2)
+
+    @timeout(1)
+    def test_envelope_is_charged_to_the_submitting_task(self):
+        timings = Timings()
+        self.request.call.side_effect = lambda: timings.rpc(['get_inventory'], 0.1)
+
+        with patch('pokemongo_bot.api_wrapper.shared_timings', timings):
+            with timings.task('UpdateLiveInventory'):
+                future = self.pipeline.submit('get_inventory')
+            future.result()
+
+        self.assertEqual(timings.stats()['tasks']['UpdateLiveInventory']['api_calls'], 1)
+
+    def test_same_subrequest_is_split(self):
+        pending = [(name, {}, MagicMock(name=name)) for name in ('GET_INVENTORY', 'GET_PLAYER', 'GET_INVENTORY')]
+        for method, _, future in pending:
+            future.name = method
+
+        envelopes = RequestPipeline.split_envelopes(pending)
+        self.assertEqual([[e[0] for e in envelope] for envelope in envelopes],
+                         [['GET_INVENTORY', 'GET_PLAYER'], ['GET_INVENTORY']])
+
+    @timeout(1)
+    def test_exception_is_raised_by_result(self):
+        self.request.call.side_effect = ServerBusyOrOfflineException()
+        future = self.pipeline.submit('get_inventory')
+
+        with self.assertRaises(ServerBusyOrOfflineException):
+            future.result()
+
+    @timeout(1)
+    def test_failed_call_gives_empty_results(self):
+        for response in (False, {'status_code': 3}):
+            self.request.call.return_value = response
+            inventory_future = self.pipeline.submit('get_inventory')
+            map_future = self.pipeline.submit('get_map_objects')
+
+            self.assertEqual(map_future.result(), {})
+            self.assertEqual(inventory_future.result(), {})
+
+            inventory = MagicMock(spec=Inventory)
+            Inventory.refresh(inventory, inventory_future.result())
+            self.assertEqual(inventory.mock_calls, [])
+
+    @timeout(1)
+    def test_callback_without_flush(self):
+        self.pipeline.max_delay = 0.1
+        results = []
+        called = threading.Event()
+
+        def callback(f):
+            results.append(f.result())
+            called.set()
+
+        future = self.pipeline.submit('get_inventory')
+        future.add_done_callback(callback)
+
+        future.result(flush=False)
+        # The callbacks run on the pipeline thread, maybe after result returned
+        self.assertTrue(called.wait(1))
+        self.assertEqual(len(results), 1)
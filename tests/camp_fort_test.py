@@ -0,0 +1,87 @@
+import random
+import unittest
+
+from geopy.distance import great_circle
+from mock import MagicMock
+
+from pokemongo_bot.cell_workers.camp_fort import CampFort
+from pokemongo_bot.constants import Constants
+
+POSITION = (37.3968, -5.9946)
+
+
+def fort(fort_id, point, lured=False):
+    fort = {'id': fort_id, 'type': 1, 'latitude': point[0], 'longitude': point[1]}
+    if lured:
+        fort['active_fort_modifier'] = 501
+    return fort
+
+
+def destination(point, meters, bearing):
+    point = great_circle(meters=meters).destination(point, bearing)
+    return point.latitude, point.longitude
+
+
+class CampFortTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(42)
+        self.bot = MagicMock(position=POSITION)
+        self.task = CampFort(self.bot, {})
+        self.forts = {}
+
+        for i in xrange(80):
+            point = (POSITION[0] + random.uniform(-0.002, 0.002), POSITION[1] + random.uniform(-0.002, 0.002))
+            self.forts['fort-%d' % i] = fort('fort-%d' % i, point, lured=i % 7 == 0)
+
+    def clusters(self, task, forts):
+        return sorted((c['center'], sorted(f['id'] for f in c['forts']), c['lured'])
+                      for c in task.get_clusters(forts))
+
+    def assertSameAsFresh(self, forts):
+        self.assertEqual(self.clusters(self.task, forts), self.clusters(CampFort(self.bot, {}), forts))
+
+    def test_added_and_removed_forts(self):
+        self.task.get_clusters(self.forts)
+
+        forts = dict(self.forts)
+        for i in xrange(0, 80, 9):
+            del forts['fort-%d' % i]
+        forts['new'] = fort('new', destination(POSITION, 20, 45))
+
+        self.assertSameAsFresh(forts)
+
+    def test_moved_and_lured_forts(self):
+        self.task.get_clusters(self.forts)
+
+        forts = dict(self.forts)
+        moved = forts['fort-1']
+        forts['fort-1'] = fort('fort-1', destination((moved['latitude'], moved['longitude']), 30, 180))
+        forts['fort-2'] = fort('fort-2', (forts['fort-2']['latitude'], forts['fort-2']['longitude']), lured=True)
+
+        self.assertSameAsFresh(forts)
+
+    def test_fort_at_twice_the_reachable_distance(self):
+        radius = Constants.MAX_DISTANCE_FORT_IS_REACHABLE
+        # The circle of radius MAX_DISTANCE_FORT_IS_REACHABLE through a and b
+        # reaches the new fort, on the other side of its diameter from a
+        center = destination(POSITION, radius, 90)
+        forts = {
+            'a': fort('a', POSITION),
+            'b': fort('b', destination(center, radius, 0))
+        }
+        self.task.get_clusters(forts)
+
+        forts['c'] = fort('c', destination(POSITION, 2 * radius, 90), lured=True)
+
+        self.assertSameAsFresh(forts)
+
+    def test_only_the_pairs_around_a_change_are_computed_again(self):
+        self.task.get_clusters(self.forts)
+        self.task.get_pair_cluster = MagicMock(wraps=self.task.get_pair_cluster)
+
+        forts = dict(self.forts)
+        forts['far'] = fort('far', destination(POSITION, 1000, 0))
+        forts['far-2'] = fort('far-2', destination(POSITION, 1010, 0))
+
+        self.assertSameAsFresh(forts)
+        self.assertEqual(self.task.get_pair_cluster.call_count, 1)
@@ -0,0 +1,79 @@
+import unittest
+
+from s2sphere import CellId, LatLng
+
+from pokemongo_bot.cell_cache import MapCellCache
+
+CELL_ID = CellId.from_lat_lng(LatLng.from_degrees(37.3968, -5.9946)).parent(15).id()
+OTHER_CELL_ID = CellId(CELL_ID).next().id()
+THIRD_CELL_ID = CellId(OTHER_CELL_ID).next().id()
+
+
+def fort(fort_id, lat=37.3968, lng=-5.9946, **kwargs):
+    data = {'id': fort_id, 'latitude': lat, 'longitude': lng, 'type': 1}
+    data.update(kwargs)
+    return data
+
+
+class MapCellCacheTest(unittest.TestCase):
+    def test_unknown_cells_have_zero_timestamp(self):
+        cache = MapCellCache()
+        self.assertEqual(cache.timestamps_for([CELL_ID, OTHER_CELL_ID]), [0, 0])
+
+    def test_timestamp_is_remembered(self):
+        cache = MapCellCache()
+        cache.update([{'s2_cell_id': CELL_ID, 'current_timestamp_ms': 1000, 'forts': [fort('a')]}])
+        self.assertEqual(cache.timestamps_for([CELL_ID, OTHER_CELL_ID]), [1000, 0])
+
+    def test_truncated_list_resets_timestamp(self):
+        cache = MapCellCache()
+        cache.update([{'s2_cell_id': CELL_ID, 'current_timestamp_ms': 1000, 'is_truncated_list': True}])
+        self.assertEqual(cache.timestamps_for([CELL_ID]), [0])
+
+    def test_delta_merges_forts(self):
+        cache = MapCellCache()
+        cache.update([{'s2_cell_id': CELL_ID, 'current_timestamp_ms': 1000, 'forts': [fort('a'), fort('b')]}])
+        cache.update([{
+            's2_cell_id': CELL_ID,
+            'current_timestamp_ms': 2000,
+            'forts': [fort('b', lure_info={})],
+            'deleted_objects': ['a']
+        }])
+
+        forts = cache.meta_cell([CELL_ID])['forts']
+        self.assertEqual([f['id'] for f in forts], ['b'])
+        self.assertIn('lure_info', forts[0])
+
+    def test_pokemons_are_replaced(self):
+        cache = MapCellCache()
+        cache.update([{'s2_cell_id': CELL_ID, 'wild_pokemons': [{'encounter_id': 1}]}])
+        cache.update([{'s2_cell_id': CELL_ID}])
+        self.assertEqual(cache.meta_cell([CELL_ID])['wild_pokemons'], [])
+
+    def test_nearby_pokemons_get_cell_center(self):
+        cache = MapCellCache()
+        cache.update([{'s2_cell_id': CELL_ID, 'nearby_pokemons': [{'pokemon_id': 16}]}])
+        pokemon = cache.meta_cell([CELL_ID])['nearby_pokemons'][0]
+        self.assertEqual(pokemon['s2_cell_id'], CELL_ID)
+        self.assertIn('latitude', pokemon)
+        self.assertIn('longitude', pokemon)
+
+    def test_meta_cell_is_reused_when_unchanged(self):
+        cache = MapCellCache()
+        cell = {'s2_cell_id': CELL_ID, 'current_timestamp_ms': 1000, 'forts': [fort('a')]}
+        cache.update([cell])
+        meta_cell = cache.meta_cell([CELL_ID])
+
+        self.assertFalse(cache.update([dict(cell, current_timestamp_ms=2000, forts=[])]))
+        self.assertIs(cache.meta_cell([CELL_ID]), meta_cell)
+
+        self.assertTrue(cache.update([dict(cell, forts=[fort('c')])]))
+        self.assertIsNot(cache.meta_cell([CELL_ID]), meta_cell)
+
+    def test_least_recently_seen_cells_are_evicted(self):
+        cache = MapCellCache(max_cells=2)
+        cache.update([{'s2_cell_id': CELL_ID}])
+        cache.update([{'s2_cell_id': OTHER_CELL_ID}])
+        cache.update([{'s2_cell_id': THIRD_CELL_ID}])
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.cells_for([CELL_ID]), [])
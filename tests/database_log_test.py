@@ -0,0 +1,162 @@
+import sqlite3
+import unittest
+
+from mock import MagicMock, patch
+
+from pokemongo_bot.database_log import DatabaseLog, LogRetention, RollingCounter
+
+
+class DatabaseLogTest(unittest.TestCase):
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.connection.execute("CREATE TABLE catch_log (pokemon text, cp real, dated datetime DEFAULT CURRENT_TIMESTAMP)")
+        self.connection.execute("CREATE TABLE login (timestamp INTEGER, message TEXT)")
+        self.event_manager = MagicMock()
+        self.log = DatabaseLog(self.connection, self.event_manager, max_pending=3)
+
+    def rows(self, table):
+        return self.connection.execute('SELECT * FROM %s' % table).fetchall()
+
+    def test_schema_is_read_once(self):
+        self.assertEqual(self.log.tables['catch_log'], ['pokemon', 'cp', 'dated'])
+        self.assertEqual(self.log.tables['login'], ['timestamp', 'message'])
+
+    def test_rows_are_written_on_flush(self):
+        self.assertTrue(self.log.insert('catch_log', pokemon='Pidgey', cp=10))
+        self.assertTrue(self.log.insert('login', timestamp=1, message='LOGIN_SUCCESS'))
+        self.assertEqual(self.rows('catch_log'), [])
+
+        self.assertEqual(self.log.flush(), 2)
+        self.assertEqual(self.log.pending(), 0)
+        self.assertEqual(self.rows('login'), [(1, 'LOGIN_SUCCESS')])
+
+        pokemon, cp, dated = self.rows('catch_log')[0]
+        self.assertEqual((pokemon, cp), ('Pidgey', 10))
+        # Dated when queued, in the CURRENT_TIMESTAMP format
+        self.assertEqual(self.connection.execute("SELECT datetime(?) = ?", (dated, dated)).fetchone(), (1,))
+
+    def test_flush_when_enough_rows_are_pending(self):
+        for cp in range(4):
+            self.log.insert('catch_log', pokemon='Pidgey', cp=cp)
+
+        self.assertEqual(len(self.rows('catch_log')), 3)
+        self.assertEqual(self.log.pending(), 1)
+
+    def test_failing_table_does_not_lose_the_others(self):
+        self.connection.execute("CREATE TABLE vanish_log (pokemon text NOT NULL)")
+        log = DatabaseLog(self.connection)
+        log.insert('vanish_log', pokemon=None)
+        log.insert('login', timestamp=1, message='LOGIN_SUCCESS')
+
+        self.assertEqual(log.flush(), 1)
+        self.assertEqual(log.pending(), 0)
+        self.assertEqual(self.rows('login'), [(1, 'LOGIN_SUCCESS')])
+
+    def test_rows_are_kept_while_the_database_is_busy(self):
+        connection = MagicMock(wraps=self.connection)
+        log = DatabaseLog(connection)
+        log.insert('catch_log', pokemon='Pidgey', cp=10)
+        log.insert('login', timestamp=1, message='LOGIN_SUCCESS')
+
+        def locked(statement, rows):
+            if 'catch_log' in statement:
+                raise sqlite3.OperationalError('database is locked')
+            return self.connection.executemany(statement, rows)
+
+        connection.executemany.side_effect = locked
+        self.assertEqual(log.flush(), 1)
+        self.assertEqual(log.pending(), 1)
+
+        connection.executemany.side_effect = None
+        self.assertEqual(log.flush(), 1)
+        self.assertEqual(log.pending(), 0)
+        self.assertEqual(len(self.rows('catch_log')), 1)
+
+    @patch('pokemongo_bot.database_log.time')
+    def test_flush_if_due(self, time):
+        time.time.return_value = 1000
+        log = DatabaseLog(self.connection, flush_interval=10)
+        log.insert('login', timestamp=1, message='LOGIN_SUCCESS')
+
+        time.time.return_value = 1005
+        log.flush_if_due()
+        self.assertEqual(self.rows('login'), [])
+
+        time.time.return_value = 1010
+        log.flush_if_due()
+        self.assertEqual(len(self.rows('login')), 1)
+
+    def test_missing_table_is_reported_once(self):
+        self.assertFalse(self.log.insert('vanish_log', pokemon='Pidgey'))
+        self.assertFalse(self.log.insert('vanish_log', pokemon='Pidgey'))
+        self.assertEqual(self.event_manager.emit.call_count, 1)
+        self.assertEqual(self.event_manager.emit.call_args[0][0], 'vanish_log')
+        self.assertEqual(self.log.pending(), 0)
+
+    def test_count_recent_is_seeded_once(self):
+        self.connection.execute("INSERT INTO catch_log (pokemon, dated) VALUES ('Pidgey', datetime('now', '-2 days'))")
+        self.connection.execute("INSERT INTO catch_log (pokemon, dated) VALUES ('Pidgey', datetime('now', '-1 hour'))")
+        self.log.insert('catch_log', pokemon='Rattata')
+
+        self.assertEqual(self.log.count_recent('catch_log'), 2)
+        self.assertEqual(self.log.pending(), 0)
+
+        self.connection.execute("DELETE FROM catch_log")
+        self.log.insert('catch_log', pokemon='Rattata')
+        self.assertEqual(self.log.count_recent('catch_log'), 3)
+        self.assertEqual(self.log.count_recent('vanish_log'), 0)
+
+    def test_rolling_counter(self):
+        counter = RollingCounter(10, [5, 1])
+        counter.add(12)
+
+        self.assertEqual(counter.count(now=12), 2)
+        self.assertEqual(counter.count(now=16), 1)
+        self.assertEqual(counter.count(now=30), 0)
+
+
+class LogRetentionTest(unittest.TestCase):
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.connection.execute("CREATE TABLE catch_log (pokemon text, dated datetime DEFAULT CURRENT_TIMESTAMP)")
+        self.connection.execute("CREATE TABLE login (timestamp INTEGER, message TEXT)")
+        self.connection.execute("CREATE TABLE log_daily (log text, day date, count integer, PRIMARY KEY (log, day))")
+        self.log = DatabaseLog(self.connection, MagicMock())
+
+        for age in ['-40 days', '-40 days', '-35 days', '-1 hour']:
+            self.connection.execute("INSERT INTO catch_log (pokemon, dated) VALUES ('Pidgey', datetime('now', ?))", (age,))
+
+    def daily(self):
+        return [c for (c,) in self.connection.execute("SELECT count FROM log_daily WHERE log = 'catch_log' ORDER BY day")]
+
+    def test_old_rows_are_rolled_into_daily_counts(self):
+        retention = LogRetention(self.log, days=30)
+
+        self.assertEqual(retention.tables, ['catch_log'])
+        self.assertEqual(retention.run(), 3)
+        self.assertEqual(self.daily(), [2, 1])
+        self.assertEqual(self.connection.execute("SELECT COUNT(*) FROM catch_log").fetchone()[0], 1)
+        self.assertEqual(self.connection.execute("PRAGMA auto_vacuum").fetchone()[0], 2)
+        self.assertEqual(self.log.event_manager.emit.call_args[1]['data'], {'rows': 3, 'days': 30})
+
+    def test_days_are_added_to_the_existing_counts(self):
+        retention = LogRetention(self.log, days=30, vacuum=False)
+        retention.run()
+        self.connection.execute("INSERT INTO catch_log (pokemon, dated) VALUES ('Pidgey', datetime('now', '-35 days'))")
+
+        self.assertEqual(retention.run(), 1)
+        self.assertEqual(self.daily(), [2, 2])
+
+    @patch('pokemongo_bot.database_log.time')
+    def test_run_if_due(self, time):
+        time.time.return_value = 1000
+        retention = LogRetention(self.log, days=1, interval=60)
+        retention.run = MagicMock()
+
+        retention.run_if_due()
+        retention._last_run = 1000
+        time.time.return_value = 1030
+        retention.run_if_due()
+
+        self.assertEqual(retention.run.call_count, 1)
+        self.assertEqual(retention.days, 2)
@@ -0,0 +1,31 @@
+import random
+import unittest
+
+from pokemongo_bot.cell_workers.utils import distance, distances, sort_by_distance
+
+
+class DistanceTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(7)
+        self.points = [(random.uniform(-80, 80), random.uniform(-180, 180)) for _ in xrange(200)]
+
+    def test_distances_matches_distance(self):
+        lat, lng = 37.3968, -5.9946
+        result = distances(lat, lng, [p[0] for p in self.points], [p[1] for p in self.points])
+
+        self.assertEqual(len(result), len(self.points))
+        for (p_lat, p_lng), dist in zip(self.points, result):
+            self.assertAlmostEqual(dist, distance(lat, lng, p_lat, p_lng), places=4)
+
+    def test_distances_empty(self):
+        self.assertEqual(len(distances(0, 0, [], [])), 0)
+
+    def test_sort_by_distance(self):
+        items = [{'latitude': p[0], 'longitude': p[1]} for p in self.points]
+        expected = sorted(items, key=lambda x: distance(0, 0, x['latitude'], x['longitude']))
+        self.assertEqual(sort_by_distance(0, 0, items), expected)
+
+    def test_sort_by_distance_with_key(self):
+        expected = sorted(self.points, key=lambda x: distance(0, 0, x[0], x[1]))
+        self.assertEqual(sort_by_distance(0, 0, self.points, key=lambda x: x), expected)
+        self.assertEqual(sort_by_distance(0, 0, []), [])
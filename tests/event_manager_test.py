@@ -0,0 +1,86 @@
+import threading
+import unittest
+
+from mock import MagicMock
+
+from pokemongo_bot.event_manager import AsyncEventHandler, EventHandler, EventManager, DROP_NEWEST, DROP_OLDEST
+
+
+class SlowHandler(EventHandler):
+    asynchronous = True
+    queue_size = 2
+
+    def __init__(self):
+        self.events = []
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def handle_event(self, event, sender, level, formatted_msg, data):
+        self.started.set()
+        self.release.wait(5)
+        self.events.append(event)
+
+
+class EventManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.handler = SlowHandler()
+        self.sync_handler = MagicMock(asynchronous=False)
+        self.manager = EventManager(False, self.sync_handler, self.handler)
+
+        for event in ['a', 'b', 'c', 'd']:
+            self.manager.register_event(event)
+
+    def fill(self):
+        self.manager.emit('a', sender=self)
+        # 'a' is being handled, the queue holds the next two events
+        self.handler.started.wait(5)
+
+        for event in ['b', 'c', 'd']:
+            self.manager.emit(event, sender=self)
+
+    def test_slow_handler_does_not_block_emit(self):
+        self.fill()
+        self.assertEqual(self.sync_handler.handle_event.call_count, 4)
+
+        self.handler.release.set()
+        self.manager.flush(timeout=5)
+
+        self.assertEqual(self.handler.events, ['a', 'c', 'd'])
+        stats = self.manager.queue_stats()['SlowHandler']
+        self.assertEqual((stats['queued'], stats['handled'], stats['dropped'], stats['depth']), (4, 3, 1, 0))
+        self.assertEqual(stats['max_depth'], 2)
+
+    def test_drop_newest(self):
+        self.handler.overflow = DROP_NEWEST
+        self.manager = EventManager(False, self.handler)
+        for event in ['a', 'b', 'c', 'd']:
+            self.manager.register_event(event)
+
+        self.fill()
+        self.handler.release.set()
+        self.manager.flush(timeout=5)
+
+        self.assertEqual(self.handler.events, ['a', 'b', 'c'])
+
+    def test_handler_errors_are_counted(self):
+        handler = MagicMock(asynchronous=False)
+        handler.handle_event.side_effect = ValueError
+        wrapper = AsyncEventHandler(handler, queue_size=10, overflow=DROP_OLDEST)
+
+        wrapper.handle_event('a', self, 'info', '', {})
+        wrapper.join(timeout=5)
+
+        self.assertEqual(wrapper.stats['errors'], 1)
+
+    def test_stop(self):
+        self.manager.emit('a', sender=self)
+        self.manager.emit('b', sender=self)
+        self.handler.release.set()
+
+        self.manager.stop(timeout=5)
+        self.manager.emit('c', sender=self)
+
+        wrapper = self.manager._handlers[1]
+        self.assertFalse(wrapper._thread.is_alive())
+        self.assertEqual(self.handler.events, ['a', 'b'])
+        self.assertEqual(wrapper.stats['dropped'], 1)
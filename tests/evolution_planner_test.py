@@ -0,0 +1,91 @@
+import unittest
+
+from pokemongo_bot.evolution_planner import EvolutionPlanner, FamilyPlan, EVOLVE, EVOLVE_FOR_XP, UPGRADE
+from pokemongo_bot.inventory import LevelToCPm
+
+UPGRADE_COSTS = [[1, 200]] * 20 + [[2, 1300]] * 20 + [[3, 3000]] * 40
+
+
+class FakePokemon(object):
+    def __init__(self, name, evolution_cost=12, level=10, cp_exact=100.0, evolves=True):
+        self.name = name
+        self.evolution_cost = evolution_cost
+        self.level = level
+        self.cp_exact = cp_exact
+        self.cp_m = LevelToCPm.cp_multiplier_for(level)
+        self.evolves = evolves
+
+    def has_next_evolution(self):
+        return self.evolves
+
+    def __repr__(self):
+        return self.name
+
+
+def crap(count, prefix='crap'):
+    return [FakePokemon('%s%s' % (prefix, i)) for i in range(count)]
+
+
+class EvolutionPlannerTest(unittest.TestCase):
+    def test_upgrade_cost_uses_cumulative_costs(self):
+        planner = EvolutionPlanner(UPGRADE_COSTS)
+        self.assertEqual(planner.upgrade_cost(1, 21), (20, 4000))
+        self.assertEqual(planner.upgrade_cost(19, 23), (6, 3000))
+        self.assertEqual(planner.upgrade_cost(30, 30), (0, 0))
+
+    def test_unaffordable_evolution_does_not_spend_candies(self):
+        best = [FakePokemon('expensive', evolution_cost=50), FakePokemon('cheap')]
+        family = FamilyPlan(16, 10, crap(2), best, [], 12)
+        plan = EvolutionPlanner(UPGRADE_COSTS).plan([family], 0, 20, evolve_for_xp=False)
+
+        self.assertEqual([s.pokemon for s in plan.evolve], best[1:])
+        self.assertEqual(family.candies, 1)
+        self.assertEqual(len(plan.transfer), 2)
+
+    def test_xp_evolutions(self):
+        family = FamilyPlan(16, 40, crap(6), [], [], 12)
+        plan = EvolutionPlanner(UPGRADE_COSTS).plan([family], 0, 20, min_xp_evolutions=2)
+
+        # 46 candies are enough for 3 evolutions, the other crap is transferred
+        self.assertEqual([s.action for s in plan.evolve], [EVOLVE_FOR_XP] * 3)
+        self.assertEqual(len(plan.transfer), 3)
+
+        family = FamilyPlan(16, 10, crap(6), [], [], 12)
+        plan = EvolutionPlanner(UPGRADE_COSTS).plan([family], 0, 20, min_xp_evolutions=2)
+        self.assertEqual(plan.evolve, [])
+        self.assertEqual(len(plan.transfer), 6)
+
+    def test_stardust_goes_to_best_cp_gain(self):
+        low = FakePokemon('low', level=10, cp_exact=100.0)
+        high = FakePokemon('high', level=10, cp_exact=1000.0)
+        families = [FamilyPlan(16, 100, [], [], [low], 12), FamilyPlan(147, 100, [], [], [high], 25)]
+        planner = EvolutionPlanner(UPGRADE_COSTS)
+        _, stardust = planner.upgrade_cost(19, 39)
+
+        plan = planner.plan(families, stardust, 39)
+        self.assertEqual([(s.action, s.pokemon) for s in plan.upgrade], [(UPGRADE, high)])
+        self.assertEqual(plan.stardust, stardust)
+        self.assertEqual(families[0].candies, 100)
+
+    def test_lucky_egg_window(self):
+        planner = EvolutionPlanner(UPGRADE_COSTS, evolve_time=100)
+        self.assertEqual(planner.lucky_egg_capacity, 16)
+        self.assertEqual(planner.lucky_egg_threshold(80), 16)
+
+        best = [FakePokemon('best%s' % i) for i in range(4)]
+        new_entry = crap(3, 'new')
+        family = FamilyPlan(16, 1000, crap(20) + new_entry, best, [], 12)
+        xp_for = lambda p: 1000 if p in new_entry else 500
+
+        plan = planner.plan([family], 0, 20, lucky_egg=True, xp_for=xp_for)
+        self.assertEqual(len(plan.evolve), 16)
+        self.assertEqual([s.pokemon for s in plan.evolve[:7]], new_entry + best)
+        self.assertEqual([s.action for s in plan.evolve[7:]], [EVOLVE_FOR_XP] * 9)
+        self.assertEqual(len(plan.deferred), 11)
+        self.assertEqual(plan.transfer, [])
+        self.assertEqual(plan.xp, 2 * (3 * 1000 + 13 * 500))
+
+        plan = planner.plan([FamilyPlan(16, 1000, crap(20), best, [], 12)], 0, 20, xp_for=xp_for)
+        self.assertEqual(len(plan.evolve), 24)
+        self.assertEqual([s.action for s in plan.evolve[:4]], [EVOLVE] * 4)
+        self.assertEqual(plan.deferred, [])
@@ -0,0 +1,68 @@
+import random
+import unittest
+
+from pokemongo_bot.cell_workers.utils import distance
+from pokemongo_bot.fort_index import FortIndex
+
+
+def random_forts(count, lat=37.3968, lng=-5.9946, spread=0.02):
+    return [{
+        'id': 'fort-{}'.format(i),
+        'type': 1,
+        'latitude': lat + random.uniform(-spread, spread),
+        'longitude': lng + random.uniform(-spread, spread)
+    } for i in xrange(count)]
+
+
+class FortIndexTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(42)
+        self.position = (37.3968, -5.9946)
+        self.forts = random_forts(300)
+        self.index = FortIndex()
+        self.index.update(self.forts)
+
+    def brute_force(self, forts):
+        return sorted(forts, key=lambda f: distance(self.position[0], self.position[1], f['latitude'], f['longitude']))
+
+    def test_nearest_matches_sort(self):
+        expected = [f['id'] for f in self.brute_force(self.forts)]
+        result = [f['id'] for f in self.index.nearest(*self.position)]
+        self.assertEqual(result, expected)
+
+    def test_k_nearest(self):
+        expected = [f['id'] for f in self.brute_force(self.forts)[:5]]
+        result = [f['id'] for f in self.index.nearest(self.position[0], self.position[1], k=5)]
+        self.assertEqual(result, expected)
+
+    def test_within(self):
+        expected = [f['id'] for f in self.brute_force(self.forts)
+                    if distance(self.position[0], self.position[1], f['latitude'], f['longitude']) <= 500]
+        result = [f['id'] for f in self.index.within(self.position[0], self.position[1], 500)]
+        self.assertEqual(result, expected)
+
+    def test_far_away_position(self):
+        expected = [f['id'] for f in sorted(self.forts, key=lambda f: distance(40, -3, f['latitude'], f['longitude']))]
+        result = [f['id'] for f in self.index.nearest(40, -3)]
+        self.assertEqual(result, expected)
+
+    def test_forts_without_location_are_ignored(self):
+        index = FortIndex()
+        index.update([{'id': 'no-type', 'latitude': 1, 'longitude': 1}, {'id': 'no-location', 'type': 1}])
+        self.assertEqual(len(index), 0)
+
+    def test_incremental_update(self):
+        version = self.index.version
+        self.index.update(self.forts)
+        self.assertEqual(self.index.version, version)
+
+        moved = dict(self.forts[0], latitude=self.position[0], longitude=self.position[1])
+        self.index.update([moved] + self.forts[2:])
+        self.assertEqual(len(self.index), 299)
+        self.assertGreater(self.index.version, version)
+        self.assertIs(self.index.nearest(self.position[0], self.position[1], k=1)[0], moved)
+
+    def test_sorted_by_distance_is_reused(self):
+        result = self.index.sorted_by_distance(*self.position)
+        self.assertIs(self.index.sorted_by_distance(*self.position), result)
+        self.assertEqual([f['id'] for f in result], [f['id'] for f in self.brute_force(self.forts)])
@@ -1,7 +1,22 @@
+import json
 import unittest
 
+from mock import MagicMock, patch
+
 from pokemongo_bot.inventory import *
 
+RATTATA = {
+    "move_1": 221, "move_2": 129, "pokemon_id": 19, "cp": 106,
+    "individual_attack": 6, "stamina_max": 22, "individual_defense": 14,
+    "cp_multiplier": 0.37523558735847473, "id": 7841053399}
+
+
+def inventory_response(items, original_timestamp_ms=0, new_timestamp_ms=1000):
+    delta = {'inventory_items': items, 'new_timestamp_ms': new_timestamp_ms}
+    if original_timestamp_ms:
+        delta['original_timestamp_ms'] = original_timestamp_ms
+    return {'responses': {'GET_INVENTORY': {'inventory_delta': delta}}}
+
 
 class InventoryTest(unittest.TestCase):
     def test_types(self):
@@ -122,7 +137,7 @@ class InventoryTest(unittest.TestCase):
             "cp_multiplier": 0.4627983868122101,
             "additional_cp_multiplier": 0.018886566162109375,
             "cp": 653, "nickname": "Golb", "id": 13632861873471324})
-        self.assertEqual(poke.level, 12.5)
+        self.assertEqual(poke.level, 13)
         self.assertEqual(poke.iv, 0.47)
         self.assertAlmostEqual(poke.ivcp, 0.488747515)
         self.assertAlmostEqual(poke.static.max_cp, 1921.34561459)
@@ -141,7 +156,7 @@ class InventoryTest(unittest.TestCase):
             "move_1": 221, "move_2": 129, "pokemon_id": 19, "cp": 106,
             "individual_attack": 6, "stamina_max": 22, "individual_defense": 14,
             "cp_multiplier": 0.37523558735847473, "id": 7841053399})
-        self.assertEqual(poke.level, 7.5)
+        self.assertEqual(poke.level, 8)
         self.assertEqual(poke.iv, 0.44)
         self.assertAlmostEqual(poke.ivcp, 0.3804059)
         self.assertAlmostEqual(poke.static.max_cp, 581.64643575)
@@ -213,3 +228,123 @@ class InventoryTest(unittest.TestCase):
             assert (attack in clazz.list_for_type(attack.type.name))
             self.assertIsInstance(attack, ChargedAttack if charged else Attack)
             prev_dps = attack.dps
+
+    @patch.object(Inventory, 'update_web_inventory')
+    def test_delta_refresh(self, update_web_inventory):
+        bot = MagicMock()
+        bot.api.get_inventory.return_value = inventory_response([
+            {'inventory_item_data': {'pokemon_data': RATTATA}},
+            {'inventory_item_data': {'pokemon_data': dict(RATTATA, id=2)}},
+            {'inventory_item_data': {'item': {'item_id': 1, 'count': 10}}},
+            {'inventory_item_data': {'candy': {'family_id': 19, 'candy': 3}}}
+        ])
+        inv = Inventory(bot)
+        bot.api.get_inventory.assert_called_once_with(last_timestamp_ms=0)
+        self.assertEqual(inv.delta_timestamp(), 1000)
+        rattata = inv.pokemons.get(RATTATA['id'])
+
+        inv.refresh(inventory_response([
+            {'deleted_item_key': 2},
+            {'inventory_item_data': {'item': {'item_id': 1, 'count': 9}}}
+        ], original_timestamp_ms=1000, new_timestamp_ms=2000))
+
+        self.assertIs(inv.pokemons.get(RATTATA['id']), rattata)
+        self.assertIsNone(inv.pokemons.get(2))
+        self.assertEqual(inv.items.get(1).count, 9)
+        self.assertEqual(inv.candy.get(19).quantity, 3)
+        self.assertEqual(inv.delta_timestamp(), 2000)
+
+        # nothing changed, the web inventory file is left alone
+        update_web_inventory.reset_mock()
+        inv.refresh(inventory_response([], original_timestamp_ms=2000, new_timestamp_ms=2000))
+        self.assertFalse(update_web_inventory.called)
+
+        inv.last_full_refresh -= Inventory.FULL_REFRESH_INTERVAL
+        self.assertEqual(inv.delta_timestamp(), 0)
+
+    def test_pokemon_derived_stats_are_lazy(self):
+        with patch.object(Pokemon, '_get_moveset') as get_moveset:
+            poke = Pokemon(dict(RATTATA))
+            self.assertFalse(get_moveset.called)
+            self.assertIs(poke.moveset, poke.moveset)
+            self.assertEqual(get_moveset.call_count, 1)
+
+        self.assertAlmostEqual(poke.ivcp, 0.3804059)
+        self.assertAlmostEqual(poke.cp_percent, 0.183759867)
+        self.assertFalse(hasattr(poke, '__dict__'))
+
+    def test_moveset_for_matches_the_moveset_scan(self):
+        info = PokemonInfo(json.load(open(Pokemons.STATIC_DATA_FILE))[RATTATA['pokemon_id'] - 1])
+        eager = info._process_movesets()
+
+        with patch.object(info, '_process_movesets', wraps=info._process_movesets) as process_movesets:
+            self.assertFalse(process_movesets.called)
+
+            for fm in info.fast_attacks:
+                for chm in info.charged_attack:
+                    expected = [m for m in eager if m.fast_attack == fm and m.charged_attack == chm][0]
+                    moveset = info.moveset_for(fm, chm)
+                    self.assertEqual((moveset.fast_attack, moveset.charged_attack), (fm, chm))
+                    self.assertEqual((moveset.dps, moveset.attack_perfection, moveset.defense_perfection),
+                                     (expected.dps, expected.attack_perfection, expected.defense_perfection))
+
+            # Moves the species does not learn
+            other = [m for m in FastAttacks.all() if m not in info.fast_attacks][0]
+            self.assertIsNone(info.moveset_for(other, info.charged_attack[0]))
+            self.assertEqual(process_movesets.call_count, 1)
+
+    def test_pokemon_moveset_with_unexpected_moves(self):
+        info = Pokemons.data_for(RATTATA['pokemon_id'])
+        other = [m for m in FastAttacks.all() if m not in info.fast_attacks][0]
+
+        poke = Pokemon(dict(RATTATA))
+        self.assertIs(poke.moveset, info.moveset_for(poke.fast_attack, poke.charged_attack))
+
+        with patch('pokemongo_bot.inventory.logging') as logging:
+            poke = Pokemon(dict(RATTATA, move_1=other.id))
+            self.assertEqual((poke.moveset.fast_attack, poke.moveset.charged_attack), (other, poke.charged_attack))
+            self.assertNotIn(poke.moveset, info.movesets)
+            self.assertTrue(logging.getLogger.return_value.error.called)
+
+    def test_pokemon_optimizer_attributes(self):
+        poke = Pokemon(dict(RATTATA))
+        self.assertEqual(poke.ncp, poke.cp_percent)
+        self.assertEqual(poke.dps, poke.moveset.dps)
+        self.assertEqual(poke.dps1, poke.fast_attack.dps)
+        self.assertEqual(poke.dps2, poke.charged_attack.dps)
+        self.assertEqual(poke.attack_perfection, poke.moveset.attack_perfection)
+
+    def test_levels_from_cpms(self):
+        levels = LevelToCPm.levels_from_cpms([0.094, 0.558830576, 0.7903, 0.4627983868122101 + 0.018886566162109375])
+        self.assertEqual(levels.tolist(), [1.0, 17.5, 40.0, 13.0])
+        with self.assertRaises(ValueError):
+            LevelToCPm.level_from_cpm(0.05)
+        with self.assertRaises(KeyError):
+            LevelToCPm.cp_multiplier_for(41)
+
+    def test_evaluate_matches_pokemon_properties(self):
+        bag = [
+            Pokemon(dict(RATTATA)),
+            Pokemon(dict(RATTATA, pokemon_id=133, move_1=221, move_2=26, cp=211, id=3)),
+            Pokemon({
+                "move_1": 209, "move_2": 126, "pokemon_id": 42, "cp": 653,
+                "stamina": 76, "stamina_max": 76, "individual_attack": 9,
+                "individual_defense": 4, "individual_stamina": 8,
+                "cp_multiplier": 0.4627983868122101,
+                "additional_cp_multiplier": 0.018886566162109375, "id": 4})
+        ]
+        expected = [(p.level, p.iv, p.cp_exact, p.cp_percent, p.ivcp) for p in bag]
+
+        stats = Pokemons().evaluate(bag)
+        for i, (level, iv, cp_exact, cp_percent, ivcp) in enumerate(expected):
+            self.assertEqual(stats['level'][i], level)
+            self.assertEqual(stats['iv'][i], iv)
+            self.assertAlmostEqual(stats['cp_exact'][i], cp_exact)
+            self.assertAlmostEqual(stats['cp_percent'][i], cp_percent)
+            self.assertAlmostEqual(stats['ivcp'][i], ivcp)
+            self.assertAlmostEqual(bag[i].ivcp, ivcp)
+
+    def test_evaluate_checks_the_cp(self):
+        bag = [Pokemon(dict(RATTATA)), Pokemon(dict(RATTATA, cp=RATTATA['cp'] + 50, id=3))]
+
+        self.assertRaises(AssertionError, Pokemons().evaluate, bag)
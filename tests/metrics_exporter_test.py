@@ -0,0 +1,48 @@
+import unittest
+import urllib2
+
+from mock import MagicMock
+
+from pokemongo_bot.metrics import Metrics
+from pokemongo_bot.metrics_exporter import MetricsExporter, render
+
+
+class MetricsExporterTest(unittest.TestCase):
+    def setUp(self):
+        self.bot = MagicMock()
+        self.bot.config.username = 'ash"ketchum'
+        self.bot.metrics = Metrics(self.bot)
+        self.bot.event_manager.queue_stats.return_value = {'SocketIoHandler': {'depth': 3, 'dropped': 1}}
+        self.bot.database_log.pending.return_value = 2
+
+    def test_render(self):
+        self.bot.metrics.xp['latest'] = 1200
+        self.bot.metrics.released_pokemon(4)
+        self.bot.metrics.tick_done(0.25)
+        self.bot.metrics.cache_lookup('map_objects', hits=3, misses=1)
+
+        lines = render(self.bot).splitlines()
+
+        self.assertEqual(lines[-1], '# EOF')
+        self.assertIn('# TYPE pokemongo_bot_xp counter', lines)
+        self.assertIn('pokemongo_bot_xp_total{account="ash\\"ketchum"} 1200.0', lines)
+        self.assertIn('pokemongo_bot_pokemon_released_total{account="ash\\"ketchum"} 4.0', lines)
+        self.assertIn('pokemongo_bot_tick_seconds{account="ash\\"ketchum",quantile="0.5"} 0.25', lines)
+        self.assertIn('pokemongo_bot_tick_seconds_count{account="ash\\"ketchum"} 1.0', lines)
+        self.assertIn('pokemongo_bot_event_queue_depth{account="ash\\"ketchum",handler="SocketIoHandler"} 3.0', lines)
+        self.assertIn('pokemongo_bot_cache_hits_total{account="ash\\"ketchum",cache="map_objects"} 3.0', lines)
+        # Not known before the first capture_stats
+        self.assertNotIn('# TYPE pokemongo_bot_pokestop_visits counter', lines)
+
+    def test_serve(self):
+        exporter = MetricsExporter(self.bot, port=0).start()
+
+        try:
+            response = urllib2.urlopen('http://127.0.0.1:%s/metrics' % exporter.port, timeout=5)
+            self.assertTrue(response.info()['Content-Type'].startswith('application/openmetrics-text'))
+            self.assertTrue(response.read().endswith('# EOF\n'))
+
+            with self.assertRaises(urllib2.HTTPError):
+                urllib2.urlopen('http://127.0.0.1:%s/' % exporter.port, timeout=5)
+        finally:
+            exporter.stop()
@@ -0,0 +1,75 @@
+import unittest
+
+from pokemongo_bot.pokemon_ranking import PokemonTable, RuleEvaluator, unique_rows
+
+
+class FakePokemon(object):
+    def __init__(self, pokemon_id, iv, cp, evolves=True):
+        self.pokemon_id = pokemon_id
+        self.iv = iv
+        self.cp = cp
+        self.evolves = evolves
+
+    def has_next_evolution(self):
+        return self.evolves
+
+
+BAG = [
+    FakePokemon(16, 0.5, 100),
+    FakePokemon(16, 0.9, 50),
+    FakePokemon(16, 0.9, 80),
+    FakePokemon(19, 0.2, 300, evolves=False),
+    FakePokemon(19, 0.7, 10),
+    FakePokemon(16, 0.1, 10)
+]
+
+
+class RuleEvaluatorTest(unittest.TestCase):
+    def setUp(self):
+        self.table = PokemonTable(BAG)
+
+    def test_rank_sorts_by_group_then_score(self):
+        evaluator = RuleEvaluator(self.table, {"sort": ["iv", "cp"]})
+        rows, groups = evaluator.rank(self.table.rows(), "pokemon_id")
+        self.assertEqual(rows.tolist(), [2, 1, 0, 5, 4, 3])
+        self.assertEqual(groups.tolist(), [16, 16, 16, 16, 19, 19])
+
+    def test_best_keeps_top_of_each_group(self):
+        evaluator = RuleEvaluator(self.table, {"top": 1, "sort": ["iv"]})
+        keep, try_evolve, try_upgrade = evaluator.best(self.table.rows(), "pokemon_id")
+        # Both iv 0.9 Pidgeys are tied for the first place
+        self.assertEqual(keep.tolist(), [1, 2, 4])
+        self.assertEqual(try_evolve.tolist(), [1, 2, 4])
+        self.assertEqual(try_upgrade.tolist(), [])
+
+    def test_best_with_fraction_of_the_best_score(self):
+        evaluator = RuleEvaluator(self.table, {"top": 0.5, "sort": ["cp"]})
+        keep, _, _ = evaluator.best(self.table.rows())
+        self.assertEqual(keep.tolist(), [3])
+
+        evaluator = RuleEvaluator(self.table, {"top": 0.9, "sort": ["cp"]})
+        keep, _, _ = evaluator.best(self.table.rows())
+        self.assertEqual(keep.tolist(), [3, 0, 2, 1])
+
+    def test_requirements(self):
+        rule = {"sort": ["cp"], "keep": {"iv": [[0, 0.3], [0.8, 1]]}, "evolve": {"cp": -60}, "upgrade": True}
+        evaluator = RuleEvaluator(self.table, rule)
+        keep, try_evolve, try_upgrade = evaluator.best(self.table.rows())
+        self.assertEqual(keep.tolist(), [3, 2, 1, 5])
+        self.assertEqual(try_evolve.tolist(), [1, 5])
+        self.assertEqual(try_upgrade.tolist(), [3, 2])
+
+    def test_empty_keep_requirement_keeps_nothing(self):
+        evaluator = RuleEvaluator(self.table, {"sort": ["iv"], "keep": {}})
+        self.assertEqual([r.tolist() for r in evaluator.best(self.table.rows())], [[], [], []])
+
+    def test_better_than(self):
+        evaluator = RuleEvaluator(self.table, {"sort": ["iv"]})
+        keep, _, _ = evaluator.better_than(self.table.rows(), 0)
+        self.assertEqual(keep.tolist(), [1, 2, 4, 0])
+        keep, _, _ = evaluator.better_than(self.table.rows(), 0, 2)
+        self.assertEqual(keep.tolist(), [1, 2])
+
+    def test_unique_rows_keeps_first_occurrence(self):
+        self.assertEqual(unique_rows([[3, 1], [1, 2, 3, 0]]).tolist(), [3, 1, 2, 0])
+        self.assertEqual(unique_rows([]).tolist(), [])
@@ -0,0 +1,105 @@
+import unittest
+
+from mock import MagicMock, patch
+
+from pokemongo_bot import pokemon_release
+from pokemongo_bot.pokemon_release import PokemonReleaser, summarize
+
+
+class FakePokemon(object):
+    def __init__(self, unique_id, name='Pidgey', pokemon_id=16):
+        self.unique_id = unique_id
+        self.name = name
+        self.pokemon_id = pokemon_id
+        self.iv = 0.5
+        self.cp = 10
+        self.ivcp = 0.2
+
+
+class FakeCandy(object):
+    def __init__(self, quantity):
+        self.quantity = quantity
+
+    def add(self, quantity):
+        self.quantity += quantity
+
+
+def release_response(candy_awarded, result=1):
+    return {'responses': {'RELEASE_POKEMON': {'result': result, 'candy_awarded': candy_awarded}}}
+
+
+@patch('pokemongo_bot.pokemon_release.action_delay')
+@patch('pokemongo_bot.pokemon_release.inventory')
+class PokemonReleaserTest(unittest.TestCase):
+    def setUp(self):
+        self.task = MagicMock()
+        self.pokemons = [FakePokemon(i) for i in range(4)] + [FakePokemon(4, 'Rattata', 19)]
+
+    def releaser(self, multi_release=True):
+        with patch.object(pokemon_release, 'MULTI_RELEASE', multi_release):
+            return PokemonReleaser(self.task, batch_size=2)
+
+    def test_release_in_batches(self, inventory, action_delay):
+        self.task.bot.api.release_pokemon.side_effect = [release_response(2), release_response(2), release_response(1)]
+
+        released = self.releaser().release(self.pokemons)
+
+        self.assertEqual(released, self.pokemons)
+        self.assertEqual(self.task.bot.api.release_pokemon.call_args_list[0][1], {'pokemon_ids': [0, 1]})
+        self.assertEqual(self.task.bot.api.release_pokemon.call_args_list[2][1], {'pokemon_id': 4})
+        self.assertEqual(action_delay.call_count, 2)
+        self.assertEqual(inventory.pokemons().remove.call_count, 5)
+        self.assertEqual(self.task.bot.database_log.insert.call_count, 5)
+
+        self.assertEqual([c[0][0] for c in self.task.emit_event.call_args_list], ['pokemon_release'] * 5 + ['pokemon_release_batch'])
+        self.assertEqual(self.task.emit_event.call_args_list[4][1]['data']['pokemon'], 'Rattata')
+        self.task.emit_event.assert_called_with(
+            'pokemon_release_batch',
+            formatted="Released {count} Pokemon ({pokemons}) [+{candy} candies]",
+            data={'count': 5, 'candy': 5, 'pokemons': 'Pidgey x4, Rattata'})
+
+    def test_release_events_follow_the_candy_count(self, inventory, action_delay):
+        inventory.candies().get.return_value = FakeCandy(10)
+        self.task.bot.api.release_pokemon.side_effect = [release_response(3), release_response(2), {}]
+        events = []
+        self.task.emit_event.side_effect = lambda event, **kwargs: events.append(
+            (event, kwargs.get('level', 'info'), kwargs['data'].get('candy'), self.task.bot.api.release_pokemon.call_count))
+
+        self.releaser().release(self.pokemons)
+
+        # Sent as each batch is answered, before the next request
+        self.assertEqual(events, [
+            ('pokemon_release', 'info', 12, 1),
+            ('pokemon_release', 'info', 13, 1),
+            ('pokemon_release', 'info', 14, 2),
+            ('pokemon_release', 'info', 15, 2),
+            ('pokemon_release_batch', 'info', 5, 3)
+        ])
+
+    def test_one_request_per_pokemon_without_multi_release(self, inventory, action_delay):
+        self.task.bot.api.release_pokemon.return_value = release_response(1)
+
+        self.releaser(multi_release=False).release(self.pokemons[:3])
+
+        calls = [c[1] for c in self.task.bot.api.release_pokemon.call_args_list]
+        self.assertEqual(calls, [{'pokemon_id': 0}, {'pokemon_id': 1}, {'pokemon_id': 2}])
+
+    def test_failed_batch_is_not_counted(self, inventory, action_delay):
+        self.task.bot.api.release_pokemon.side_effect = [release_response(0, result=2), release_response(2), {}]
+
+        released = self.releaser().release(self.pokemons)
+
+        self.assertEqual(released, self.pokemons[2:4])
+        self.assertEqual(inventory.pokemons().remove.call_count, 2)
+
+    def test_dry_run(self, inventory, action_delay):
+        released = self.releaser().release(self.pokemons, send=False, update=False)
+
+        self.assertEqual(released, self.pokemons)
+        self.assertFalse(self.task.bot.api.release_pokemon.called)
+        self.assertFalse(inventory.pokemons().remove.called)
+        self.assertFalse(self.task.bot.database_log.insert.called)
+        self.assertEqual(self.task.emit_event.call_args[1]['data']['candy'], 5)
+
+    def test_summarize(self, inventory, action_delay):
+        self.assertEqual(summarize(self.pokemons[3:] + self.pokemons[:1]), 'Pidgey x2, Rattata')
@@ -0,0 +1,81 @@
+import threading
+import unittest
+
+from mock import patch
+
+from pokemongo_bot.rate_limiter import TokenBucket
+
+
+class TokenBucketTest(unittest.TestCase):
+    def setUp(self):
+        self.now = [1000.0]
+        patcher = patch('pokemongo_bot.rate_limiter.time')
+        self.time = patcher.start()
+        self.time.time.side_effect = lambda: self.now[0]
+        self.addCleanup(patcher.stop)
+
+    def test_burst_does_not_wait(self):
+        bucket = TokenBucket(rate=2, capacity=3)
+        delays = [bucket.reserve(['GET_PLAYER']) for _ in range(3)]
+        self.assertEqual(delays, [0.0, 0.0, 0.0])
+
+    def test_waits_once_burst_is_spent(self):
+        bucket = TokenBucket(rate=2, capacity=1)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertAlmostEqual(bucket.reserve(), 0.5)
+        # Concurrent callers queue up behind each other
+        self.assertAlmostEqual(bucket.reserve(), 1.0)
+
+    def test_tokens_refill_over_time(self):
+        bucket = TokenBucket(rate=2, capacity=1)
+        bucket.reserve()
+        self.now[0] += 0.5
+        self.assertEqual(bucket.reserve(), 0.0)
+
+    def test_refill_is_capped_by_capacity(self):
+        bucket = TokenBucket(rate=2, capacity=2)
+        self.now[0] += 60
+        bucket.reserve()
+        bucket.reserve()
+        self.assertAlmostEqual(bucket.reserve(), 0.5)
+
+    def test_envelope_costs_highest_weight(self):
+        bucket = TokenBucket(rate=1, capacity=1, weights={'get_map_objects': 3})
+        self.assertEqual(bucket.weight_for(['GET_PLAYER', 'GET_MAP_OBJECTS']), 3)
+        self.assertEqual(bucket.weight_for([]), 1)
+
+        bucket.reserve(['GET_MAP_OBJECTS'])
+        self.assertAlmostEqual(bucket.reserve(['GET_PLAYER']), 3.0)
+
+    def test_acquire_sleeps_and_records_stats(self):
+        bucket = TokenBucket(rate=4, capacity=1)
+        bucket.acquire(['GET_PLAYER'])
+        bucket.acquire(['GET_PLAYER', 'GET_INVENTORY'])
+
+        self.time.sleep.assert_called_once_with(0.25)
+        stats = bucket.stats()
+        self.assertEqual(stats['acquired'], 2)
+        self.assertEqual(stats['waits'], 1)
+        self.assertAlmostEqual(stats['total_wait'], 0.25)
+        self.assertEqual(stats['acquired_by_type'], {'GET_PLAYER': 2, 'GET_INVENTORY': 1})
+
+    def test_invalid_configuration(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0)
+        with self.assertRaises(ValueError):
+            TokenBucket(capacity=0.5)
+
+    def test_reservations_are_thread_safe(self):
+        bucket = TokenBucket(rate=1, capacity=1)
+        delays = []
+
+        def reserve():
+            delays.append(bucket.reserve())
+
+        threads = [threading.Thread(target=reserve) for _ in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(sorted(delays), [float(i) for i in range(20)])
@@ -0,0 +1,93 @@
+import unittest
+
+from mock import MagicMock, patch
+
+from pgoapi.exceptions import ServerBusyOrOfflineException, ServerSideRequestThrottlingException
+
+from pokemongo_bot.retry_policy import (CircuitBreaker, ExponentialBackoff, RetryPolicy,
+                                        INVALID_RESPONSE, THROTTLED, UNEXPECTED_RESPONSE)
+
+
+class ExponentialBackoffTest(unittest.TestCase):
+    def test_delay_grows_and_is_capped(self):
+        backoff = ExponentialBackoff(base=0.5, factor=2, max_delay=3, jitter=0)
+        self.assertEqual([backoff.delay(i) for i in range(1, 6)], [0.5, 1, 2, 3, 3])
+
+    def test_jitter_only_shortens_delay(self):
+        backoff = ExponentialBackoff(base=1, factor=2, max_delay=30, jitter=0.5)
+        for _ in range(100):
+            self.assertTrue(2 <= backoff.delay(3) <= 4)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker(threshold=3, cooldown=10)
+        self.assertFalse(breaker.record_failure(100))
+        self.assertFalse(breaker.record_failure(100))
+        self.assertTrue(breaker.record_failure(100))
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_probe_waits_for_cooldown(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=10)
+        breaker.record_failure(100)
+        self.assertEqual(breaker.before_call(104), 6)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(breaker.before_call(104), 0)
+
+    def test_failed_probe_doubles_cooldown(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=10, max_cooldown=15)
+        breaker.record_failure(100)
+        breaker.before_call(110)
+        self.assertTrue(breaker.record_failure(110))
+        self.assertEqual(breaker.current_cooldown, 15)
+
+    def test_success_closes(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=10)
+        breaker.record_failure(100)
+        breaker.before_call(110)
+        self.assertTrue(breaker.record_success())
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(breaker.failures, 0)
+        self.assertFalse(breaker.record_success())
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def setUp(self):
+        self.policy = RetryPolicy(breaker=CircuitBreaker(threshold=3, cooldown=10))
+        self.listener = MagicMock()
+        self.policy.listeners.append(self.listener)
+
+    def events(self):
+        return [c[0][0] for c in self.listener.call_args_list]
+
+    def test_budget_raises_error_class_exception(self):
+        with self.assertRaises(ServerSideRequestThrottlingException):
+            self.policy.on_failure(THROTTLED, 15, 15)
+        with self.assertRaises(ServerBusyOrOfflineException):
+            self.policy.on_failure(INVALID_RESPONSE, 2, 2)
+        self.assertIn('api_retry_exhausted', self.events())
+
+    def test_unexpected_response_has_no_budget(self):
+        self.assertTrue(self.policy.on_failure(UNEXPECTED_RESPONSE, 1000, 15) >= 0)
+
+    def test_custom_budget(self):
+        policy = RetryPolicy(budgets={THROTTLED: 2})
+        policy.on_failure(THROTTLED, 1, 15)
+        with self.assertRaises(ServerSideRequestThrottlingException):
+            policy.on_failure(THROTTLED, 2, 15)
+
+    def test_circuit_events(self):
+        for attempt in range(1, 4):
+            self.policy.on_failure(INVALID_RESPONSE, attempt, 15)
+        self.assertEqual(self.events().count('api_backoff'), 3)
+        self.assertIn('api_circuit_open', self.events())
+
+        with patch('pokemongo_bot.retry_policy.time.time', return_value=self.policy.breaker.opened_at + 4):
+            self.assertAlmostEqual(self.policy.before_call(), 6)
+        self.policy.on_success()
+        self.assertEqual(self.events()[-2:], ['api_circuit_half_open', 'api_circuit_closed'])
+
+    def test_no_backoff_when_circuit_opens(self):
+        self.policy.on_failure(INVALID_RESPONSE, 1, 15)
+        self.policy.on_failure(INVALID_RESPONSE, 2, 15)
+        self.assertEqual(self.policy.on_failure(INVALID_RESPONSE, 3, 15), 0)
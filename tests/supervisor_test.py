@@ -0,0 +1,145 @@
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+import unittest
+
+from mock import patch
+
+from pokemongo_bot.supervisor import Account, Supervisor, load_accounts, FINISHED, RUNNING, WAITING
+
+
+def clean_exit(config_path):
+    sys.exit(0)
+
+
+def crash(config_path):
+    sys.exit(1)
+
+
+def run_forever(config_path):
+    try:
+        while True:
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+class SupervisorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        with open(os.path.join(self.directory, name), 'w') as outfile:
+            outfile.write(content)
+
+    def accounts(self, count):
+        return [Account('config-%d.json' % i, 'account%d' % i) for i in range(count)]
+
+    def wait_for_exit(self, supervisor):
+        for account in supervisor.running():
+            account.process.join(5)
+        supervisor.check()
+
+    def wait_for_start(self, supervisor):
+        for account in supervisor.running():
+            self.assertTrue(account.ready.wait(5))
+
+    def test_load_accounts(self):
+        self.write('b.json', json.dumps({'username': 'bob'}))
+        self.write('a.json', json.dumps({'username': 'alice'}))
+        self.write('no_username.json', json.dumps({'password': 'x'}))
+        self.write('broken.json', '{')
+
+        accounts = load_accounts(self.directory)
+
+        self.assertEqual([a.username for a in accounts], ['alice', 'bob'])
+        self.assertEqual(accounts[0].config_path, os.path.join(self.directory, 'a.json'))
+
+    def test_clean_exit_is_not_restarted(self):
+        supervisor = Supervisor(self.accounts(1), clean_exit, stagger=0)
+        account = supervisor.accounts[0]
+
+        supervisor.check()
+        self.assertEqual(account.state, RUNNING)
+        self.wait_for_exit(supervisor)
+
+        self.assertEqual(account.state, FINISHED)
+        self.assertEqual((account.exitcode, account.restarts), (0, 0))
+
+    def test_crash_is_restarted_with_backoff(self):
+        supervisor = Supervisor(self.accounts(1), crash, stagger=0, restart_delay=10, max_restart_delay=25)
+        account = supervisor.accounts[0]
+        delays = []
+
+        for _ in range(3):
+            account.next_start = 0
+            supervisor.check()
+            self.wait_for_exit(supervisor)
+            delays.append(round(account.next_start - time.time()))
+
+        self.assertEqual(account.state, WAITING)
+        self.assertEqual((account.exitcode, account.restarts), (1, 3))
+        self.assertEqual(delays, [10, 20, 25])
+
+    def test_logins_are_staggered(self):
+        supervisor = Supervisor(self.accounts(2), run_forever, stagger=60)
+
+        try:
+            supervisor.check()
+            self.assertEqual([a.state for a in supervisor.accounts], [RUNNING, WAITING])
+
+            supervisor.next_login = 0
+            supervisor.check()
+            self.assertEqual([a.state for a in supervisor.accounts], [RUNNING, RUNNING])
+        finally:
+            self.wait_for_start(supervisor)
+            supervisor.stop(timeout=2)
+
+        self.assertEqual([a.state for a in supervisor.accounts], [FINISHED, FINISHED])
+        # Interrupted, not killed
+        self.assertEqual([a.exitcode for a in supervisor.accounts], [0, 0])
+
+    def test_processes_limit(self):
+        supervisor = Supervisor(self.accounts(3), run_forever, processes=2, stagger=0)
+
+        try:
+            supervisor.check()
+            supervisor.check()
+            self.assertEqual([a.state for a in supervisor.accounts], [RUNNING, RUNNING, WAITING])
+        finally:
+            self.wait_for_start(supervisor)
+            supervisor.stop(timeout=2)
+
+    def test_process_not_started_yet_is_killed(self):
+        supervisor = Supervisor(self.accounts(1), run_forever, stagger=0)
+        account = supervisor.accounts[0]
+
+        supervisor.check()
+        self.wait_for_start(supervisor)
+        # As if the process had not reached its target yet
+        account.ready = multiprocessing.Event()
+        supervisor.stop(timeout=2)
+
+        self.assertEqual(account.exitcode, -signal.SIGTERM)
+
+    def test_status(self):
+        os.mkdir(os.path.join(self.directory, 'web'))
+        self.write(os.path.join('web', 'inventory-account0.json'), json.dumps([
+            {'inventory_item_data': {'player_stats': {'level': 12, 'experience': 34567}}},
+            {'inventory_item_data': {'item': {'item_id': 1, 'count': 5}}}
+        ]))
+        supervisor = Supervisor(self.accounts(2), clean_exit)
+
+        with patch('pokemongo_bot.supervisor._base_dir', self.directory):
+            status = supervisor.status()
+
+        self.assertEqual([(s['username'], s['state'], s['level'], s['experience']) for s in status],
+                         [('account0', WAITING, 12, 34567), ('account1', WAITING, None, None)])
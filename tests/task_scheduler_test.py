@@ -0,0 +1,74 @@
+import unittest
+
+from mock import patch
+
+from pokemongo_bot.task_scheduler import TaskScheduler, INVENTORY
+from pokemongo_bot.worker_result import WorkerResult
+
+
+class FakeTask(object):
+    triggers = ()
+
+    def __init__(self, next_run_time=0, result=WorkerResult.SUCCESS):
+        self._next_run_time = next_run_time
+        self.result = result
+        self.runs = 0
+
+    def next_run_time(self):
+        return self._next_run_time
+
+    def work(self):
+        self.runs += 1
+        return self.result
+
+
+class InventoryTask(FakeTask):
+    triggers = (INVENTORY,)
+
+
+@patch('pokemongo_bot.task_scheduler.time')
+class TaskSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = TaskScheduler()
+
+    def tick(self, workers, times=1):
+        for _ in range(times):
+            self.scheduler.run(workers)
+
+    def test_every_tick_by_default(self, time):
+        time.time.return_value = 100
+        task = FakeTask()
+        self.tick([task], 3)
+        self.assertEqual(task.runs, 3)
+
+    def test_next_run_time(self, time):
+        time.time.return_value = 100
+        task = FakeTask(next_run_time=150)
+        workers = [task]
+
+        self.tick(workers, 2)
+        self.assertEqual(task.runs, 1)
+
+        time.time.return_value = 150
+        self.tick(workers)
+        self.assertEqual(task.runs, 2)
+        self.assertEqual(self.scheduler.stats()['FakeTask'], {'runs': 2, 'skips': 1, 'time': 0.0})
+
+    def test_triggers(self, time):
+        time.time.return_value = 100
+        task = InventoryTask(next_run_time=None)
+        workers = [task]
+
+        self.tick(workers, 2)
+        self.assertEqual(task.runs, 1)
+
+        self.scheduler.trigger(INVENTORY)
+        self.tick(workers, 2)
+        self.assertEqual(task.runs, 2)
+
+    def test_running_task_ends_the_tick(self, time):
+        time.time.return_value = 100
+        first, second = FakeTask(result=WorkerResult.RUNNING), FakeTask()
+
+        self.assertEqual(self.scheduler.run([first, second]), WorkerResult.RUNNING)
+        self.assertEqual(second.runs, 0)
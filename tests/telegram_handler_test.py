@@ -0,0 +1,31 @@
+import sqlite3
+import unittest
+
+from mock import MagicMock
+
+from pokemongo_bot.event_handlers.telegram_handler import TelegramHandler
+from pokemongo_bot.event_manager import EventManager
+
+
+class TelegramHandlerTest(unittest.TestCase):
+    def setUp(self):
+        self.bot = MagicMock()
+        # sqlite refuses to use a connection from another thread than its own
+        self.bot.database = sqlite3.connect(':memory:')
+        self.handler = TelegramHandler(self.bot, {})
+        self.handler.tbot = MagicMock()
+        self.bot.database.execute("INSERT INTO telegram_subscriptions VALUES ('42', 'level_up', ' ')")
+
+        self.manager = EventManager(False, self.handler)
+        self.manager.register_event('level_up', parameters=('previous_level', 'current_level'))
+
+    def tearDown(self):
+        self.manager.stop(timeout=5)
+        self.bot.database.close()
+
+    def test_subscriptions_are_read_through_the_bot_database(self):
+        self.manager.emit('level_up', sender=self, data={'previous_level': 1, 'current_level': 2})
+        self.manager.flush(timeout=5)
+
+        self.assertEqual(self.manager.queue_stats(), {})
+        self.handler.tbot.sendMessage.assert_called_once_with(chat_id='42', parse_mode='Markdown', text='level up (2)')
@@ -0,0 +1,80 @@
+import thread
+import threading
+import time
+import unittest
+
+from mock import patch
+
+from pokemongo_bot.timer_service import TimerService
+
+
+class TimerServiceTest(unittest.TestCase):
+    def setUp(self):
+        self.timers = TimerService()
+
+    def tearDown(self):
+        self.timers.stop(timeout=5)
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline:
+            time.sleep(0.005)
+        return condition()
+
+    def test_jobs_run_periodically_on_one_thread(self):
+        threads = []
+        fast = self.timers.schedule(0.01, lambda: threads.append(thread.get_ident()), name='fast')
+        slow = self.timers.schedule(0.02, lambda: threads.append(thread.get_ident()), name='slow')
+
+        self.assertTrue(self.wait_for(lambda: fast.runs >= 3 and slow.runs >= 2))
+        self.assertEqual(len(set(threads)), 1)
+        self.assertTrue(self.timers._thread.is_alive())
+
+    def test_next_run_order(self):
+        later = self.timers.schedule(60, lambda: None, name='later')
+        sooner = self.timers.schedule(30, lambda: None, name='sooner')
+
+        self.assertEqual(self.timers.jobs(), [sooner, later])
+
+    def test_cancel(self):
+        job = self.timers.schedule(0.01, lambda: None, delay=0)
+        self.assertTrue(self.wait_for(lambda: job.runs >= 1))
+
+        job.cancel()
+        runs = job.runs
+        time.sleep(0.05)
+
+        self.assertLessEqual(job.runs, runs + 1)
+        self.assertEqual(self.timers.jobs(), [])
+
+    def test_failing_job_keeps_its_schedule(self):
+        def fail():
+            raise ValueError('boom')
+
+        job = self.timers.schedule(0.01, fail, delay=0)
+
+        self.assertTrue(self.wait_for(lambda: job.runs >= 2))
+        self.assertEqual(job.errors, job.runs)
+
+    def test_jitter(self):
+        with patch('pokemongo_bot.timer_service.random.uniform', return_value=3) as uniform:
+            job = self.timers.schedule(10, lambda: None, jitter=5)
+
+        uniform.assert_called_once_with(0, 5)
+        self.assertAlmostEqual(job.next_run, time.time() + 13, delta=1)
+
+    def test_stop_waits_for_the_running_job(self):
+        started = threading.Event()
+        finished = []
+
+        def job():
+            started.set()
+            time.sleep(0.05)
+            finished.append(True)
+
+        self.timers.schedule(60, job, delay=0)
+        self.assertTrue(started.wait(5))
+
+        self.assertTrue(self.timers.stop(timeout=5))
+        self.assertEqual(finished, [True])
+        self.assertRaises(RuntimeError, self.timers.schedule, 1, job)
@@ -0,0 +1,59 @@
+import unittest
+
+from mock import patch
+
+from pokemongo_bot.timings import RollingHistogram, Timings
+
+
+class RollingHistogramTest(unittest.TestCase):
+    def test_summary_of_the_last_samples(self):
+        histogram = RollingHistogram(size=10)
+
+        for value in range(1, 21):
+            histogram.add(value)
+
+        summary = histogram.summary()
+        self.assertEqual((summary['count'], summary['total']), (20, 210))
+        self.assertEqual((summary['p50'], summary['p90'], summary['max']), (16, 20, 20))
+
+
+@patch('pokemongo_bot.timings.time')
+class TimingsTest(unittest.TestCase):
+    def test_rpcs_and_waits_are_added_to_the_running_task(self, time):
+        timings = Timings()
+        time.time.side_effect = [100, 103]
+
+        with timings.task('CatchPokemon'):
+            timings.rpc(['encounter', 'catch_pokemon'], 0.5)
+            timings.wait('action_delay', 1.5)
+        timings.wait('sleep', 2)
+
+        stats = timings.stats()
+        task = stats['tasks']['CatchPokemon']
+        self.assertEqual((task['count'], task['total'], task['api_calls'], task['wait']), (1, 3, 1, 1.5))
+        self.assertEqual(sorted(stats['rpcs']), ['CATCH_POKEMON', 'ENCOUNTER'])
+        self.assertEqual(stats['waits']['sleep']['total'], 2)
+        self.assertIn('CatchPokemon', timings.report())
+
+    def test_errors(self, time):
+        timings = Timings()
+        timings.rpc(['get_map_objects'], 1, error=True)
+        timings.rpc(['get_map_objects'], 1)
+
+        rpc = timings.stats()['rpcs']['GET_MAP_OBJECTS']
+        self.assertEqual((rpc['count'], rpc['errors'], rpc['api_calls']), (2, 1, 0))
+
+    def test_work_of_another_thread_is_charged_to_the_task(self, time):
+        timings = Timings()
+
+        with timings.task('CatchPokemon'):
+            task = timings.current_task()
+
+        with timings.charged_to(task):
+            timings.rpc(['catch_pokemon'], 0.5)
+            timings.wait('throttle', 1)
+        timings.rpc(['get_map_objects'], 0.5)
+
+        task = timings.stats()['tasks']['CatchPokemon']
+        self.assertEqual((task['count'], task['api_calls'], task['wait']), (1, 1, 1))
+        self.assertIsNone(timings.current_task())
@@ -0,0 +1,90 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import patch
+
+from pokemongo_bot.web_file_writer import WebFileWriter
+
+
+class WebFileWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'location-test.json')
+        self.writer = WebFileWriter()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self):
+        with open(self.path) as infile:
+            return json.load(infile)
+
+    def test_write(self):
+        self.writer.write(self.path, {'lat': 1.5, 'cells': []})
+
+        self.assertTrue(self.writer.flush(timeout=5))
+        self.assertEqual(self.read(), {'lat': 1.5, 'cells': []})
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+    def test_unchanged_payload_is_not_written(self):
+        self.writer.write(self.path, [1, 2])
+        self.writer.flush(timeout=5)
+
+        with patch('pokemongo_bot.web_file_writer.os.rename') as rename:
+            self.writer.write(self.path, [1, 2])
+            self.writer.flush(timeout=5)
+            self.assertFalse(rename.called)
+
+        self.writer.write(self.path, [1, 2, 3])
+        self.writer.flush(timeout=5)
+        self.assertEqual(self.read(), [1, 2, 3])
+
+    def test_payload_changed_after_write(self):
+        payload = {'cells': [1]}
+
+        with self.writer._condition:
+            self.writer.write(self.path, payload)
+            payload['cells'].append(2)
+
+        self.writer.flush(timeout=5)
+        self.assertEqual(self.read(), {'cells': [1]})
+
+    def test_failed_rename_keeps_the_file(self):
+        self.writer.write(self.path, [1])
+        self.writer.flush(timeout=5)
+
+        with patch('pokemongo_bot.web_file_writer.os.rename', side_effect=OSError('busy')):
+            self.writer.write(self.path, [2])
+            self.writer.flush(timeout=5)
+
+        self.assertEqual(self.read(), [1])
+
+    def test_only_the_latest_payload_is_written(self):
+        with self.writer._condition:
+            for i in range(5):
+                self.writer.write(self.path, i)
+            self.assertEqual(list(self.writer._pending.values()), ['4'])
+
+        self.writer.flush(timeout=5)
+        self.assertEqual(self.read(), 4)
+
+    def test_write_error_is_logged(self):
+        path = os.path.join(self.directory, 'missing', 'inventory.json')
+
+        with patch.object(self.writer, 'logger') as logger:
+            self.writer.write(path, [])
+            self.writer.flush(timeout=5)
+            self.assertTrue(logger.info.called)
+
+    def test_stop(self):
+        self.writer.write(self.path, [1])
+
+        self.assertTrue(self.writer.stop(timeout=5))
+        self.assertFalse(self.writer._thread.is_alive())
+        self.assertEqual(self.read(), [1])
+
+        self.writer.write(self.path, [2])
+        self.assertEqual(list(self.writer._pending.values()), [])